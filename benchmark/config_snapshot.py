@@ -0,0 +1,48 @@
+import os
+import sys
+from timeit import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.config import config
+
+
+def get_properties_settings():
+    """
+    Read the hot path settings through the config properties
+    """
+    return (
+        config.ipv_type,
+        config.ipv_limit["ipv4"],
+        config.source_limits.get("subscribe"),
+        config.urls_limit,
+        config.open_method["subscribe"],
+    )
+
+
+def get_snapshot_settings():
+    """
+    Read the hot path settings through the config snapshot
+    """
+    snapshot = config.snapshot
+    return (
+        snapshot.ipv_type,
+        snapshot.ipv_limit["ipv4"],
+        snapshot.source_limits.get("subscribe"),
+        snapshot.urls_limit,
+        snapshot.open_method["subscribe"],
+    )
+
+
+def main(number=20000):
+    assert get_properties_settings() == get_snapshot_settings(), "Snapshot differs from config properties"
+    properties_time = timeit(get_properties_settings, number=number)
+    snapshot_time = timeit(get_snapshot_settings, number=number)
+    print(f"Calls: {number}")
+    print(f"Properties: {properties_time / number * 1e6:.2f}us per call")
+    print(f"Snapshot: {snapshot_time / number * 1e6:.2f}us per call")
+    print(f"Speedup: {properties_time / snapshot_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
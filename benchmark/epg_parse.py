@@ -0,0 +1,59 @@
+import os
+import sys
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from time import perf_counter
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from updates.epg.request import parse_epg_body
+
+
+def get_synthetic_epg(index: int, channels: int, days: int) -> bytes:
+    """
+    Generate the XMLTV document of the source, each channel has a programme per half hour
+    """
+    start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', f'<tv generator-info-name="source{index}">']
+    for i in range(channels):
+        lines.append(f'<channel id="{index}-{i}"><display-name lang="zh">頻道{i}</display-name></channel>')
+    for i in range(channels):
+        for j in range(days * 48):
+            begin = start + timedelta(minutes=30 * j)
+            end = begin + timedelta(minutes=30)
+            lines.append(
+                f'<programme channel="{index}-{i}" start="{begin:%Y%m%d%H%M%S} +0800" stop="{end:%Y%m%d%H%M%S} +0800">'
+                f'<title lang="zh">節目{j}：新聞聯播與天氣預報</title><desc>簡介</desc></programme>'
+            )
+    lines.append("</tv>")
+    return "\n".join(lines).encode("utf-8")
+
+
+def parse_all(bodies: list[bytes], workers: int) -> int:
+    """
+    Parse all the bodies with the workers, return the number of programmes
+    """
+    if workers == 1:
+        results = [parse_epg_body(body) for body in bodies]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(parse_epg_body, bodies))
+    return sum(len(programmes) for _, channel_programmes in results for programmes in channel_programmes.values())
+
+
+def main(sources: int = 10, channels: int = 100, days: int = 8):
+    documents = [get_synthetic_epg(i, channels, days) for i in range(sources)]
+    bodies = [zlib.compress(document) for document in documents]
+    print(f"{sources} sources, {sum(map(len, documents)) / 1024 / 1024:.1f}MB XMLTV, {os.cpu_count()} cores")
+    baseline = None
+    for workers in sorted({1, 2, 4, os.cpu_count() or 1}):
+        start_time = perf_counter()
+        total = parse_all(bodies, workers)
+        elapsed = perf_counter() - start_time
+        baseline = baseline or elapsed
+        print(f"{workers} workers: {total} programmes in {elapsed:.2f}s ({baseline / elapsed:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
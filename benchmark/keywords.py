@@ -0,0 +1,72 @@
+import os
+import random
+import string
+import sys
+from time import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.keywords import KeywordMatcher
+
+random.seed(0)
+
+
+def random_word(min_len=4, max_len=10):
+    """
+    Get a random lowercase word
+    """
+    return "".join(random.choices(string.ascii_lowercase + string.digits, k=random.randint(min_len, max_len)))
+
+
+def get_keywords(count):
+    """
+    Get the blacklist keywords, mixing hosts and path segments
+    """
+    return [
+        f"{random_word()}.{random.choice(['com', 'net', 'cn'])}" if i % 2 else f"/{random_word()}/"
+        for i in range(count)
+    ]
+
+
+def get_urls(count, keywords, hit_rate=0.05):
+    """
+    Get the candidate urls, part of them contain a keyword
+    """
+    urls = []
+    for _ in range(count):
+        url = f"http://{random_word()}.{random_word(2, 3)}:{random.randint(1000, 9999)}/{random_word()}/{random_word()}.m3u8"
+        if random.random() < hit_rate:
+            url = url.replace("/", random.choice(keywords), 1) if random.random() < 0.5 else url + random.choice(
+                keywords)
+        urls.append(url)
+    return urls
+
+
+def main(keywords_count=5000, urls_count=500000, naive_sample=2000):
+    keywords = get_keywords(keywords_count)
+    urls = get_urls(urls_count, keywords)
+
+    start_time = time()
+    matcher = KeywordMatcher(keywords)
+    build_time = time() - start_time
+
+    start_time = time()
+    matched = sum(1 for url in urls if matcher.search(url))
+    matcher_time = time() - start_time
+
+    sample = urls[:naive_sample]
+    start_time = time()
+    naive_result = [any(keyword in url for keyword in keywords) for url in sample]
+    naive_time = (time() - start_time) / len(sample) * len(urls)
+    assert naive_result == [matcher.search(url) for url in sample], "Matcher result differs from naive result"
+
+    print(f"Keywords: {keywords_count}, URLs: {urls_count}, matched: {matched}")
+    print(f"Backend: {'pyahocorasick' if matcher.automaton is not None else 'python'}")
+    print(f"Automaton build: {build_time:.3f}s")
+    print(f"Automaton match: {matcher_time:.3f}s")
+    print(f"Naive match (estimated from {naive_sample} urls): {naive_time:.3f}s")
+    print(f"Speedup: {naive_time / matcher_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
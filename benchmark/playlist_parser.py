@@ -0,0 +1,107 @@
+import codecs
+import os
+import sys
+import tracemalloc
+from time import perf_counter
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import utils.constants as constants
+from utils.playlist import parse_playlist
+from utils.tools import get_name_url
+
+corpus_dir = os.path.join(os.path.dirname(__file__), "playlist_corpus")
+
+
+def parse_by_pattern(content: str, open_headers: bool = False) -> list[dict]:
+    """
+    Parse the whole content by the multiline patterns as the subscribe did
+    """
+    m3u_type = "#EXTM3U" in content
+    return get_name_url(
+        content,
+        pattern=constants.multiline_m3u_pattern if m3u_type else constants.multiline_txt_pattern,
+        open_headers=open_headers if m3u_type else False
+    )
+
+
+def get_chunks(content: str, chunk_size: int):
+    """
+    Split the content into chunks as the streaming response gives
+    """
+    for i in range(0, len(content), chunk_size):
+        yield content[i:i + chunk_size]
+
+
+def check_corpus():
+    """
+    Check the streaming parser gives the same records as the patterns on the corpus, with different chunk sizes
+    """
+    for file_name in sorted(os.listdir(corpus_dir)):
+        with open(os.path.join(corpus_dir, file_name), "r", encoding="utf-8", newline="") as f:
+            content = f.read()
+        for open_headers in (False, True):
+            expected = parse_by_pattern(content, open_headers)
+            for chunk_size in (1, 7, 64, 65536):
+                result = list(parse_playlist(get_chunks(content, chunk_size), open_headers=open_headers))
+                assert result == expected, f"{file_name} differs (chunk size: {chunk_size}, headers: {open_headers})"
+        print(f"Corpus {file_name}: {len(expected)} records matched")
+
+
+def get_synthetic_playlist(size_mb: int) -> str:
+    """
+    Generate the M3U playlist of the size
+    """
+    lines = ["#EXTM3U"]
+    total = 0
+    i = 0
+    while total < size_mb * 1024 * 1024:
+        entry = (
+            f'#EXTINF:-1 tvg-id="{i}" tvg-name="CCTV{i % 17}" group-title="分组{i % 9}" catchup="append" '
+            f'catchup-source="?playseek=${{(b)yyyyMMddHHmmss}}",CCTV-{i % 17} 频道{i}\n'
+            f"http://example{i % 31}.com:8080/live/{i}/index.m3u8?token={i * 7919}$线路{i % 5}"
+        )
+        lines.append(entry)
+        total += len(entry) + 1
+        i += 1
+    return "\n".join(lines) + "\n"
+
+
+def measure(func) -> tuple[float, float, int]:
+    """
+    Measure the time and peak memory (in a separate traced run) of the function, return (seconds, peak MB, records)
+    """
+    start_time = perf_counter()
+    result = func()
+    elapsed = perf_counter() - start_time
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 1024 / 1024, result
+
+
+def main(size_mb=30, chunk_size=65536):
+    check_corpus()
+    content = get_synthetic_playlist(size_mb)
+    data = content.encode("utf-8")
+    del content
+
+    def run_pattern():
+        return len(parse_by_pattern(data.decode("utf-8")))
+
+    def run_streaming():
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        chunks = (decoder.decode(data[i:i + chunk_size]) for i in range(0, len(data), chunk_size))
+        return len(list(parse_playlist(chunks)))
+
+    pattern_time, pattern_peak, pattern_count = measure(run_pattern)
+    streaming_time, streaming_peak, streaming_count = measure(run_streaming)
+    assert pattern_count == streaming_count, "Record count differs"
+    print(f"Playlist: {len(data) / 1024 / 1024:.1f} MB, {pattern_count} records, chunk size: {chunk_size}")
+    print(f"Pattern: {pattern_time:.2f}s, peak {pattern_peak:.1f} MB")
+    print(f"Streaming: {streaming_time:.2f}s, peak {streaming_peak:.1f} MB")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,81 @@
+import os
+import re
+import sys
+from time import perf_counter
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from bs4 import BeautifulSoup
+
+from utils.channel import get_results_from_multicast_soup_requests, get_results_from_soup_requests
+from utils.result_page import parse_result_page
+
+pages_dir = os.path.join(os.path.dirname(__file__), "result_pages")
+
+
+def get_code(hrefs: list[str]) -> str | None:
+    """
+    Get the pagination code from the link hrefs
+    """
+    for href in hrefs:
+        code = parse_qs(urlparse(href).query).get("code", [None])[0]
+        if code:
+            return code
+    return None
+
+
+def extract_by_soup(source: str) -> tuple:
+    """
+    Extract the results by the html.parser soup of the comment stripped source as the requests path did
+    """
+    soup = BeautifulSoup(re.sub(r"<!--.*?-->", "", source, flags=re.DOTALL), "html.parser")
+    return (
+        "About 0 results" in soup.text,
+        get_code([a["href"] for a in soup.find_all("a", href=True)]),
+        get_results_from_multicast_soup_requests(soup),
+        get_results_from_multicast_soup_requests(soup, hotel=True),
+        get_results_from_soup_requests(soup, "CCTV1"),
+    )
+
+
+def extract_by_page(source: str) -> tuple:
+    """
+    Extract the results by the result page parser
+    """
+    page = parse_result_page(source)
+    return (
+        "About 0 results" in page.text,
+        get_code(page.hrefs),
+        get_results_from_multicast_soup_requests(page),
+        get_results_from_multicast_soup_requests(page, hotel=True),
+        get_results_from_soup_requests(page, "CCTV1"),
+    )
+
+
+def measure(func, source: str, repeat: int) -> float:
+    """
+    Get the average milliseconds of the function on the source
+    """
+    start_time = perf_counter()
+    for _ in range(repeat):
+        func(source)
+    return (perf_counter() - start_time) / repeat * 1000
+
+
+def main(repeat: int = 50):
+    for file_name in sorted(os.listdir(pages_dir)):
+        with open(os.path.join(pages_dir, file_name), "r", encoding="utf-8") as f:
+            source = f.read()
+        expected = extract_by_soup(source)
+        assert extract_by_page(source) == expected, f"{file_name} differs"
+        soup_time = measure(extract_by_soup, source, repeat)
+        page_time = measure(extract_by_page, source, repeat)
+        print(
+            f"{file_name}: {len(source) / 1024:.1f}KB, results {len(expected[2])}/{len(expected[3])}/{len(expected[4])}, "
+            f"soup {soup_time:.2f}ms, result page {page_time:.2f}ms ({soup_time / page_time:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
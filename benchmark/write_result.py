@@ -0,0 +1,75 @@
+import os
+import random
+import sys
+import tempfile
+from time import perf_counter
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import utils.constants as constants
+from utils.channel import write_result_files
+
+origins = ["subscribe", "hotel", "multicast", "online_search", "local", "whitelist", "live", "hls"]
+
+
+def get_synthetic_data(channels: int, urls: int, categories: int = 50) -> dict:
+    """
+    Generate the sorted channel data, the channels are spread over the categories
+    """
+    rand = random.Random(0)
+    data = {}
+    for i in range(channels):
+        cate = data.setdefault(f"分类{i % categories}", {})
+        cate[f"频道{i}"] = [
+            {
+                "id": i * urls + j,
+                "url": f"http://{rand.randint(1, 255)}.{rand.randint(0, 255)}.0.{j}:8080/live/{i}/{j}.m3u8",
+                "host": None,
+                "date": None,
+                "resolution": "1920x1080",
+                "origin": rand.choice(origins),
+                "ipv_type": "ipv6" if rand.random() < 0.3 else "ipv4",
+                "headers": {"User-Agent": "okhttp"} if j == 0 else None,
+            }
+            for j in range(urls)
+        ]
+    return data
+
+
+def get_file_list() -> list[dict]:
+    """
+    Get all the result file variants, including the live and hls ones
+    """
+    return [
+        {"path": "result.txt", "enable_log": False},
+        {"path": constants.ipv4_result_path, "ipv_type_prefer": ["ipv4"]},
+        {"path": constants.ipv6_result_path, "ipv_type_prefer": ["ipv6"]},
+        {"path": constants.live_result_path, "live": True},
+        {"path": constants.live_ipv4_result_path, "live": True, "ipv_type_prefer": ["ipv4"]},
+        {"path": constants.live_ipv6_result_path, "live": True, "ipv_type_prefer": ["ipv6"]},
+        {"path": constants.hls_result_path, "hls": True},
+        {"path": constants.hls_ipv4_result_path, "hls": True, "ipv_type_prefer": ["ipv4"]},
+        {"path": constants.hls_ipv6_result_path, "hls": True, "ipv_type_prefer": ["ipv6"]},
+    ]
+
+
+def main(channels: int = 5000, urls: int = 10, rounds: int = 3):
+    data = get_synthetic_data(channels, urls)
+    file_list = get_file_list()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        os.chdir(temp_dir)
+        for dir_name in ["output/ipv4", "output/ipv6", "output/data"]:
+            os.makedirs(dir_name, exist_ok=True)
+        times = []
+        for _ in range(rounds):
+            start_time = perf_counter()
+            write_result_files(data, file_list, "http://localhost:8000/live/", "http://localhost:8000/hls/",
+                               ipv_type_prefer=["ipv4", "ipv6"], origin_type_prefer=[], first_channel_name="频道0")
+            times.append(perf_counter() - start_time)
+        size = sum(os.path.getsize(file["path"]) for file in file_list)
+    print(f"{channels} channels x {urls} urls, {len(file_list)} variants, {size / 1024 / 1024:.1f}MB txt")
+    print(f"Write result files: best {min(times):.2f}s of {rounds}")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
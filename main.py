@@ -1,16 +1,15 @@
 import asyncio
 import copy
 import datetime
-import gzip
+import multiprocessing
 import os
-import pickle
 from time import time
 
 import pytz
 from tqdm import tqdm
 
 import utils.constants as constants
-from updates.epg import get_epg
+from updates.epg.request import get_epg
 from updates.fofa import get_channels_by_fofa
 from updates.hotel import get_channels_by_hotel
 from updates.multicast import get_channels_by_multicast
@@ -23,6 +22,10 @@ from utils.channel import (
     write_channel_to_file, sort_channel_result,
 )
 from utils.config import config
+from utils.driver.pool import close_driver_pool
+from utils.history import save_history, compact_history
+from utils.pipeline import ChannelPipeline
+from utils.requests.tools import close_session
 from utils.tools import (
     get_pbar_remaining,
     get_ip_address,
@@ -38,6 +41,19 @@ from utils.tools import (
 from utils.types import CategoryChannelData
 
 
+def print_source_report(report: list[tuple[str, float, int, str]], total_time: float):
+    """
+    Print the time spent and the result of each source
+    """
+    if not report:
+        return
+    print("Source fetch report:")
+    for setting, elapsed, count, status in report:
+        print(f"  {setting}: {elapsed:.2f}s, {count} items, {status}")
+    serial_time = sum(item[1] for item in report)
+    print(f"Source fetch time: {total_time:.2f}s (sum of sources: {serial_time:.2f}s)")
+
+
 class UpdateSource:
 
     def __init__(self):
@@ -59,7 +75,11 @@ class UpdateSource:
         self.ipv6_support = False
         self.now = None
 
-    async def visit_page(self, channel_names: list[str] = None):
+    async def visit_page(self, channel_names: list[str] = None, on_result=None):
+        """
+        Fetch all the enabled sources concurrently
+        :param on_result: Called with the source name and result as soon as each source is fetched
+        """
         tasks_config = [
             ("hotel_fofa", get_channels_by_fofa, "hotel_fofa_result"),
             ("multicast", get_channels_by_multicast, "multicast_result"),
@@ -73,6 +93,7 @@ class UpdateSource:
             ("epg", get_epg, "epg_result"),
         ]
 
+        sources = []
         for setting, task_func, result_attr in tasks_config:
             if (
                     setting == "hotel_foodie" or setting == "hotel_fofa"
@@ -85,21 +106,75 @@ class UpdateSource:
                     if not os.getenv("GITHUB_ACTIONS") and config.cdn_url:
                         subscribe_urls = [join_url(config.cdn_url, url) if "raw.githubusercontent.com" in url else url
                                           for url in subscribe_urls]
-                    task = asyncio.create_task(
-                        task_func(subscribe_urls,
-                                  names=channel_names,
-                                  whitelist=whitelist_urls,
-                                  callback=self.update_progress
-                                  )
-                    )
+                    coro = task_func(subscribe_urls,
+                                     names=channel_names,
+                                     whitelist=whitelist_urls,
+                                     callback=self.update_progress
+                                     )
                 elif setting == "hotel_foodie" or setting == "hotel_fofa":
-                    task = asyncio.create_task(task_func(callback=self.update_progress))
+                    coro = task_func(callback=self.update_progress)
                 else:
-                    task = asyncio.create_task(
-                        task_func(channel_names, callback=self.update_progress)
-                    )
-                self.tasks.append(task)
-                setattr(self, result_attr, await task)
+                    coro = task_func(channel_names, callback=self.update_progress)
+                sources.append((setting, result_attr, coro))
+
+        start_time = time()
+        tasks = [asyncio.create_task(self.fetch_source(setting, coro, on_result)) for setting, _, coro in sources]
+        self.tasks.extend(tasks)
+        results = await asyncio.gather(*tasks)
+        close_session()
+        if config.open_driver:
+            close_driver_pool()
+        report = []
+        for (setting, result_attr, _), (result, elapsed, status) in zip(sources, results):
+            setattr(self, result_attr, result)
+            report.append((setting, elapsed, len(result) if result else 0, status))
+        print_source_report(report, time() - start_time)
+
+    @staticmethod
+    async def fetch_source(setting: str, coro, on_result=None) -> tuple[dict, float, str]:
+        """
+        Fetch the source within the source timeout, return (result, time spent, status)
+        """
+        start_time = time()
+        result = {}
+        status = "ok"
+        try:
+            result = await asyncio.wait_for(coro, timeout=config.source_timeout or None)
+        except asyncio.TimeoutError:
+            status = "timeout"
+            print(f"❌ Source {setting} timeout after {config.source_timeout}s")
+        except Exception as e:
+            status = "error"
+            print(f"❌ Error on source {setting}: {e}")
+        if on_result:
+            on_result(setting, result)
+        return result, time() - start_time, status
+
+    def add_test_total(self):
+        self.total += 1
+        self.pbar.total = self.total
+
+    async def process_pipeline(self, channel_names: list[str]) -> CategoryChannelData:
+        """
+        Fetch, test and sort the channels in pipeline, return the cache result
+        """
+        self.total = 0
+        self.start_time = time()
+        self.pbar = tqdm(total=0, desc="Speed test")
+        pipeline = ChannelPipeline(
+            self.channel_items,
+            ipv6_support=self.ipv6_support,
+            callback=lambda: self.pbar_update(name="测速", item_name="接口"),
+            enqueue_callback=self.add_test_total
+        )
+        pipeline_task = asyncio.create_task(pipeline.run())
+        self.tasks.append(pipeline_task)
+        await self.visit_page(channel_names, on_result=pipeline.set_source_result)
+        pipeline.finish_sources()
+        channel_data, test_result, self.channel_data = await pipeline_task
+        self.pbar.close()
+        print(f"Total urls: {get_urls_len(channel_data)}, tested: {self.total}")
+        return merge_objects(channel_data, test_result, match_key="url")
 
     def pbar_update(self, name: str = "", item_name: str = ""):
         if self.pbar.n < self.total:
@@ -109,6 +184,55 @@ class UpdateSource:
                 int((self.pbar.n / self.total) * 100),
             )
 
+    async def process_phased(self, channel_names: list[str]) -> CategoryChannelData:
+        """
+        Fetch, aggregate, test and sort the channels stage by stage, return the cache result
+        """
+        await self.visit_page(channel_names)
+        self.tasks = []
+        append_total_data(
+            self.channel_items.items(),
+            self.channel_data,
+            self.hotel_fofa_result,
+            self.multicast_result,
+            self.hotel_foodie_result,
+            self.subscribe_result,
+            self.online_search_result,
+        )
+        cache_result = self.channel_data
+        test_result = {}
+        if config.open_speed_test:
+            urls_total = get_urls_len(self.channel_data)
+            test_data = copy.deepcopy(self.channel_data)
+            process_nested_dict(
+                test_data,
+                seen=set(),
+                filter_host=config.speed_test_filter_host,
+                ipv6_support=self.ipv6_support
+            )
+            self.total = get_urls_len(test_data)
+            print(f"Total urls: {urls_total}, need to test speed: {self.total}")
+            self.update_progress(
+                f"正在进行测速, 共{urls_total}个接口, {self.total}个接口需要进行测速",
+                0,
+            )
+            self.start_time = time()
+            self.pbar = tqdm(total=self.total, desc="Speed test")
+            test_result = await test_speed(
+                test_data,
+                ipv6=self.ipv6_support,
+                callback=lambda: self.pbar_update(name="测速", item_name="接口"),
+            )
+            cache_result = merge_objects(cache_result, test_result, match_key="url")
+            self.pbar.close()
+        self.channel_data = sort_channel_result(
+            self.channel_data,
+            result=test_result,
+            filter_host=config.speed_test_filter_host,
+            ipv6_support=self.ipv6_support
+        )
+        return cache_result
+
     async def main(self):
         try:
             main_start_time = time()
@@ -122,49 +246,11 @@ class UpdateSource:
                 if not channel_names:
                     print(f"❌ No channel names found! Please check the {config.source_file}!")
                     return
-                await self.visit_page(channel_names)
-                self.tasks = []
-                append_total_data(
-                    self.channel_items.items(),
-                    self.channel_data,
-                    self.hotel_fofa_result,
-                    self.multicast_result,
-                    self.hotel_foodie_result,
-                    self.subscribe_result,
-                    self.online_search_result,
-                )
-                cache_result = self.channel_data
-                test_result = {}
-                if config.open_speed_test:
-                    urls_total = get_urls_len(self.channel_data)
-                    test_data = copy.deepcopy(self.channel_data)
-                    process_nested_dict(
-                        test_data,
-                        seen=set(),
-                        filter_host=config.speed_test_filter_host,
-                        ipv6_support=self.ipv6_support
-                    )
-                    self.total = get_urls_len(test_data)
-                    print(f"Total urls: {urls_total}, need to test speed: {self.total}")
-                    self.update_progress(
-                        f"正在进行测速, 共{urls_total}个接口, {self.total}个接口需要进行测速",
-                        0,
-                    )
-                    self.start_time = time()
-                    self.pbar = tqdm(total=self.total, desc="Speed test")
-                    test_result = await test_speed(
-                        test_data,
-                        ipv6=self.ipv6_support,
-                        callback=lambda: self.pbar_update(name="测速", item_name="接口"),
-                    )
-                    cache_result = merge_objects(cache_result, test_result, match_key="url")
-                    self.pbar.close()
-                self.channel_data = sort_channel_result(
-                    self.channel_data,
-                    result=test_result,
-                    filter_host=config.speed_test_filter_host,
-                    ipv6_support=self.ipv6_support
-                )
+                if config.open_pipeline and config.open_speed_test:
+                    cache_result = await self.process_pipeline(channel_names)
+                    self.tasks = []
+                else:
+                    cache_result = await self.process_phased(channel_names)
                 self.update_progress(f"正在生成结果文件", 0)
                 write_channel_to_file(
                     self.channel_data,
@@ -173,15 +259,8 @@ class UpdateSource:
                     first_channel_name=channel_names[0],
                 )
                 if config.open_history:
-                    if os.path.exists(constants.cache_path):
-                        with gzip.open(constants.cache_path, "rb") as file:
-                            try:
-                                cache = pickle.load(file)
-                            except EOFError:
-                                cache = {}
-                            cache_result = merge_objects(cache, cache_result, match_key="url")
-                    with gzip.open(constants.cache_path, "wb") as file:
-                        pickle.dump(cache_result, file)
+                    await asyncio.to_thread(save_history, cache_result)
+                    await asyncio.to_thread(compact_history)
                 print(
                     f"🥳 Update completed! Total time spent: {format_interval(time() - main_start_time)}."
                 )
@@ -240,6 +319,7 @@ class UpdateSource:
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     info = get_version_info()
     print(f"✡️ {info['name']} Version: {info['version']}")
     loop = asyncio.new_event_loop()
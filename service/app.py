@@ -2,7 +2,7 @@ import os
 import sys
 
 sys.path.append(os.path.dirname(sys.path[0]))
-from flask import Flask, send_from_directory, make_response, jsonify, redirect
+from flask import Flask, send_from_directory, make_response, jsonify, redirect, request
 from utils.tools import get_result_file_content, get_ip_address, resource_path, join_url, add_port_to_url, \
     get_url_without_scheme
 from utils.config import config
@@ -13,6 +13,9 @@ import atexit
 from collections import OrderedDict
 import threading
 import json
+from time import time
+from updates.epg.store import get_now_next, get_channel_programmes, get_date_range, get_updated_at
+from utils.result_log import get_result_log_summary, read_result_log, read_result_log_range
 
 app = Flask(__name__)
 nginx_dir = resource_path(os.path.join('utils', 'nginx-rtmp-win32'))
@@ -181,16 +184,83 @@ def show_epg_gz():
     return get_result_file_content(path=constants.epg_gz_result_path, file_type="gz", show_content=False)
 
 
+def get_epg_response(data, max_age):
+    """
+    Get the json response of the EPG query with the caching headers
+    """
+    response = jsonify(data)
+    response.cache_control.public = True
+    response.cache_control.max_age = max(1, min(int(max_age), constants.epg_cache_max_age))
+    updated_at = get_updated_at(constants.epg_data_path)
+    if updated_at:
+        response.last_modified = updated_at
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+@app.route("/epg/now")
+def show_epg_now():
+    if not os.path.exists(constants.epg_data_path):
+        return jsonify({'Error': constants.waiting_tip}), 404
+    now = int(time())
+    channel = request.args.get("channel")
+    result, expires = get_now_next(constants.epg_data_path, channel, now)
+    if channel and channel not in result:
+        return jsonify({'Error': 'Channel not found'}), 404
+    return get_epg_response(result, (expires or now + constants.epg_cache_max_age) - now)
+
+
+@app.route("/epg/programmes")
+def show_epg_programmes():
+    if not os.path.exists(constants.epg_data_path):
+        return jsonify({'Error': constants.waiting_tip}), 404
+    channel = request.args.get("channel")
+    if not channel:
+        return jsonify({'Error': 'Channel is required'}), 400
+    try:
+        if request.args.get("date"):
+            start, end = get_date_range(request.args["date"])
+        else:
+            now = int(time())
+            start = int(request.args.get("start", now))
+            end = int(request.args.get("end", start + 86400))
+    except ValueError:
+        return jsonify({'Error': 'Invalid date or time range'}), 400
+    programmes = get_channel_programmes(constants.epg_data_path, channel, start, end)
+    return get_epg_response({"channel": channel, "programmes": programmes}, constants.epg_cache_max_age)
+
+
 @app.route("/log")
 def show_log():
-    if os.path.exists(constants.result_log_path):
-        with open(constants.result_log_path, "r", encoding="utf-8") as file:
-            content = file.read()
-    else:
-        content = constants.waiting_tip
-    response = make_response(content)
-    response.mimetype = "text/plain"
-    return response
+    if not os.path.exists(constants.result_log_path):
+        response = make_response(constants.waiting_tip)
+        response.mimetype = "text/plain"
+        return response
+    channel = request.args.get("channel")
+    if channel:
+        summary = get_result_log_summary()
+        if summary is None:
+            return jsonify({'Error': constants.waiting_tip}), 404
+        items = [item for item in summary["channels"] if item["name"] == channel]
+        if not items:
+            return jsonify({'Error': 'Channel not found'}), 404
+        response = make_response(b"".join(read_result_log_range(item["offset"], item["length"]) for item in items))
+        response.mimetype = "text/plain"
+        return response
+    try:
+        offset = int(request.args.get("offset", 0))
+        limit = int(request.args["limit"]) if "limit" in request.args else None
+    except ValueError:
+        return jsonify({'Error': 'Invalid offset or limit'}), 400
+    return app.response_class(read_result_log(offset=offset, limit=limit), mimetype="text/plain")
+
+
+@app.route("/log/summary")
+def show_log_summary():
+    summary = get_result_log_summary()
+    if summary is None:
+        return jsonify({'Error': constants.waiting_tip}), 404
+    return jsonify(summary)
 
 
 def get_channel_data(channel_id):
@@ -359,6 +429,8 @@ def run_service():
                 print(f"🚀 HLS api: {ip_address}/hls")
             print(f"🚀 IPv4 api: {ip_address}/ipv4")
             print(f"🚀 IPv6 api: {ip_address}/ipv6")
+            if config.open_epg:
+                print(f"📅 EPG api: {ip_address}/epg/now")
             print(f"✅ You can use this url to watch IPTV 📺: {ip_address}")
             app.run(host="0.0.0.0", port=config.app_port)
     except Exception as e:
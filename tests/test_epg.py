@@ -0,0 +1,24 @@
+from updates.epg.request import parse_epg_time
+from updates.epg.tools import merge_programmes
+
+
+def get_programme(start: str, stop: str, title: str) -> tuple:
+    start, start_timestamp = parse_epg_time(start)
+    stop, stop_timestamp = parse_epg_time(stop)
+    return start, stop, title, start_timestamp, stop_timestamp
+
+
+def test_merge_programmes_of_sources_in_different_offsets():
+    utc_source = [
+        get_programme("20250101000000 +0000", "20250101010000 +0000", "news"),
+        get_programme("20250101010000 +0000", "20250101020000 +0000", "sports"),
+    ]
+    local_source = [
+        get_programme("20250101070000 +0800", "20250101080000 +0800", "morning"),
+        get_programme("20250101083000 +0800", "20250101093000 +0800", "news"),
+        get_programme("20250101100000 +0800", "20250101110000 +0800", "movie"),
+    ]
+    merged = merge_programmes(merge_programmes([], utc_source), local_source)
+    assert [programme[2] for programme in merged] == ["morning", "news", "sports", "movie"]
+    assert [programme[3] for programme in merged] == sorted(programme[3] for programme in merged)
+    assert merged[1] == utc_source[0]
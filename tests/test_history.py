@@ -0,0 +1,20 @@
+import utils.constants as constants
+from utils.config import config
+from utils.history import compact_history, get_history, save_history
+
+
+def test_dead_history_url_is_evicted_after_fail_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(constants, "history_path", str(tmp_path / "history.db"))
+    config.set("Settings", "history_fail_limit", "3")
+    alive = {"url": "http://1.1.1.1/live.m3u8", "origin": "subscribe", "delay": 100}
+    dead = {"url": "http://2.2.2.2/live.m3u8", "origin": "subscribe", "delay": -1}
+    channels = {"央视频道": {"CCTV1": []}}
+
+    save_history({"央视频道": {"CCTV1": [alive, dead]}})
+    compact_history()
+    assert {item["url"] for item in get_history(channels)["央视频道"]["CCTV1"]} == {alive["url"], dead["url"]}
+
+    for _ in range(2):
+        save_history({"央视频道": {"CCTV1": [alive]}})
+        compact_history()
+    assert [item["url"] for item in get_history(channels)["央视频道"]["CCTV1"]] == [alive["url"]]
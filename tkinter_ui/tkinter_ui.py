@@ -10,6 +10,7 @@ from utils.config import config
 from utils.tools import resource_path, get_version_info
 from main import UpdateSource
 import asyncio
+import multiprocessing
 import threading
 import webbrowser
 from about import AboutUI
@@ -125,6 +126,7 @@ class TkinterUI:
         if self.now:
             self.update_source.stop()
 
+        config.refresh_snapshot()
         loop = asyncio.new_event_loop()
 
         def run_loop():
@@ -310,6 +312,7 @@ def get_root_location(root):
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     root = tk.Tk()
     tkinter_ui = TkinterUI(root)
     tkinter_ui.init_UI()
@@ -1,2 +0,0 @@
-from .request import get_epg
-from .tools import write_to_xml, compress_to_gz
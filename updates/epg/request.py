@@ -1,54 +1,219 @@
+import asyncio
+import codecs
 import os
 import re
 import xml.etree.ElementTree as ET
+import zlib
 from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor
-from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime, timedelta, timezone
 from time import time
 
-from requests import Session, exceptions
 from tqdm.asyncio import tqdm_asyncio
 
 import utils.constants as constants
+from updates.epg.tools import merge_programmes
 from utils.channel import format_channel_name
 from utils.config import config
-from utils.retry import retry_func
-from utils.tools import get_pbar_remaining, get_urls_from_file, opencc_t2s, join_url
+from utils.requests.cache import fetch_cached, feed_parser
+from utils.requests.tools import get_client_session
+from utils.retry import retry_async_func
+from utils.tools import get_pbar_remaining, get_process_context, get_urls_from_file, opencc_t2s, join_url
 
 
-def parse_epg(epg_content):
-    try:
-        parser = ET.XMLParser(encoding='UTF-8')
-        root = ET.fromstring(epg_content, parser=parser)
-    except ET.ParseError as e:
-        print(f"Error parsing XML: {e}")
-        print(f"Problematic content: {epg_content[:500]}")
-        return {}, defaultdict(list)
-
-    channels = {}
-    programmes = defaultdict(list)
-
-    for channel in root.findall('channel'):
-        channel_id = channel.get('id')
-        display_name = channel.find('display-name').text
-        channels[channel_id] = display_name
-
-    for programme in root.findall('programme'):
-        channel_id = programme.get('channel')
-        channel_start = datetime.strptime(
-            re.sub(r'\s+', '', programme.get('start')), "%Y%m%d%H%M%S%z")
-        channel_stop = datetime.strptime(
-            re.sub(r'\s+', '', programme.get('stop')), "%Y%m%d%H%M%S%z")
-        channel_text = opencc_t2s.convert(programme.find('title').text)
-        channel_elem = ET.SubElement(
-            root, 'programme', attrib={"channel": channel_id, "start": channel_start.strftime("%Y%m%d%H%M%S +0800"),
-                                       "stop": channel_stop.strftime("%Y%m%d%H%M%S +0800")})
-        channel_elem_s = ET.SubElement(
-            channel_elem, 'title', attrib={"lang": "zh"})
-        channel_elem_s.text = channel_text
-        programmes[channel_id].append(channel_elem)
-
-    return channels, programmes
+def parse_epg_time(value: str) -> tuple[str, float]:
+    """
+    Parse the XMLTV time, return (the result time with the offset written as +0800, timestamp)
+    """
+    value = re.sub(r'\s+', '', value)
+    match = constants.epg_time_pattern.fullmatch(value)
+    if match:
+        digits, sign, hours, minutes = match.groups()
+        offset = timedelta(hours=int(hours), minutes=int(minutes))
+        parsed = datetime(
+            int(digits[:4]), int(digits[4:6]), int(digits[6:8]), int(digits[8:10]), int(digits[10:12]),
+            int(digits[12:]), tzinfo=timezone(-offset if sign == "-" else offset)
+        )
+        return f"{digits} +0800", parsed.timestamp()
+    parsed = datetime.strptime(value, "%Y%m%d%H%M%S%z")
+    return parsed.strftime("%Y%m%d%H%M%S +0800"), parsed.timestamp()
+
+
+def get_epg_window() -> tuple[float | None, float | None]:
+    """
+    Get the (start, end) timestamps of the programmes to keep, from the day start of epg_past_days ago to the day
+    end of epg_future_days later, None if the side is not limited
+    """
+    today = datetime.combine(date.today(), datetime.min.time())
+    past_days = config.epg_past_days
+    future_days = config.epg_future_days
+    return (
+        (today - timedelta(days=past_days)).timestamp() if past_days > 0 else None,
+        (today + timedelta(days=future_days + 1)).timestamp() if future_days > 0 else None
+    )
+
+
+class EpgParser:
+    """
+    Incremental XMLTV parser, the (gzip) response bytes are fed as they arrive and each element is cleared once it is
+    parsed, only the programmes of the channels in names within the window are kept as (start, stop, title,
+    start timestamp, stop timestamp) tuples.
+    The result (channels, programmes) is given on close.
+    """
+
+    binary = True
+
+    def __init__(self, names=None, window: tuple[float | None, float | None] = (None, None)):
+        self.names = set(names) if names else None
+        self.window_start, self.window_end = window
+        self.decompressor = None
+        self.head = b""
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.parser = ET.XMLPullParser(events=("start", "end"))
+        self.root = None
+        self.failed = False
+        self.channels = {}
+        self.ignored_channels = set()
+        self.programmes = defaultdict(list)
+        self.titles = {}
+
+    def feed(self, chunk: bytes) -> list:
+        """
+        Feed a chunk of the response
+        """
+        if self.decompressor is None:
+            self.head += chunk
+            if len(self.head) < 2:
+                return []
+            chunk, self.head = self.head, b""
+            self.decompressor = zlib.decompressobj(wbits=31) if chunk[:2] == b"\x1f\x8b" else False
+        for data in self.get_slices(chunk):
+            self.parse(self.decoder.decode(data))
+        return []
+
+    def get_slices(self, chunk: bytes):
+        """
+        Split the (decompressed) chunk into slices, so that the pending parse events stay bounded
+        """
+        size = constants.epg_slice_size
+        if self.decompressor:
+            yield self.decompressor.decompress(chunk, size)
+            while self.decompressor.unconsumed_tail:
+                yield self.decompressor.decompress(self.decompressor.unconsumed_tail, size)
+        else:
+            for i in range(0, len(chunk), size):
+                yield chunk[i:i + size]
+
+    def close(self) -> list:
+        """
+        Finish the parsing, return [(channels, programmes)]
+        """
+        if self.decompressor is None:
+            self.decompressor = False
+            self.parse(self.decoder.decode(self.head))
+        elif self.decompressor:
+            self.parse(self.decoder.decode(self.decompressor.flush()))
+        self.parse(self.decoder.decode(b"", final=True), close=True)
+        for channel_id in self.ignored_channels:
+            self.programmes.pop(channel_id, None)
+        return [(self.channels, dict(self.programmes))]
+
+    def parse(self, text: str, close: bool = False):
+        """
+        Parse the text and handle the completed elements
+        """
+        if self.failed:
+            return
+        try:
+            if text:
+                self.parser.feed(text)
+            if close:
+                self.parser.close()
+            for event, elem in self.parser.read_events():
+                if event == "start":
+                    if self.root is None:
+                        self.root = elem
+                    continue
+                if elem.tag == "channel":
+                    self.handle_channel(elem)
+                elif elem.tag == "programme":
+                    self.handle_programme(elem)
+                else:
+                    continue
+                elem.clear()
+                self.root.clear()
+        except (ET.ParseError, ValueError) as e:
+            self.failed = True
+            print(f"Error parsing XML: {e}")
+
+    def handle_channel(self, elem):
+        """
+        Keep the channel if its display name is in names
+        """
+        channel_id = elem.get('id')
+        display_name = elem.findtext('display-name')
+        if display_name is not None and (self.names is None or format_channel_name(display_name) in self.names):
+            self.channels[channel_id] = display_name
+        else:
+            self.ignored_channels.add(channel_id)
+            self.programmes.pop(channel_id, None)
+
+    def handle_programme(self, elem):
+        """
+        Keep the programme of the kept (or not yet seen) channel within the window
+        """
+        channel_id = elem.get('channel')
+        if channel_id in self.ignored_channels:
+            return
+        try:
+            start, start_timestamp = parse_epg_time(elem.get('start'))
+            stop, stop_timestamp = parse_epg_time(elem.get('stop'))
+        except (TypeError, ValueError):
+            return
+        if (self.window_start is not None and stop_timestamp <= self.window_start) or (
+                self.window_end is not None and start_timestamp >= self.window_end):
+            return
+        title = elem.findtext('title') or ""
+        if title not in self.titles:
+            self.titles[title] = opencc_t2s.convert(title)
+        self.programmes[channel_id].append((start, stop, self.titles[title], start_timestamp, stop_timestamp))
+
+
+def parse_epg(epg_content, names=None, window: tuple[float | None, float | None] = (None, None)):
+    """
+    Parse the whole XMLTV content, return (channels, programmes)
+    """
+    parser = EpgParser(names, window)
+    return feed_parser(parser, epg_content if isinstance(epg_content, bytes) else epg_content.encode("utf-8"))[0]
+
+
+def parse_epg_body(body: bytes, window: tuple[float | None, float | None] = (None, None)):
+    """
+    Parse the zlib compressed XMLTV body in slices, return (channels, programmes) of all the channels,
+    it runs in the EPG worker processes
+    """
+    parser = EpgParser(window=window)
+    decompressor = zlib.decompressobj()
+    size = constants.epg_slice_size
+    for i in range(0, len(body), size):
+        parser.feed(decompressor.decompress(body[i:i + size], size))
+        while decompressor.unconsumed_tail:
+            parser.feed(decompressor.decompress(decompressor.unconsumed_tail, size))
+    parser.feed(decompressor.flush())
+    return parser.close()[0]
+
+
+def parse_epg_in_executor(executor, body: bytes, window: tuple[float | None, float | None]):
+    """
+    Parse the body in the worker process, or in the current thread if there is no pool or it is broken
+    """
+    if executor:
+        try:
+            return executor.submit(parse_epg_body, body, window).result()
+        except BrokenProcessPool as e:
+            print(f"Error on parallel epg parsing, fallback to serial: {e}")
+    return parse_epg_body(body, window)
 
 
 async def get_epg(names=None, callback=None):
@@ -63,38 +228,24 @@ async def get_epg(names=None, callback=None):
     )
     start_time = time()
     result = defaultdict(list)
-    all_result_verify = set()
-    session = Session()
+    window = get_epg_window()
+    variant = f"epg:v2:{window[0]}:{window[1]}"
+    workers = min(os.cpu_count() or 1, constants.epg_max_workers, urls_len)
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=get_process_context()) if workers > 1 else None
 
-    def process_run(url):
-        nonlocal all_result_verify, result
+    async def process_run(session, url):
+        epg_result = None
         try:
-            response = None
             try:
-                response = (
-                    retry_func(
-                        lambda: session.get(
-                            url, timeout=config.request_timeout
-                        ),
-                        name=url,
-                    )
+                epg_result = await retry_async_func(
+                    lambda: fetch_cached(
+                        session, url, parse=lambda body: parse_epg_in_executor(executor, body, window),
+                        variant=variant, compressed=True
+                    ),
+                    name=url,
                 )
-            except exceptions.Timeout:
+            except asyncio.TimeoutError:
                 print(f"Timeout on epg: {url}")
-            if response:
-                response.encoding = "utf-8"
-                content = response.text
-                if content:
-                    channels, programmes = parse_epg(content)
-                    for channel_id, display_name in channels.items():
-                        display_name = format_channel_name(display_name)
-                        if names and display_name not in names:
-                            continue
-                        if channel_id not in all_result_verify and display_name not in all_result_verify:
-                            if not channel_id.isdigit():
-                                all_result_verify.add(channel_id)
-                            all_result_verify.add(display_name)
-                            result[display_name] = programmes[channel_id]
         except Exception as e:
             print(f"Error on {url}: {e}")
         finally:
@@ -105,10 +256,22 @@ async def get_epg(names=None, callback=None):
                     f"正在获取EPG源, 剩余{remain}个源待获取, 预计剩余时间: {get_pbar_remaining(n=pbar.n, total=pbar.total, start_time=start_time)}",
                     int((pbar.n / urls_len) * 100),
                 )
+        return epg_result
 
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        for epg_url in urls:
-            executor.submit(process_run, epg_url)
-    session.close()
+    try:
+        async with get_client_session() as session:
+            epg_results = await asyncio.gather(*(process_run(session, epg_url) for epg_url in urls))
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
     pbar.close()
+    for epg_result in epg_results:
+        if not epg_result:
+            continue
+        channels, programmes = epg_result
+        for channel_id, display_name in channels.items():
+            display_name = format_channel_name(display_name)
+            if names and display_name not in names:
+                continue
+            result[display_name] = merge_programmes(result[display_name], programmes.get(channel_id, []))
     return result
@@ -0,0 +1,132 @@
+from datetime import datetime, timedelta, timezone
+from time import time
+
+from utils.db import get_db_connection, return_db_connection
+
+epg_timezone = timezone(timedelta(hours=8))
+
+
+def get_time(timestamp: float) -> str:
+    """
+    Get the result time of the timestamp in the guide timezone, such as 20250101080000 +0800
+    """
+    return datetime.fromtimestamp(timestamp, epg_timezone).strftime("%Y%m%d%H%M%S %z")
+
+
+def init_store(conn):
+    """
+    Make sure the tables of the EPG store exist
+    """
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS programme (channel TEXT, start INTEGER, stop INTEGER, start_time TEXT, "
+        "stop_time TEXT, title TEXT, PRIMARY KEY (channel, start)) WITHOUT ROWID"
+    )
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+
+def write_to_db(programmes, path):
+    """
+    Replace the programmes of the EPG store in one transaction, the readers see either the old or the new guide,
+    the programmes are indexed by their timestamps parsed with the source offset and their times are given in the
+    guide timezone
+    """
+    conn = get_db_connection(path)
+    try:
+        with conn:
+            init_store(conn)
+            conn.execute("DELETE FROM programme")
+            for channel, data in programmes.items():
+                conn.executemany(
+                    "INSERT OR IGNORE INTO programme (channel, start, stop, start_time, stop_time, title) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    ((channel, int(start_timestamp), int(stop_timestamp), get_time(start_timestamp),
+                      get_time(stop_timestamp), title)
+                     for _, _, title, start_timestamp, stop_timestamp in data)
+                )
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('updated_at', ?)", (str(int(time())),))
+    finally:
+        return_db_connection(path, conn)
+
+
+def get_programme(row) -> dict:
+    """
+    Get the programme item of the row (start_time, stop_time, title)
+    """
+    return {"start": row[0], "stop": row[1], "title": row[2]}
+
+
+def get_updated_at(path) -> int | None:
+    """
+    Get the timestamp of the last store update, None if the store is empty
+    """
+    conn = get_db_connection(path)
+    try:
+        init_store(conn)
+        row = conn.execute("SELECT value FROM meta WHERE key = 'updated_at'").fetchone()
+        return int(row[0]) if row else None
+    finally:
+        return_db_connection(path, conn)
+
+
+def get_now_next(path, channel: str = None, now: int = None) -> tuple[dict, int | None]:
+    """
+    Get the current and next programme of the channel (all channels if not given),
+    return ({channel: {"now": item, "next": item}}, the timestamp of the nearest programme change)
+    """
+    now = int(time()) if now is None else now
+    result = {}
+    expires = None
+    conn = get_db_connection(path)
+    try:
+        init_store(conn)
+        if channel is None:
+            channels = [row[0] for row in conn.execute("SELECT DISTINCT channel FROM programme ORDER BY channel")]
+        else:
+            channels = [channel]
+        for name in channels:
+            current = conn.execute(
+                "SELECT start_time, stop_time, title, stop FROM programme WHERE channel = ? AND start <= ? "
+                "ORDER BY start DESC LIMIT 1", (name, now)
+            ).fetchone()
+            upcoming = conn.execute(
+                "SELECT start_time, stop_time, title, start FROM programme WHERE channel = ? AND start > ? "
+                "ORDER BY start LIMIT 1", (name, now)
+            ).fetchone()
+            if current and current[3] <= now:
+                current = None
+            if not current and not upcoming:
+                continue
+            result[name] = {
+                "now": get_programme(current) if current else None,
+                "next": get_programme(upcoming) if upcoming else None,
+            }
+            for item in (current, upcoming):
+                if item and item[3] > now:
+                    expires = item[3] if expires is None else min(expires, item[3])
+    finally:
+        return_db_connection(path, conn)
+    return result, expires
+
+
+def get_channel_programmes(path, channel: str, start: int, end: int) -> list[dict]:
+    """
+    Get the programmes of the channel that overlap the time range [start, end)
+    """
+    conn = get_db_connection(path)
+    try:
+        init_store(conn)
+        rows = conn.execute(
+            "SELECT start_time, stop_time, title FROM programme WHERE channel = ? AND start < ? AND stop > ? "
+            "ORDER BY start", (channel, end, start)
+        ).fetchall()
+    finally:
+        return_db_connection(path, conn)
+    return [get_programme(row) for row in rows]
+
+
+def get_date_range(date: str) -> tuple[int, int]:
+    """
+    Get the time range of the date (such as 20250101) in the guide timezone
+    """
+    begin = datetime.strptime(date, "%Y%m%d").replace(tzinfo=epg_timezone)
+    return int(begin.timestamp()), int((begin + timedelta(days=1)).timestamp())
@@ -1,25 +1,94 @@
-import gzip
-import shutil
-import xml.etree.ElementTree as ET
+from bisect import bisect_left
 from datetime import datetime
-from xml.dom import minidom
 
+from utils.artifact import ArtifactWriter
 
-def write_to_xml(programmes, path):
-    root = ET.Element('tv', attrib={'date': datetime.now().strftime("%Y%m%d%H%M%S +0800")})
-    for channel_id, data in programmes.items():
-        channel_elem = ET.SubElement(root, 'channel', attrib={"id": channel_id})
-        display_name_elem = ET.SubElement(channel_elem, 'display-name', attrib={"lang": "zh"})
-        display_name_elem.text = channel_id
-        for prog in data:
-            prog.set('channel', channel_id)
-            root.append(prog)
 
-    with open(path, 'w', encoding='utf-8') as f:
-        f.write(minidom.parseString(ET.tostring(root, 'utf-8')).toprettyxml(indent='\t', newl='\n'))
+def get_programme_start(programme: tuple) -> float:
+    """
+    Get the start timestamp of the programme (start, stop, title, start timestamp, stop timestamp)
+    """
+    return programme[3]
 
 
-def compress_to_gz(input_path, output_path):
-    with open(input_path, 'rb') as f_in:
-        with gzip.open(output_path, 'wb') as f_out:
-            shutil.copyfileobj(f_in, f_out)
+def merge_programmes(programmes: list[tuple], new_programmes: list[tuple]) -> list:
+    """
+    Merge the programmes of a source into the channel programmes sorted by start, the programmes already kept take
+    precedence, a new programme is only added if it does not overlap any of them. The programmes are compared by
+    their timestamps, the times of the sources in different offsets are not comparable
+    """
+    merged = sorted(programmes, key=get_programme_start)
+    starts = [programme[3] for programme in merged]
+    for programme in sorted(new_programmes, key=get_programme_start):
+        start, stop = programme[3], programme[4]
+        index = bisect_left(starts, start)
+        if index < len(merged) and merged[index][3] < stop:
+            continue
+        if index > 0 and merged[index - 1][4] > start:
+            continue
+        merged.insert(index, programme)
+        starts.insert(index, start)
+    return merged
+
+
+def escape_xml_text(text: str) -> str:
+    """
+    Escape the text of the xml element
+    """
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def escape_xml_attr(value: str) -> str:
+    """
+    Escape the attribute value of the xml element
+    """
+    value = value.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace('"', "&quot;")
+    return value.replace("\r", "&#13;").replace("\n", "&#10;").replace("\t", "&#9;")
+
+
+def get_xml_element(tag: str, attrib: dict, text: str, indent: str) -> str:
+    """
+    Get the xml of the element with the text, indent is None for the compact xml
+    """
+    attrs = "".join(f' {key}="{escape_xml_attr(value)}"' for key, value in attrib.items())
+    newl = "" if indent is None else "\n"
+    if not text:
+        return f"{indent or ''}<{tag}{attrs}/>{newl}"
+    return f"{indent or ''}<{tag}{attrs}>{escape_xml_text(text)}</{tag}>{newl}"
+
+
+def get_channel_xml(channel_id: str, programmes: list[tuple], pretty: bool = True) -> str:
+    """
+    Get the xml of the channel and its programmes (start, stop, title, start timestamp, stop timestamp)
+    """
+    indent, child_indent, newl = ("\t", "\t\t", "\n") if pretty else (None, None, "")
+    parts = [
+        f"{indent or ''}<channel id=\"{escape_xml_attr(channel_id)}\">{newl}",
+        get_xml_element("display-name", {"lang": "zh"}, channel_id, child_indent),
+        f"{indent or ''}</channel>{newl}",
+    ]
+    for start, stop, title, _, _ in programmes:
+        attrs = f' channel="{escape_xml_attr(channel_id)}" start="{escape_xml_attr(start)}" stop="{escape_xml_attr(stop)}"'
+        parts.append(f"{indent or ''}<programme{attrs}>{newl}")
+        parts.append(get_xml_element("title", {"lang": "zh"}, title, child_indent))
+        parts.append(f"{indent or ''}</programme>{newl}")
+    return "".join(parts)
+
+
+def write_to_xml(programmes, path, gz_path=None, pretty=True):
+    """
+    Write the channels and programmes to the xml file (and the gzip file) in one pass, channel by channel, the files
+    are moved into place when completed
+    """
+    date = datetime.now().strftime("%Y%m%d%H%M%S +0800")
+    if pretty:
+        head = f'<?xml version="1.0" ?>\n<tv date="{date}">\n'
+    else:
+        head = f'<?xml version="1.0" encoding="UTF-8"?>\n<tv date="{date}">'
+    with ArtifactWriter(path, gz_path=gz_path, compress=bool(gz_path)) as f:
+        f.write(head)
+        for channel_id, data in programmes.items():
+            f.write(get_channel_xml(channel_id, data, pretty))
+        f.write("</tv>\n")
@@ -1,8 +1,7 @@
 import pickle
 import re
-import threading
 from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
 from time import time
 
 from requests import get
@@ -12,7 +11,15 @@ import updates.fofa.fofa_map as fofa_map
 import utils.constants as constants
 from utils.channel import format_channel_name
 from utils.config import config
-from utils.requests.tools import get_source_requests, close_session
+from utils.requests.governor import (
+    CircuitOpenError,
+    FetchCancelledError,
+    acquire,
+    check_page_blocked,
+    is_circuit_open,
+    is_fetch_cancelled,
+)
+from utils.requests.tools import get_source_requests, gather_in_fetch_pool
 from utils.retry import retry_func
 from utils.tools import merge_objects, get_pbar_remaining, resource_path
 
@@ -89,35 +96,33 @@ async def get_channels_by_fofa(urls=None, multicast=False, callback=None):
             )
         open_driver = config.open_driver
         if open_driver:
-            from utils.driver.setup import setup_driver
+            from utils.driver.pool import lease_driver, release_driver
         open_speed_test = config.open_speed_test
-        cancel_event = threading.Event()
         hotel_name = constants.origin_map["hotel"]
 
         def process_fofa_channels(fofa_info):
-            if cancel_event.is_set():
-                return {}
             fofa_url = fofa_info[0]
+            if is_circuit_open(fofa_url):
+                return {}
             results = defaultdict(lambda: defaultdict(list))
             driver = None
             try:
                 if open_driver:
-                    driver = setup_driver()
+                    acquire(fofa_url)
+                    driver = lease_driver()
                     try:
                         retry_func(lambda: driver.get(fofa_url), name=fofa_url)
                     except Exception as e:
-                        driver.close()
-                        driver.quit()
-                        driver = setup_driver()
+                        release_driver(driver, discard=True)
+                        driver = None
+                        driver = lease_driver()
                         driver.get(fofa_url)
                     page_source = driver.page_source
+                    check_page_blocked(fofa_url, page_source)
                 else:
                     page_source = retry_func(
                         lambda: get_source_requests(fofa_url), name=fofa_url
                     )
-                if any(keyword in page_source for keyword in ["访问异常", "禁止访问", "资源访问每天限制"]):
-                    cancel_event.set()
-                    raise ValueError("Limited access to fofa page")
                 fofa_source = re.sub(r"<!--.*?-->", "", page_source, flags=re.DOTALL)
                 urls = set(re.findall(r"https?://[\w\.-]+:\d+", fofa_source))
                 if multicast:
@@ -138,16 +143,18 @@ async def get_channels_by_fofa(urls=None, multicast=False, callback=None):
                             for url in urls
                         ]
                         for future in futures:
+                            if is_fetch_cancelled():
+                                executor.shutdown(wait=False, cancel_futures=True)
+                                break
                             results = merge_objects(results, future.result())
                 return results
-            except ValueError as e:
-                raise e
+            except (CircuitOpenError, FetchCancelledError):
+                return {}
             except Exception as e:
                 print(e)
             finally:
                 if driver:
-                    driver.close()
-                    driver.quit()
+                    release_driver(driver)
                 pbar.update()
                 remain = fofa_urls_len - pbar.n
                 if callback:
@@ -157,19 +164,15 @@ async def get_channels_by_fofa(urls=None, multicast=False, callback=None):
                     )
 
         max_workers = 3 if open_driver else 10
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = [
-                executor.submit(process_fofa_channels, fofa_url) for fofa_url in fofa_urls
-            ]
-            try:
-                for future in as_completed(futures):
-                    result = future.result()
-                    if result:
-                        fofa_results = merge_objects(fofa_results, result)
-            except ValueError as e:
-                if "Limited access to fofa page" in str(e):
-                    for future in futures:
-                        future.cancel()
+        results = await gather_in_fetch_pool(
+            process_fofa_channels, [(fofa_url,) for fofa_url in fofa_urls], max_workers=max_workers
+        )
+        for result in results:
+            if result and not isinstance(result, Exception):
+                fofa_results = merge_objects(fofa_results, result)
+        if not config.open_use_cache and any(is_circuit_open(fofa_info[0]) for fofa_info in fofa_urls):
+            print(f"Fofa {mode_name} is blocked, fallback to the cached result")
+            fofa_results = merge_objects(get_fofa_region_result_tmp(multicast=multicast), fofa_results)
         if fofa_results:
             update_fofa_region_result_tmp(fofa_results, multicast=multicast)
         pbar.n = fofa_urls_len
@@ -179,8 +182,6 @@ async def get_channels_by_fofa(urls=None, multicast=False, callback=None):
                 f"正在获取Fofa{mode_name}源",
                 100,
             )
-        if not open_driver:
-            close_session()
         pbar.close()
     return fofa_results
 
@@ -1,7 +1,6 @@
 import pickle
 import urllib.parse as urlparse
 from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from time import time
 from urllib.parse import parse_qs
 
@@ -15,9 +14,17 @@ from utils.channel import (
     get_results_from_multicast_soup_requests,
 )
 from utils.config import config
-from utils.driver.setup import setup_driver
+from utils.driver.pool import lease_driver, release_driver
 from utils.driver.tools import search_submit
-from utils.requests.tools import get_soup_requests, close_session
+from utils.requests.governor import (
+    CircuitOpenError,
+    FetchCancelledError,
+    acquire,
+    check_page_blocked,
+    is_circuit_open,
+    is_fetch_cancelled,
+)
+from utils.requests.tools import get_page_requests, gather_in_fetch_pool
 from utils.retry import (
     retry_func,
     find_clickable_element_with_retry,
@@ -31,20 +38,27 @@ if config.open_driver:
         pass
 
 
+def get_hotel_cache():
+    """
+    Get the cached hotel channels
+    """
+    try:
+        with open(
+                resource_path("updates/hotel/cache.pkl"),
+                "rb",
+        ) as file:
+            return pickle.load(file) or {}
+    except:
+        return {}
+
+
 async def get_channels_by_hotel(callback=None):
     """
     Get the channels by hotel
     """
     channels = {}
     if config.open_use_cache:
-        try:
-            with open(
-                    resource_path("updates/hotel/cache.pkl"),
-                    "rb",
-            ) as file:
-                channels = pickle.load(file) or {}
-        except:
-            pass
+        channels = get_hotel_cache()
     if config.open_request:
         page_url = constants.foodie_hotel_url
         open_driver = config.open_driver
@@ -60,42 +74,44 @@ async def get_channels_by_hotel(callback=None):
             driver = None
             try:
                 if open_driver:
-                    driver = setup_driver()
+                    acquire(page_url)
+                    driver = lease_driver()
                     try:
                         retry_func(
                             lambda: driver.get(page_url),
                             name=f"Foodie hotel search:{name}",
                         )
                     except Exception as e:
-                        driver.close()
-                        driver.quit()
-                        driver = setup_driver()
+                        release_driver(driver, discard=True)
+                        driver = None
+                        driver = lease_driver()
                         driver.get(page_url)
                     search_submit(driver, name)
+                    check_page_blocked(page_url, driver.page_source)
                 else:
                     page_soup = None
                     post_form = {"saerch": name}
                     code = None
                     try:
                         page_soup = retry_func(
-                            lambda: get_soup_requests(page_url, data=post_form),
+                            lambda: get_page_requests(page_url, data=post_form),
                             name=f"Foodie hotel search:{name}",
                         )
                     except Exception as e:
-                        page_soup = get_soup_requests(page_url, data=post_form)
+                        page_soup = get_page_requests(page_url, data=post_form)
                     if not page_soup:
                         print(f"{name}:Request fail.")
                         return info_list
                     else:
-                        a_tags = page_soup.find_all("a", href=True)
-                        for a_tag in a_tags:
-                            href_value = a_tag["href"]
+                        for href_value in page_soup.hrefs:
                             parsed_url = urlparse.urlparse(href_value)
                             code = parse_qs(parsed_url.query).get("code", [None])[0]
                             if code:
                                 break
                 # retry_limit = 3
                 for page in range(1, page_num + 1):
+                    if is_fetch_cancelled():
+                        break
                     # retries = 0
                     # if not open_driver and page == 1:
                     #     retries = 2
@@ -118,7 +134,7 @@ async def get_channels_by_hotel(callback=None):
                                     f"{page_url}?net={name}&page={page}&code={code}"
                                 )
                                 page_soup = retry_func(
-                                    lambda: get_soup_requests(request_url),
+                                    lambda: get_page_requests(request_url),
                                     name=f"hotel search:{name}, page:{page}",
                                 )
                         soup = get_soup(driver.page_source) if open_driver else page_soup
@@ -143,13 +159,14 @@ async def get_channels_by_hotel(callback=None):
                     except Exception as e:
                         print(f"{name}:Error on page {page}: {e}")
                         continue
+            except (CircuitOpenError, FetchCancelledError):
+                pass
             except Exception as e:
                 print(f"{name}:Error on search: {e}")
                 pass
             finally:
                 if driver:
-                    driver.close()
-                    driver.quit()
+                    release_driver(driver)
                 pbar.update()
                 if callback:
                     callback(
@@ -163,22 +180,16 @@ async def get_channels_by_hotel(callback=None):
         if callback:
             callback(f"正在获取Foodie酒店源, 共{region_list_len}个地区", 0)
         search_region_result = defaultdict(list)
-        with ThreadPoolExecutor(max_workers=3) as executor:
-            futures = {
-                executor.submit(process_region_by_hotel, region): region
-                for region in region_list
-            }
-
-            for future in as_completed(futures):
-                region = futures[future]
-                result = future.result()
-
-                if result:
-                    for item in result:
-                        url = item.get("url")
-                        date = item.get("date")
-                        if url:
-                            search_region_result[region].append({"url": url, "date": date})
+        results = await gather_in_fetch_pool(
+            process_region_by_hotel, [(region,) for region in region_list], max_workers=3
+        )
+        for region, result in zip(region_list, results):
+            if result and not isinstance(result, Exception):
+                for item in result:
+                    url = item.get("url")
+                    date = item.get("date")
+                    if url:
+                        search_region_result[region].append({"url": url, "date": date})
         urls = [
             {"region": region, "url": f"http://{item["url"]}/ZHGXTV/Public/json/live_interface.txt"}
             for region, result in search_region_result.items()
@@ -188,7 +199,8 @@ async def get_channels_by_hotel(callback=None):
             urls, hotel=True, retry=False, error_print=False
         )
         channels = merge_objects(channels, request_channels)
-        if not open_driver:
-            close_session()
+        if not config.open_use_cache and is_circuit_open(page_url):
+            print("Foodie hotel is blocked, fallback to the cached result")
+            channels = merge_objects(get_hotel_cache(), channels)
         pbar.close()
     return channels
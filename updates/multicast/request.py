@@ -1,7 +1,6 @@
 import pickle
 import urllib.parse as urlparse
 from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from time import time
 from urllib.parse import parse_qs
 
@@ -19,9 +18,17 @@ from utils.channel import (
     format_channel_name
 )
 from utils.config import config
-from utils.driver.setup import setup_driver
+from utils.driver.pool import lease_driver, release_driver
 from utils.driver.tools import search_submit
-from utils.requests.tools import get_soup_requests, close_session
+from utils.requests.governor import (
+    CircuitOpenError,
+    FetchCancelledError,
+    acquire,
+    check_page_blocked,
+    is_circuit_open,
+    is_fetch_cancelled,
+)
+from utils.requests.tools import get_page_requests, gather_in_fetch_pool
 from utils.retry import (
     retry_func,
     find_clickable_element_with_retry,
@@ -36,6 +43,24 @@ if config.open_driver:
         pass
 
 
+def get_multicast_cache(format_names):
+    """
+    Get the cached multicast channels of the names
+    """
+    channels = {}
+    try:
+        with open(
+                resource_path("updates/multicast/cache.pkl"),
+                "rb",
+        ) as file:
+            cache = pickle.load(file) or {}
+            for name in format_names:
+                channels[name] = cache.get(name, [])
+    except:
+        pass
+    return channels
+
+
 async def get_channels_by_multicast(names, callback=None):
     """
     Get the channels by multicast
@@ -43,16 +68,7 @@ async def get_channels_by_multicast(names, callback=None):
     channels = {}
     format_names = [format_channel_name(name) for name in names]
     if config.open_use_cache:
-        try:
-            with open(
-                    resource_path("updates/multicast/cache.pkl"),
-                    "rb",
-            ) as file:
-                cache = pickle.load(file) or {}
-                for name in format_names:
-                    channels[name] = cache.get(name, [])
-        except:
-            pass
+        channels = get_multicast_cache(format_names)
     if config.open_request:
         pageUrl = constants.foodie_hotel_url
         open_driver = config.open_driver
@@ -76,40 +92,42 @@ async def get_channels_by_multicast(names, callback=None):
             driver = None
             try:
                 if open_driver:
-                    driver = setup_driver()
+                    acquire(pageUrl)
+                    driver = lease_driver()
                     try:
                         retry_func(
                             lambda: driver.get(pageUrl), name=f"multicast search:{name}"
                         )
                     except Exception as e:
-                        driver.close()
-                        driver.quit()
-                        driver = setup_driver()
+                        release_driver(driver, discard=True)
+                        driver = None
+                        driver = lease_driver()
                         driver.get(pageUrl)
                     search_submit(driver, name)
+                    check_page_blocked(pageUrl, driver.page_source)
                 else:
                     page_soup = None
                     post_form = {"saerch": name}
                     code = None
                     try:
                         page_soup = retry_func(
-                            lambda: get_soup_requests(pageUrl, data=post_form),
+                            lambda: get_page_requests(pageUrl, data=post_form),
                             name=f"multicast search:{name}",
                         )
                     except Exception as e:
-                        page_soup = get_soup_requests(pageUrl, data=post_form)
+                        page_soup = get_page_requests(pageUrl, data=post_form)
                     if not page_soup:
                         print(f"{name}:Request fail.")
                         return {"region": region, "type": type, "data": info_list}
                     else:
-                        a_tags = page_soup.find_all("a", href=True)
-                        for a_tag in a_tags:
-                            href_value = a_tag["href"]
+                        for href_value in page_soup.hrefs:
                             parsed_url = urlparse.urlparse(href_value)
                             code = parse_qs(parsed_url.query).get("code", [None])[0]
                             if code:
                                 break
                 for page in range(1, page_num + 1):
+                    if is_fetch_cancelled():
+                        break
                     try:
                         if page > 1:
                             if open_driver:
@@ -128,7 +146,7 @@ async def get_channels_by_multicast(names, callback=None):
                                     f"{pageUrl}?net={name}&page={page}&code={code}"
                                 )
                                 page_soup = retry_func(
-                                    lambda: get_soup_requests(request_url),
+                                    lambda: get_page_requests(request_url),
                                     name=f"multicast search:{name}, page:{page}",
                                 )
                         soup = get_soup(driver.page_source) if open_driver else page_soup
@@ -151,13 +169,14 @@ async def get_channels_by_multicast(names, callback=None):
                     except Exception as e:
                         print(f"{name}:Error on page {page}: {e}")
                         continue
+            except (CircuitOpenError, FetchCancelledError):
+                pass
             except Exception as e:
                 print(f"{name}:Error on search: {e}")
                 pass
             finally:
                 if driver:
-                    driver.close()
-                    driver.quit()
+                    release_driver(driver)
                 pbar.update()
                 if callback:
                     callback(
@@ -175,33 +194,26 @@ async def get_channels_by_multicast(names, callback=None):
                     0,
                 )
             start_time = time()
-            with ThreadPoolExecutor(max_workers=3) as executor:
-                futures = {
-                    executor.submit(process_channel_by_multicast, region, type): (
-                        region,
-                        type,
-                    )
-                    for region, type in region_type_list
-                }
+            results = await gather_in_fetch_pool(process_channel_by_multicast, region_type_list, max_workers=3)
+            for (region, type), result in zip(region_type_list, results):
+                if isinstance(result, Exception):
+                    continue
+                data = result.get("data")
 
-                for future in as_completed(futures):
-                    region, type = futures[future]
-                    result = future.result()
-                    data = result.get("data")
-
-                    if data:
-                        for item in data:
-                            url = item.get("url")
-                            date = item.get("date")
-                            if url:
-                                search_region_type_result[region][type].append(
-                                    {"url": url, "date": date}
-                                )
+                if data:
+                    for item in data:
+                        url = item.get("url")
+                        date = item.get("date")
+                        if url:
+                            search_region_type_result[region][type].append(
+                                {"url": url, "date": date}
+                            )
             pbar.close()
         request_channels = get_channel_multicast_result(
             name_region_type_result, search_region_type_result
         )
         channels = merge_objects(channels, request_channels)
-        if not open_driver:
-            close_session()
+        if not config.open_use_cache and is_circuit_open(pageUrl):
+            print("Foodie multicast is blocked, fallback to the cached result")
+            channels = merge_objects(get_multicast_cache(format_names), channels)
     return channels
@@ -9,10 +9,11 @@ from utils.config import config
 import utils.constants as constants
 from utils.channel import format_channel_name
 from utils.tools import get_pbar_remaining, resource_path, get_name_url
+from utils.requests.cache import fetch_cached
+from utils.requests.tools import get_client_session
 import json
 
-# import asyncio
-from requests import Session
+import asyncio
 from collections import defaultdict
 from time import time
 from tqdm import tqdm
@@ -77,7 +78,7 @@ async def get_multicast_region_result():
         json.dump(multicast_result, f, ensure_ascii=False, indent=4)
 
 
-def get_multicast_region_type_result_txt():
+async def get_multicast_region_type_result_txt():
     """
     Get multicast region type result txt
     """
@@ -85,11 +86,12 @@ def get_multicast_region_type_result_txt():
             resource_path("updates/multicast/multicast_map.json"), "r", encoding="utf-8"
     ) as f:
         region_url = json.load(f)
-        session = Session()
+    async with get_client_session() as session:
         for region, value in region_url.items():
             for type, url in value.items():
-                response = session.get(url)
-                content = response.text
+                content = await fetch_cached(session, url)
+                if content is None:
+                    continue
                 with open(
                         resource_path(f"config/rtp/{region}_{type}.txt"),
                         "w",
@@ -158,5 +160,5 @@ def get_multicast_region_result_by_rtp_txt(callback=None):
 if __name__ == "__main__":
     get_region_urls_from_IPTV_Multicast_source()
     # asyncio.run(get_multicast_region_result())
-    get_multicast_region_type_result_txt()
+    asyncio.run(get_multicast_region_type_result_txt())
     # get_multicast_region_result_by_rtp_txt()
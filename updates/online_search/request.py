@@ -1,4 +1,3 @@
-from concurrent.futures import ThreadPoolExecutor
 from time import time
 
 from tqdm.asyncio import tqdm_asyncio
@@ -10,9 +9,16 @@ from utils.channel import (
     get_results_from_soup_requests,
 )
 from utils.config import config
-from utils.driver.setup import setup_driver
+from utils.driver.pool import lease_driver, release_driver
 from utils.driver.tools import search_submit
-from utils.requests.tools import get_soup_requests, close_session
+from utils.requests.governor import (
+    CircuitOpenError,
+    FetchCancelledError,
+    acquire,
+    check_page_blocked,
+    is_fetch_cancelled,
+)
+from utils.requests.tools import get_page_requests, gather_in_fetch_pool
 from utils.retry import (
     retry_func,
     find_clickable_element_with_retry,
@@ -46,36 +52,40 @@ async def get_channels_by_online_search(names, callback=None):
         driver = None
         try:
             if open_driver:
-                driver = setup_driver()
+                acquire(pageUrl)
+                driver = lease_driver()
                 try:
                     retry_func(
                         lambda: driver.get(pageUrl), name=f"online search:{name}"
                     )
                 except Exception as e:
-                    driver.close()
-                    driver.quit()
-                    driver = setup_driver()
+                    release_driver(driver, discard=True)
+                    driver = None
+                    driver = lease_driver()
                     driver.get(pageUrl)
                 search_submit(driver, name)
+                check_page_blocked(pageUrl, driver.page_source)
             else:
                 page_soup = None
                 request_url = f"{pageUrl}?s={name}"
                 try:
                     page_soup = retry_func(
-                        lambda: get_soup_requests(request_url),
+                        lambda: get_page_requests(request_url),
                         name=f"online search:{name}",
                     )
                 except Exception as e:
-                    page_soup = get_soup_requests(request_url)
+                    page_soup = get_page_requests(request_url)
                 if not page_soup:
                     print(f"{name}:Request fail.")
                     return
             retry_limit = 3
             for page in range(1, page_num + 1):
+                if is_fetch_cancelled():
+                    break
                 retries = 0
                 if not open_driver and page == 1:
                     retries = 2
-                while retries < retry_limit:
+                while retries < retry_limit and not is_fetch_cancelled():
                     try:
                         if page > 1:
                             if open_driver:
@@ -94,7 +104,7 @@ async def get_channels_by_online_search(names, callback=None):
                             else:
                                 request_url = f"{pageUrl}?s={name}&page={page}"
                                 page_soup = retry_func(
-                                    lambda: get_soup_requests(request_url),
+                                    lambda: get_page_requests(request_url),
                                     name=f"online search:{name}, page:{page}",
                                 )
                         soup = (
@@ -129,9 +139,9 @@ async def get_channels_by_online_search(names, callback=None):
                                         retries=1,
                                     )
                                     if next_page_link:
-                                        driver.close()
-                                        driver.quit()
-                                        driver = setup_driver()
+                                        release_driver(driver, discard=True)
+                                        driver = None
+                                        driver = lease_driver()
                                         search_submit(driver, name)
                                 retries += 1
                                 continue
@@ -157,13 +167,14 @@ async def get_channels_by_online_search(names, callback=None):
                         break
                 if retries == retry_limit:
                     print(f"{name}:Reached retry limit, moving to next page")
+        except (CircuitOpenError, FetchCancelledError):
+            pass
         except Exception as e:
             print(f"{name}:Error on search: {e}")
             pass
         finally:
             if driver:
-                driver.close()
-                driver.quit()
+                release_driver(driver)
             pbar.update()
             if callback:
                 callback(
@@ -176,17 +187,13 @@ async def get_channels_by_online_search(names, callback=None):
     pbar = tqdm_asyncio(total=names_len, desc="Online search")
     if callback:
         callback(f"正在进行线上查询, 共{names_len}个频道", 0)
-    with ThreadPoolExecutor(max_workers=3) as executor:
-        futures = [
-            executor.submit(process_channel_by_online_search, name) for name in names
-        ]
-        for future in futures:
-            result = future.result()
-            name = result.get("name")
-            data = result.get("data", [])
-            if name:
-                channels[name] = data
-    if not open_driver:
-        close_session()
+    results = await gather_in_fetch_pool(process_channel_by_online_search, [(name,) for name in names], max_workers=3)
+    for result in results:
+        if isinstance(result, Exception):
+            continue
+        name = result.get("name")
+        data = result.get("data", [])
+        if name:
+            channels[name] = data
     pbar.close()
     return channels
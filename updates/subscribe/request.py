@@ -1,18 +1,22 @@
+import asyncio
+import hashlib
+import os
 from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor
 from time import time
 
-from requests import Session, exceptions
 from tqdm.asyncio import tqdm_asyncio
 
 import utils.constants as constants
 from utils.channel import format_channel_name
 from utils.config import config
-from utils.retry import retry_func
+from utils.playlist import PlaylistParser
+from utils.requests.cache import fetch_cached
+from utils.requests.tools import get_client_session
+from utils.retry import retry_async_func
 from utils.tools import (
     merge_objects,
     get_pbar_remaining,
-    get_name_url
+    resource_path
 )
 
 
@@ -45,8 +49,25 @@ async def get_channels_by_subscribe_urls(
             0,
         )
     hotel_name = constants.origin_map["hotel"]
+    open_headers = config.open_headers
+    names_digest = hashlib.sha1("\n".join(sorted(names)).encode("utf-8")).hexdigest() if names else ""
+    alias_path = resource_path(constants.alias_path)
+    alias_mtime = os.path.getmtime(alias_path) if os.path.exists(alias_path) else 0
 
-    def process_subscribe_channels(subscribe_info: str | dict) -> defaultdict:
+    def get_parse_variant(subscribe_info: str | dict) -> str:
+        """
+        Get the key of the parse result, which depends on the names filter and the subscribe mode
+        """
+        subscribe_url = subscribe_info.get("url") if isinstance(subscribe_info, dict) else subscribe_info
+        region, url_type = "", ""
+        if (multicast or hotel) and isinstance(subscribe_info, dict):
+            region = subscribe_info.get("region")
+            url_type = subscribe_info.get("type", "")
+        in_whitelist = bool(whitelist and (subscribe_url in whitelist))
+        return (f"subscribe|{names_digest}|{alias_mtime}|{multicast}|{hotel}|{region}|{url_type}|{in_whitelist}|"
+                f"{open_headers}")
+
+    def get_channels_from_data(data: list[dict], subscribe_info: str | dict) -> defaultdict:
         region = ""
         url_type = ""
         if (multicast or hotel) and isinstance(subscribe_info, dict):
@@ -57,70 +78,57 @@ async def get_channels_by_subscribe_urls(
             subscribe_url = subscribe_info
         channels = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
         in_whitelist = whitelist and (subscribe_url in whitelist)
-        session = Session()
+        for item in data:
+            name = item["name"]
+            url = item["url"]
+            if name and url:
+                name = format_channel_name(name)
+                if names and name not in names:
+                    continue
+                url_partition = url.partition("$")
+                url = url_partition[0]
+                info = url_partition[2]
+                value = url if multicast else {
+                    "url": url,
+                    "headers": item.get("headers", None),
+                    "extra_info": info
+                }
+                if in_whitelist:
+                    value["origin"] = "whitelist"
+                if hotel:
+                    value["extra_info"] = f"{region}{hotel_name}"
+                if name in channels:
+                    if multicast:
+                        if value not in channels[name][region][url_type]:
+                            channels[name][region][url_type].append(value)
+                    elif value not in channels[name]:
+                        channels[name].append(value)
+                else:
+                    if multicast:
+                        channels[name][region][url_type] = [value]
+                    else:
+                        channels[name] = [value]
+        return channels
+
+    async def process_subscribe_channels(session, subscribe_info: str | dict) -> defaultdict:
+        subscribe_url = subscribe_info.get("url") if isinstance(subscribe_info, dict) else subscribe_info
+        channels = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
         try:
-            response = None
+            fetch = lambda: fetch_cached(
+                session,
+                subscribe_url,
+                parse=lambda data: get_channels_from_data(data, subscribe_info) if data else None,
+                variant=get_parse_variant(subscribe_info),
+                parser=lambda: PlaylistParser(open_headers=open_headers)
+            )
             try:
-                response = (
-                    retry_func(
-                        lambda: session.get(
-                            subscribe_url, timeout=config.request_timeout
-                        ),
-                        name=subscribe_url,
-                    )
-                    if retry
-                    else session.get(subscribe_url, timeout=config.request_timeout)
-                )
-            except exceptions.Timeout:
+                channels = (await retry_async_func(fetch, name=subscribe_url) if retry else await fetch()) or channels
+            except asyncio.TimeoutError:
                 print(f"Timeout on subscribe: {subscribe_url}")
-            if response:
-                response.encoding = "utf-8"
-                content = response.text
-                m3u_type = True if "#EXTM3U" in content else False
-                data = get_name_url(
-                    content,
-                    pattern=(
-                        constants.multiline_m3u_pattern
-                        if m3u_type
-                        else constants.multiline_txt_pattern
-                    ),
-                    open_headers=config.open_headers if m3u_type else False
-                )
-                for item in data:
-                    name = item["name"]
-                    url = item["url"]
-                    if name and url:
-                        name = format_channel_name(name)
-                        if names and name not in names:
-                            continue
-                        url_partition = url.partition("$")
-                        url = url_partition[0]
-                        info = url_partition[2]
-                        value = url if multicast else {
-                            "url": url,
-                            "headers": item.get("headers", None),
-                            "extra_info": info
-                        }
-                        if in_whitelist:
-                            value["origin"] = "whitelist"
-                        if hotel:
-                            value["extra_info"] = f"{region}{hotel_name}"
-                        if name in channels:
-                            if multicast:
-                                if value not in channels[name][region][url_type]:
-                                    channels[name][region][url_type].append(value)
-                            elif value not in channels[name]:
-                                channels[name].append(value)
-                        else:
-                            if multicast:
-                                channels[name][region][url_type] = [value]
-                            else:
-                                channels[name] = [value]
         except Exception as e:
             if error_print:
                 print(f"Error on {subscribe_url}: {e}")
         finally:
-            session.close()
             pbar.update()
             remain = subscribe_urls_len - pbar.n
             if callback:
@@ -130,12 +138,11 @@ async def get_channels_by_subscribe_urls(
                 )
             return channels
 
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = [
-            executor.submit(process_subscribe_channels, subscribe_url)
-            for subscribe_url in urls
-        ]
-        for future in futures:
-            subscribe_results = merge_objects(subscribe_results, future.result())
+    async with get_client_session() as session:
+        results = await asyncio.gather(
+            *(process_subscribe_channels(session, subscribe_url) for subscribe_url in urls)
+        )
+    for result in results:
+        subscribe_results = merge_objects(subscribe_results, result)
     pbar.close()
     return subscribe_results
@@ -8,6 +8,7 @@ class Alias:
     def __init__(self):
         self.primary_to_aliases: dict[str, set[str]] = {}
         self.alias_to_primary: dict[str, str] = {}
+        self.format_alias_to_primary: dict[str, str] = {}
 
         real_path = get_real_path(resource_path(constants.alias_path))
         if os.path.exists(real_path):
@@ -22,6 +23,15 @@ class Alias:
                         for alias in aliases:
                             self.alias_to_primary[alias] = primary
                         self.alias_to_primary[primary] = primary
+            self.update_format_keys()
+
+    def update_format_keys(self):
+        """
+        Precompute the formatted alias keys, so that lookups by formatted name never miss the table
+        """
+        self.format_alias_to_primary = {}
+        for alias, primary in self.alias_to_primary.items():
+            self.format_alias_to_primary.setdefault(format_name(alias), primary)
 
     def get(self, name: str):
         """
@@ -36,7 +46,9 @@ class Alias:
         primary_name = self.alias_to_primary.get(name, None)
         if primary_name is None:
             alias_format_name = format_name(name)
-            primary_name = self.alias_to_primary.get(alias_format_name, name)
+            primary_name = self.alias_to_primary.get(alias_format_name, None)
+            if primary_name is None:
+                primary_name = self.format_alias_to_primary.get(alias_format_name, name)
         return primary_name
 
     def set(self, name: str, aliases: set[str]):
@@ -50,3 +62,4 @@ class Alias:
         for alias in aliases:
             self.alias_to_primary[alias] = name
         self.alias_to_primary[name] = name
+        self.update_format_keys()
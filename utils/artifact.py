@@ -0,0 +1,135 @@
+import gzip
+import hashlib
+import json
+import os
+
+import utils.constants as constants
+
+try:
+    import brotli
+except:
+    brotli = None
+
+
+class ArtifactWriter:
+    """
+    Writer of a result artifact, the content is written to temp files and moved into place on close, together with
+    the precompressed siblings (.gz, and .br if brotli is installed) and the meta file of the content hash and the
+    siblings, so the readers never see a half-written artifact
+    """
+
+    def __init__(self, path: str, gz_path: str = None, compress: bool = True):
+        """
+        :param path: write into path
+        :param gz_path: the path of the gzip sibling, default is path.gz
+        :param compress: write the precompressed siblings
+        """
+        self.path = path
+        self.encodings = {}
+        self.file = open(f"{path}.tmp", "wb")
+        self.gz_file = None
+        self.br_file = None
+        self.compressor = None
+        if compress:
+            gz_path = gz_path or f"{path}.gz"
+            self.encodings["gzip"] = gz_path
+            self.gz_raw_file = open(f"{gz_path}.tmp", "wb")
+            self.gz_file = gzip.GzipFile(filename="", mode="wb", fileobj=self.gz_raw_file,
+                                         compresslevel=constants.artifact_gzip_level)
+            if brotli:
+                self.encodings["br"] = f"{path}.br"
+                self.br_file = open(f"{path}.br.tmp", "wb")
+                self.compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=constants.artifact_brotli_quality)
+        self.hash = hashlib.sha256()
+        self.closed = False
+
+    def write(self, text: str):
+        """
+        Write the text to the artifact and its siblings
+        """
+        if not text:
+            return
+        data = text.encode("utf-8")
+        self.file.write(data)
+        self.hash.update(data)
+        if self.gz_file:
+            self.gz_file.write(data)
+        if self.compressor:
+            self.br_file.write(self.compressor.process(data))
+
+    def close_files(self):
+        """
+        Close the temp files
+        """
+        self.file.close()
+        if self.gz_file:
+            self.gz_file.close()
+            self.gz_raw_file.close()
+        if self.br_file:
+            self.br_file.close()
+
+    def close(self):
+        """
+        Move the siblings, the meta file and the artifact into place, the artifact goes last so that the readers of
+        the new artifact find the meta file of its content
+        """
+        if self.closed:
+            return
+        self.closed = True
+        if self.compressor:
+            self.br_file.write(self.compressor.finish())
+        self.close_files()
+        meta = {
+            "hash": self.hash.hexdigest(),
+            "encodings": {encoding: os.path.basename(path) for encoding, path in self.encodings.items()},
+        }
+        meta_path = get_meta_path(self.path)
+        with open(f"{meta_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        for path in [*self.encodings.values(), meta_path, self.path]:
+            os.replace(f"{path}.tmp", path)
+
+    def discard(self):
+        """
+        Remove the temp files, the artifact in place is kept
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self.close_files()
+        for path in [*self.encodings.values(), self.path]:
+            try:
+                os.remove(f"{path}.tmp")
+            except FileNotFoundError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type:
+            self.discard()
+        else:
+            self.close()
+
+
+def get_meta_path(path: str) -> str:
+    """
+    Get the path of the meta file of the artifact
+    """
+    return f"{path}.meta"
+
+
+def get_artifact_meta(path: str) -> dict | None:
+    """
+    Get the meta of the artifact, the content hash and the sibling paths of the encodings,
+    None if it is not written by ArtifactWriter
+    """
+    try:
+        with open(get_meta_path(path), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    directory = os.path.dirname(path)
+    meta["encodings"] = {encoding: os.path.join(directory, name) for encoding, name in meta["encodings"].items()}
+    return meta
@@ -1,21 +1,28 @@
 import asyncio
 import base64
-import gzip
 import json
 import os
-import pickle
 import re
 from collections import defaultdict
-from logging import INFO
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from itertools import islice
+from time import time
 
 from bs4 import NavigableString
 
 import utils.constants as constants
-from updates.epg.tools import write_to_xml, compress_to_gz
+from updates.epg.store import write_to_db
+from updates.epg.tools import write_to_xml
 from utils.alias import Alias
+from utils.artifact import ArtifactWriter
 from utils.config import config
 from utils.db import get_db_connection, return_db_connection
+from utils.history import get_history
 from utils.ip_checker import IPChecker
+from utils.keywords import KeywordMatcher, get_keywords_matcher
+from utils.result_log import ResultLog
+from utils.result_page import ResultPage
 from utils.speed import (
     get_speed,
     get_speed_result,
@@ -24,29 +31,30 @@ from utils.speed import (
 )
 from utils.tools import (
     format_name,
+    get_format_name_cache_stats,
     get_name_url,
     check_url_by_keywords,
-    get_total_urls,
+    get_total_urls_variants,
     add_url_info,
     resource_path,
-    get_urls_from_file,
     get_name_urls_from_file,
-    get_logger,
     get_datetime_now,
     get_url_host,
     check_ipv_type_match,
     get_ip_address,
-    convert_to_m3u,
+    get_epg_url,
+    get_m3u_channel_info,
+    get_m3u_item,
     custom_print,
-    get_name_uri_from_dir, get_resolution_value
+    get_name_uri_from_dir, get_resolution_value,
+    get_keywords_pattern,
+    get_process_context
 )
 from utils.types import ChannelData, OriginType, CategoryChannelData
 
 channel_alias = Alias()
 ip_checker = IPChecker()
 frozen_channels = set()
-location_list = config.location
-isp_list = config.isp
 
 
 def format_channel_data(url: str, origin: OriginType) -> ChannelData:
@@ -123,7 +131,7 @@ def get_channel_items() -> CategoryChannelData:
         hls_data = get_name_uri_from_dir(constants.hls_path)
     local_data = get_name_urls_from_file(config.local_file, format_name_flag=True)
     whitelist = get_name_urls_from_file(constants.whitelist_path)
-    whitelist_urls = get_urls_from_file(constants.whitelist_path)
+    whitelist_matcher = get_keywords_matcher(constants.whitelist_path)
     whitelist_len = len(list(whitelist.keys()))
     if whitelist_len:
         print(f"Found {whitelist_len} channel in whitelist")
@@ -135,46 +143,44 @@ def get_channel_items() -> CategoryChannelData:
             )
 
     if config.open_history:
-        if os.path.exists(constants.cache_path):
-            try:
-                with gzip.open(constants.cache_path, "rb") as file:
-                    old_result = pickle.load(file)
-                    max_delay = config.speed_test_timeout * 1000
-                    min_resolution_value = config.min_resolution_value
-                    for cate, data in channels.items():
-                        if cate in old_result:
-                            for name, info_list in data.items():
-                                urls = [
-                                    url
-                                    for item in info_list
-                                    if (url := item["url"])
-                                ]
-                                if name in old_result[cate]:
-                                    for info in old_result[cate][name]:
-                                        if info:
-                                            try:
-                                                delay = info.get("delay", 0)
-                                                resolution = info.get("resolution")
-                                                if (delay == -1 or delay > max_delay) or info.get("speed") == 0 or (
-                                                        resolution and get_resolution_value(
-                                                    resolution) < min_resolution_value):
-                                                    frozen_channels.add(info["url"])
-                                                    continue
-                                                if info["origin"] == "whitelist" and not any(
-                                                        url in info["url"] for url in whitelist_urls):
-                                                    continue
-                                            except:
-                                                pass
-                                            if info["url"] not in urls:
-                                                channels[cate][name].append(info)
-                                    if not channels[cate][name]:
-                                        for info in old_result[cate][name]:
-                                            if info and info["url"] not in urls:
-                                                channels[cate][name].append(info)
-                                                frozen_channels.discard(info["url"])
-            except Exception as e:
-                print(f"Error loading cache file: {e}")
-                pass
+        try:
+            old_result = get_history(channels)
+            max_delay = config.snapshot.speed_test_timeout * 1000
+            min_resolution_value = config.snapshot.min_resolution_value
+            for cate, data in channels.items():
+                if cate in old_result:
+                    for name, info_list in data.items():
+                        urls = [
+                            url
+                            for item in info_list
+                            if (url := item["url"])
+                        ]
+                        if name in old_result[cate]:
+                            for info in old_result[cate][name]:
+                                if info:
+                                    try:
+                                        delay = info.get("delay", 0)
+                                        resolution = info.get("resolution")
+                                        if (delay == -1 or delay > max_delay) or info.get("speed") == 0 or (
+                                                resolution and get_resolution_value(
+                                            resolution) < min_resolution_value):
+                                            frozen_channels.add(info["url"])
+                                            continue
+                                        if info["origin"] == "whitelist" and not whitelist_matcher.search(
+                                                info["url"]):
+                                            continue
+                                    except:
+                                        pass
+                                    if info["url"] not in urls:
+                                        channels[cate][name].append(info)
+                            if not channels[cate][name]:
+                                for info in old_result[cate][name]:
+                                    if info and info["url"] not in urls:
+                                        channels[cate][name].append(info)
+                                        frozen_channels.discard(info["url"])
+        except Exception as e:
+            print(f"Error loading history: {e}")
+            pass
     return channels
 
 
@@ -370,50 +376,57 @@ def get_results_from_multicast_soup(soup, hotel=False):
     return results
 
 
+def get_search_rows(soup, class_name):
+    """
+    Get the (channel name, div text list) of the result rows from the soup or the extracted result page
+    """
+    if isinstance(soup, ResultPage):
+        return soup.get_rows(class_name)
+    rows = []
+    for element in soup.find_all("div", class_=class_name):
+        name_element = element.find("div", class_="channel")
+        channel_name = name_element.get_text(strip=True) if name_element else None
+        rows.append((channel_name, get_element_child_text_list(element, "div")))
+    return rows
+
+
 def get_results_from_soup_requests(soup, name):
     """
-    Get the results from the soup by requests
+    Get the results from the soup or the result page by requests
     """
     results = []
-    elements = soup.find_all("div", class_="resultplus") if soup else []
-    for element in elements:
-        name_element = element.find("div", class_="channel")
-        if name_element:
-            channel_name = name_element.get_text(strip=True)
-            if channel_name_is_equal(name, channel_name):
-                text_list = get_element_child_text_list(element, "div")
-                url = date = resolution = None
-                for text in text_list:
-                    text_url = get_channel_url(text)
-                    if text_url:
-                        url = text_url
-                    if " " in text:
-                        text_info = get_channel_info(text)
-                        date, resolution = text_info
-                if url:
-                    results.append({
-                        "url": url,
-                        "date": date,
-                        "resolution": resolution,
-                    })
+    rows = get_search_rows(soup, "resultplus") if soup else []
+    for channel_name, text_list in rows:
+        if channel_name is not None and channel_name_is_equal(name, channel_name):
+            url = date = resolution = None
+            for text in text_list:
+                text_url = get_channel_url(text)
+                if text_url:
+                    url = text_url
+                if " " in text:
+                    text_info = get_channel_info(text)
+                    date, resolution = text_info
+            if url:
+                results.append({
+                    "url": url,
+                    "date": date,
+                    "resolution": resolution,
+                })
     return results
 
 
 def get_results_from_multicast_soup_requests(soup, hotel=False):
     """
-    Get the results from the multicast soup by requests
+    Get the results from the multicast soup or result page by requests
     """
     results = []
     if not soup:
         return results
 
-    elements = soup.find_all("div", class_="result")
-    for element in elements:
-        name_element = element.find("div", class_="channel")
-        if not name_element:
+    for channel_name, text_list in get_search_rows(soup, "result"):
+        if channel_name is None:
             continue
 
-        text_list = get_element_child_text_list(element, "div")
         url, date, region, channel_type = None, None, None, None
         valid = True
 
@@ -494,8 +507,8 @@ def append_data_to_info_data(
         data: list,
         origin: str = None,
         check: bool = True,
-        whitelist: list = None,
-        blacklist: list = None,
+        whitelist: KeywordMatcher = None,
+        blacklist: KeywordMatcher = None,
         ipv_type_data: dict = None
 ) -> None:
     """
@@ -508,16 +521,39 @@ def append_data_to_info_data(
         data: List of channel items to process
         origin: Default origin for items
         check: Whether to perform validation checks
-        whitelist: List of whitelist keywords
-        blacklist: List of blacklist keywords
+        whitelist: Matcher of whitelist keywords
+        blacklist: Matcher of blacklist keywords
         ipv_type_data: Dictionary to cache IP type information
     """
     init_info_data(info_data, category, name)
 
     channel_list = info_data[category][name]
     existing_urls = {info["url"] for info in channel_list if "url" in info}
-
+    candidates = []
     for item in data:
+        url = item.get("url")
+        url_origin = item.get("origin", origin)
+        if not url_origin or not url or url in frozen_channels:
+            continue
+        if url in existing_urls and (url_origin != "whitelist" and not item.get("headers")):
+            continue
+        if whitelist and check_url_by_keywords(url, whitelist):
+            url_origin = "whitelist"
+        if check and url_origin not in ["whitelist", "live", "hls"]:
+            if blacklist and check_url_by_keywords(url, blacklist):
+                continue
+            ipv_type = item.get("ipv_type") or (ipv_type_data or {}).get(item.get("host") or get_url_host(url))
+            if ipv_type and not check_ipv_type_match(ipv_type):
+                continue
+        candidates.append((item, url_origin))
+    ip_checker.find_map_by_urls(
+        [item["url"] for item, _ in candidates if not item.get("location") or not item.get("isp")]
+    )
+    snapshot = config.snapshot
+    location_pattern = get_keywords_pattern(snapshot.location)
+    isp_pattern = get_keywords_pattern(snapshot.isp)
+
+    for item, url_origin in candidates:
         try:
             channel_id = item.get("id") or hash(item["url"])
             url = item["url"]
@@ -526,7 +562,6 @@ def append_data_to_info_data(
             delay = item.get("delay")
             speed = item.get("speed")
             resolution = item.get("resolution")
-            url_origin = item.get("origin", origin)
             ipv_type = item.get("ipv_type")
             location = item.get("location")
             isp = item.get("isp")
@@ -534,9 +569,7 @@ def append_data_to_info_data(
             catchup = item.get("catchup")
             extra_info = item.get("extra_info", "")
 
-            if not url_origin or not url:
-                continue
-            if url in frozen_channels or (url in existing_urls and (url_origin != "whitelist" and not headers)):
+            if url in existing_urls and (item.get("origin", origin) != "whitelist" and not headers):
                 continue
 
             if not ipv_type:
@@ -552,10 +585,10 @@ def append_data_to_info_data(
                 if ip:
                     location, isp = ip_checker.find_map(ip)
 
-            if location and location_list and not any(item in location for item in location_list):
+            if location and location_pattern and not location_pattern.search(location):
                 continue
 
-            if isp and isp_list and not any(item in isp for item in isp_list):
+            if isp and isp_pattern and not isp_pattern.search(isp):
                 continue
 
             for idx, info in enumerate(info_data[category][name]):
@@ -589,13 +622,7 @@ def append_data_to_info_data(
                     break
                 continue
 
-            if whitelist and check_url_by_keywords(url, whitelist):
-                url_origin = "whitelist"
-
-            if (not check or
-                    url_origin in ["whitelist", "live", "hls"] or
-                    (check_ipv_type_match(ipv_type) and
-                     not check_url_by_keywords(url, blacklist))):
+            if not check or url_origin in ["whitelist", "live", "hls"] or check_ipv_type_match(ipv_type):
                 channel_list.append({
                     "id": channel_id,
                     "url": url,
@@ -628,7 +655,7 @@ def get_origin_method_name(method):
 
 def append_old_data_to_info_data(info_data, cate, name, data, whitelist=None, blacklist=None, ipv_type_data=None):
     """
-    Append history and local channel data to total info data
+    Append history and local channel data to total info data, return the number of each origin
     """
     append_data_to_info_data(
         info_data,
@@ -644,21 +671,135 @@ def append_old_data_to_info_data(info_data, cate, name, data, whitelist=None, bl
     local_len = sum(1 for item in data if item["origin"] == "local")
     whitelist_len = sum(1 for item in data if item["origin"] == "whitelist")
     history_len = len(data) - (live_len + hls_len + local_len + whitelist_len)
-    print(f"History: {history_len}, Live: {live_len}, HLS: {hls_len}, Local: {local_len}, Whitelist: {whitelist_len}",
-          end=", ")
+    return {
+        "History": history_len,
+        "Live": live_len,
+        "HLS": hls_len,
+        "Local": local_len,
+        "Whitelist": whitelist_len
+    }
+
+
+def get_channel_number(channel_list: list[ChannelData]) -> dict[str, int]:
+    """
+    Get the channel number of each ipv type
+    """
+    return {
+        "IPv4": sum(1 for channel in channel_list if channel["ipv_type"] == "ipv4"),
+        "IPv6": sum(1 for channel in channel_list if channel["ipv_type"] == "ipv6"),
+        "Total": len(channel_list)
+    }
+
+
+aggregation_inputs = {}
+aggregation_methods = ["hotel_fofa", "multicast", "hotel_foodie", "subscribe", "online_search"]
+
+
+def get_aggregation_inputs(data) -> dict:
+    """
+    Get the read-only inputs shared by the aggregation of all channels, the method results are sent with the channels
+    :param data: The existing channel data, the ipv type of its hosts is reused
+    """
+    url_hosts_ipv_type = {}
+    for obj in data.values():
+        for value_list in obj.values():
+            for value in value_list:
+                if value_ipv_type := value.get("ipv_type", None):
+                    url_hosts_ipv_type[get_url_host(value["url"])] = value_ipv_type
+    snapshot = config.snapshot
+    return {
+        "whitelist": get_keywords_matcher(constants.whitelist_path),
+        "blacklist": get_keywords_matcher(constants.blacklist_path, pattern_search=False),
+        "ipv_type_data": url_hosts_ipv_type,
+        "frozen_channels": frozen_channels,
+        "open_history": snapshot.open_history,
+        "open_local": snapshot.open_local,
+        "open_rtmp": snapshot.open_rtmp,
+        "ipv_type": snapshot.ipv_type,
+        "location": snapshot.location,
+        "isp": snapshot.isp,
+    }
 
 
-def print_channel_number(data: CategoryChannelData, cate: str, name: str):
+def init_aggregation_inputs(inputs):
     """
-    Print channel number
+    Init the read-only inputs shared by the aggregation of all channels, the filter settings of the snapshot are
+    applied since the worker processes load the saved config instead of the current one
     """
-    channel_list = data.get(cate, {}).get(name, [])
-    print("IPv4:", len([channel for channel in channel_list if channel["ipv_type"] == "ipv4"]), end=", ")
-    print("IPv6:", len([channel for channel in channel_list if channel["ipv_type"] == "ipv6"]), end=", ")
-    print(
-        "Total:",
-        len(channel_list),
+    global aggregation_inputs
+    aggregation_inputs = inputs
+    frozen_channels.update(inputs["frozen_channels"])
+    config.snapshot = replace(config.snapshot, ipv_type=inputs["ipv_type"], location=inputs["location"],
+                              isp=inputs["isp"])
+
+
+def aggregate_channel_old_data(data, cate, name, old_info_list) -> dict[str, int]:
+    """
+    Aggregate the history and local data of the channel into data, return the stats
+    """
+    inputs = aggregation_inputs
+    if not (inputs["open_history"] or inputs["open_local"] or inputs["open_rtmp"]) or not old_info_list:
+        return {}
+    return append_old_data_to_info_data(data, cate, name, old_info_list, whitelist=inputs["whitelist"],
+                                        blacklist=inputs["blacklist"], ipv_type_data=inputs["ipv_type_data"])
+
+
+def aggregate_channel_method(data, cate, name, method, name_results) -> int:
+    """
+    Aggregate the method results of the channel into data, return the number of the method results
+    """
+    inputs = aggregation_inputs
+    append_data_to_info_data(
+        data, cate, name, name_results, origin=get_origin_method_name(method), whitelist=inputs["whitelist"],
+        blacklist=inputs["blacklist"], ipv_type_data=inputs["ipv_type_data"]
     )
+    return len(name_results)
+
+
+def aggregate_channels(channels):
+    """
+    Aggregate all method data for the channels, return the channel data and the stats of each channel, the new ip
+    cache entries and the (hits, misses) of the format name cache
+    :param channels: list of (category, name, old info list, existing info list, list of (method, channel results))
+    """
+    ip_cache_len = [len(cache) for cache in (ip_checker.host_ip, ip_checker.host_ipv_type, ip_checker.ip_map)]
+    format_name_cache = format_name.cache_info()
+    results = []
+    for cate, name, old_info_list, info_list, method_results in channels:
+        data = {cate: {name: info_list}} if info_list is not None else {}
+        stats = aggregate_channel_old_data(data, cate, name, old_info_list)
+        for method, name_results in method_results:
+            stats[method.capitalize()] = aggregate_channel_method(data, cate, name, method, name_results)
+        channel_list = data.get(cate, {}).get(name)
+        stats.update(get_channel_number(channel_list or []))
+        results.append((cate, name, channel_list, stats))
+    ip_cache = [
+        dict(islice(cache.items(), cache_len, None))
+        for cache, cache_len in zip((ip_checker.host_ip, ip_checker.host_ipv_type, ip_checker.ip_map), ip_cache_len)
+    ]
+    cache_info = format_name.cache_info()
+    return results, ip_cache, (cache_info.hits - format_name_cache.hits, cache_info.misses - format_name_cache.misses)
+
+
+def get_aggregation_executor(workers, inputs):
+    """
+    Get the process pool for aggregation, the shared inputs are sent once per worker and the method results with the
+    channels of each task
+    """
+    return ProcessPoolExecutor(max_workers=workers, mp_context=get_process_context(),
+                               initializer=init_aggregation_inputs, initargs=(inputs,))
+
+
+def print_aggregation_report(report, channels_len, no_result_names, workers, elapsed, format_name_cache=(0, 0)):
+    """
+    Print the summarized aggregation report
+    :param format_name_cache: The (hits, misses) of the format name cache in the worker processes
+    """
+    print(f"Aggregation completed: {channels_len} channels, {workers} workers, {elapsed:.2f}s")
+    print(f"Channel name format cache: {get_format_name_cache_stats(*format_name_cache)}")
+    print(", ".join(f"{key}: {value}" for key, value in report.items()))
+    if no_result_names:
+        print(f"No result channels ({len(no_result_names)}): {', '.join(no_result_names)}")
 
 
 def append_total_data(
@@ -673,52 +814,68 @@ def append_total_data(
     """
     Append all method data to total info data
     """
-    total_result = [
-        ("hotel_fofa", hotel_fofa_result),
-        ("multicast", multicast_result),
-        ("hotel_foodie", hotel_foodie_result),
-        ("subscribe", subscribe_result),
-        ("online_search", online_search_result),
+    start_time = time()
+    total_result = zip(
+        aggregation_methods,
+        (hotel_fofa_result, multicast_result, hotel_foodie_result, subscribe_result, online_search_result)
+    )
+    snapshot = config.snapshot
+    total_result = [(method, result) for method, result in total_result if snapshot.open_method[method]]
+    inputs = get_aggregation_inputs(data)
+    channels = [
+        (cate, name, old_info_list, data.get(cate, {}).get(name),
+         [(method, get_channel_results_by_name(name, result)) for method, result in total_result])
+        for cate, channel_obj in items
+        for name, old_info_list in channel_obj.items()
     ]
-    whitelist = get_urls_from_file(constants.whitelist_path)
-    blacklist = get_urls_from_file(constants.blacklist_path, pattern_search=False)
-    url_hosts_ipv_type = {}
-    open_history = config.open_history
-    open_local = config.open_local
-    open_rtmp = config.open_rtmp
-    for obj in data.values():
-        for value_list in obj.values():
-            for value in value_list:
-                if value_ipv_type := value.get("ipv_type", None):
-                    url_hosts_ipv_type[get_url_host(value["url"])] = value_ipv_type
-    for cate, channel_obj in items:
-        for name, old_info_list in channel_obj.items():
-            print(f"{name}:", end=" ")
-            if (open_history or open_local or open_rtmp) and old_info_list:
-                append_old_data_to_info_data(data, cate, name, old_info_list, whitelist=whitelist, blacklist=blacklist,
-                                             ipv_type_data=url_hosts_ipv_type)
-            for method, result in total_result:
-                if config.open_method[method]:
-                    origin_method = get_origin_method_name(method)
-                    if not origin_method:
-                        continue
-                    name_results = get_channel_results_by_name(name, result)
-                    append_data_to_info_data(
-                        data, cate, name, name_results, origin=origin_method, whitelist=whitelist, blacklist=blacklist,
-                        ipv_type_data=url_hosts_ipv_type
-                    )
-                    print(f"{method.capitalize()}:", len(name_results), end=", ")
-            print_channel_number(data, cate, name)
+    channels_len = len(channels)
+    workers = min(os.cpu_count() or 1, constants.aggregation_max_workers)
+    if channels_len < constants.aggregation_min_channels:
+        workers = 1
+    chunks = []
+    if workers > 1:
+        chunk_size = max(channels_len // (workers * 4), 1)
+        try:
+            with get_aggregation_executor(workers, inputs) as executor:
+                chunks = list(executor.map(
+                    aggregate_channels,
+                    [channels[i:i + chunk_size] for i in range(0, channels_len, chunk_size)]
+                ))
+        except Exception as e:
+            print(f"Error on parallel aggregation, fallback to serial: {e}")
+            chunks = []
+    if not chunks:
+        workers = 1
+        init_aggregation_inputs(inputs)
+        chunks = [aggregate_channels(channels)]
+    report = defaultdict(int)
+    no_result_names = []
+    format_name_cache = [0, 0]
+    for results, ip_cache, cache_stats in chunks:
+        if workers > 1:
+            format_name_cache = [total + value for total, value in zip(format_name_cache, cache_stats)]
+        for cache, new_cache in zip((ip_checker.host_ip, ip_checker.host_ipv_type, ip_checker.ip_map), ip_cache):
+            cache.update(new_cache)
+        for cate, name, channel_list, stats in results:
+            if channel_list is not None:
+                data.setdefault(cate, {})[name] = channel_list
+            if not stats["Total"]:
+                no_result_names.append(name)
+            for key, value in stats.items():
+                report[key] += value
+    ip_checker.save()
+    print_aggregation_report(report, channels_len, no_result_names, workers, time() - start_time, format_name_cache)
 
 
 async def test_speed(data, ipv6=False, callback=None):
     """
     Test speed of channel data
     """
-    ipv6_proxy_url = None if (not config.open_ipv6 or ipv6) else constants.ipv6_proxy
-    open_headers = config.open_headers
-    get_resolution = config.open_filter_resolution and check_ffmpeg_installed_status()
-    semaphore = asyncio.Semaphore(config.speed_test_limit)
+    snapshot = config.snapshot
+    ipv6_proxy_url = None if (not snapshot.open_ipv6 or ipv6) else constants.ipv6_proxy
+    open_headers = snapshot.open_headers
+    get_resolution = snapshot.open_filter_resolution and check_ffmpeg_installed_status()
+    semaphore = asyncio.Semaphore(snapshot.speed_test_limit)
 
     async def limited_get_speed(channel_info):
         """
@@ -759,146 +916,296 @@ async def test_speed(data, ipv6=False, callback=None):
     return grouped_results
 
 
+def sort_channel_values(channel_result, cate, name, values, test_result, tested, filter_host=False,
+                        ipv6_support=True, result_log: ResultLog = None):
+    """
+    Sort the values of the channel with its test result into channel result
+    :param test_result: The tested values of the channel
+    :param tested: Whether the speed test result exists
+    :param result_log: The journal of the sorted results
+    """
+    whitelist_result = []
+    for value in values:
+        if value["origin"] in ["whitelist", "live", "hls"] or (
+                not ipv6_support and tested and value["ipv_type"] == "ipv6"
+        ):
+            whitelist_result.append(value)
+        elif filter_host or not tested:
+            test_result.append({**value, **get_speed_result(value["host"])} if filter_host else value)
+    total_result = whitelist_result + get_sort_result(test_result, ipv6_support=ipv6_support)
+    append_data_to_info_data(
+        channel_result,
+        cate,
+        name,
+        total_result,
+        check=False,
+    )
+    if result_log:
+        result_log.write_channel(cate, name, total_result)
+
+
 def sort_channel_result(channel_data, result=None, filter_host=False, ipv6_support=True):
     """
     Sort channel result
     """
     channel_result = defaultdict(lambda: defaultdict(list))
-    logger = get_logger(constants.result_log_path, level=INFO, init=True)
-    for cate, obj in channel_data.items():
-        for name, values in obj.items():
-            if not values:
-                continue
-            whitelist_result = []
-            test_result = result.get(cate, {}).get(name, []) if result else []
-            for value in values:
-                if value["origin"] in ["whitelist", "live", "hls"] or (
-                        not ipv6_support and result and value["ipv_type"] == "ipv6"
-                ):
-                    whitelist_result.append(value)
-                elif filter_host or not result:
-                    test_result.append({**value, **get_speed_result(value["host"])} if filter_host else value)
-            total_result = whitelist_result + get_sort_result(test_result, ipv6_support=ipv6_support)
-            append_data_to_info_data(
-                channel_result,
-                cate,
-                name,
-                total_result,
-                check=False,
-            )
-            for item in total_result:
-                logger.info(
-                    f"Name: {name}, URL: {item.get('url')}, IPv_Type: {item.get("ipv_type")}, Location: {item.get('location')}, ISP: {item.get('isp')}, Date: {item["date"]}, Delay: {item.get('delay') or -1} ms, Speed: {item.get('speed') or 0:.2f} M/s, Resolution: {item.get('resolution')}"
-                )
-    logger.handlers.clear()
+    result_log = ResultLog()
+    try:
+        for cate, obj in channel_data.items():
+            for name, values in obj.items():
+                if not values:
+                    continue
+                test_result = result.get(cate, {}).get(name, []) if result else []
+                sort_channel_values(channel_result, cate, name, values, test_result, bool(result),
+                                    filter_host=filter_host, ipv6_support=ipv6_support, result_log=result_log)
+    finally:
+        result_log.close()
     return channel_result
 
 
-def process_write_content(
-        path: str,
+class ResultFileWriter:
+    """
+    Writer of a result file variant, the txt and m3u lines are streamed to the files while the channel data is walked
+    """
+
+    def __init__(self, path: str, rtmp_url: str = None, live_url: str = None, hls_url: str = None,
+                 update_time: str = None, first_channel_name: str = None, epg_url: str = None):
+        """
+        :param path: write into path, the m3u file is written beside it
+        :param rtmp_url: the live or hls url of all the channel urls, None for the origin urls
+        :param live_url: live url
+        :param hls_url: hls url
+        :param update_time: the update time to show, None if not shown
+        :param first_channel_name: the channel name of the update time item in the m3u
+        :param epg_url: the epg url of the m3u
+        """
+        self.path = path
+        self.rtmp_url = rtmp_url
+        self.live_url = live_url
+        self.hls_url = hls_url
+        self.update_time = update_time
+        self.first_channel_name = first_channel_name
+        snapshot = config.snapshot
+        self.open_url_info = snapshot.open_url_info
+        self.open_headers = snapshot.open_headers
+        self.update_time_top = snapshot.update_time_position == "top"
+        self.result_data = defaultdict(list)
+        self.no_result_name = []
+        self.update_time_item = None
+        self.pending = []
+        self.group = None
+        self.file = ArtifactWriter(path)
+        self.m3u_file = ArtifactWriter(f"{os.path.splitext(path)[0]}.m3u")
+        self.m3u_file.write(f'#EXTM3U x-tvg-url="{epg_url or get_epg_url()}"\n')
+        self.first_cate = True
+
+    def write(self, text: str, m3u_text: str = ""):
+        """
+        Write the txt and m3u texts, hold them until the update time item is known if the update time is shown at
+        the top
+        """
+        if self.pending is not None and self.update_time and self.update_time_top:
+            self.pending.append((text, m3u_text))
+        else:
+            self.file.write(text)
+            self.m3u_file.write(m3u_text)
+
+    def get_update_time_item(self) -> tuple[str, str]:
+        """
+        Get the txt and m3u texts of the update time category
+        """
+        item = self.update_time_item or {"id": "id", "url": "url"}
+        if self.rtmp_url:
+            value = f"{self.rtmp_url}{item['id']}"
+        else:
+            value = item["url"]
+            if self.open_url_info and item.get("extra_info"):
+                value = add_url_info(value, item["extra_info"])
+        info = get_m3u_channel_info(self.update_time, "🕘️更新时间", self.first_channel_name)
+        return f"🕘️更新时间,#genre#\n{self.update_time},{value}", get_m3u_item(info, self.update_time, value)
+
+    def flush_pending(self):
+        """
+        Write the update time at the top and the held texts
+        """
+        if self.pending is None:
+            return
+        pending, self.pending = self.pending, None
+        if self.update_time and self.update_time_top:
+            text, m3u_text = self.get_update_time_item()
+            self.file.write(f"{text}\n\n")
+            self.m3u_file.write(m3u_text)
+        self.file.write("".join(text for text, _ in pending))
+        self.m3u_file.write("".join(m3u_text for _, m3u_text in pending))
+
+    def write_category(self, cate: str):
+        """
+        Write the category line
+        """
+        self.write(f"{'\n\n' if not self.first_cate else ''}{cate},#genre#")
+        self.first_cate = False
+        self.group = cate.strip()
+
+    def write_channel(self, name: str, channel_urls: list, open_empty_category: bool = False):
+        """
+        Write the channel urls
+        """
+        self.result_data[name].extend(channel_urls)
+        if not channel_urls:
+            if open_empty_category:
+                self.no_result_name.append(name)
+            return
+        if self.update_time_item is None:
+            self.update_time_item = channel_urls[0]
+            self.flush_pending()
+        info = get_m3u_channel_info(name, self.group)
+        lines = []
+        m3u_lines = []
+        for item in channel_urls:
+            item_origin = item.get("origin", None)
+            item_rtmp_url = None
+            if item_origin == "live":
+                item_rtmp_url = self.live_url
+            elif item_origin == "hls":
+                item_rtmp_url = self.hls_url
+            item_url = item["url"]
+            if self.open_url_info and item["extra_info"]:
+                item_url = add_url_info(item_url, item["extra_info"])
+            rtmp_url = self.rtmp_url or item_rtmp_url
+            total_item_url = f"{rtmp_url}{item['id']}" if rtmp_url else item_url
+            lines.append(f"\n{name},{total_item_url}")
+            m3u_lines.append(get_m3u_item(info, name, total_item_url, None if rtmp_url else item, self.open_headers))
+        self.write("".join(lines), "".join(m3u_lines))
+
+    def close(self):
+        """
+        Write the no result channels and the update time, move the files into place
+        """
+        if self.no_result_name:
+            self.write(
+                "\n\n🈳无结果频道,#genre#" + "".join(f"\n{name},url" for name in self.no_result_name),
+                "".join(get_m3u_item(get_m3u_channel_info(name, "🈳无结果频道"), name, "url")
+                        for name in self.no_result_name)
+            )
+        self.flush_pending()
+        if self.update_time and not self.update_time_top:
+            text, m3u_text = self.get_update_time_item()
+            self.file.write(f"\n\n{text}")
+            self.m3u_file.write(m3u_text)
+        self.file.close()
+        self.m3u_file.close()
+
+    def discard(self):
+        """
+        Discard the written files, the previous results are kept
+        """
+        self.file.discard()
+        self.m3u_file.discard()
+
+
+def write_rtmp_data(items: list[ChannelData]):
+    """
+    Replace the rtmp result data with a new generation, the table is built aside and swapped in one transaction, so
+    the readers never see a partially populated table
+    """
+    if not items:
+        return
+    conn = get_db_connection(constants.rtmp_data_path)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with conn:
+            conn.execute("DROP TABLE IF EXISTS result_data_next")
+            conn.execute(
+                "CREATE TABLE result_data_next (id TEXT PRIMARY KEY, url TEXT, headers TEXT) WITHOUT ROWID"
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO result_data_next (id, url, headers) VALUES (?, ?, ?)",
+                ((str(item["id"]), item["url"], json.dumps(item.get("headers", None))) for item in items)
+            )
+        with conn:
+            conn.execute("BEGIN")
+            conn.execute("DROP TABLE IF EXISTS result_data")
+            conn.execute("ALTER TABLE result_data_next RENAME TO result_data")
+    finally:
+        return_db_connection(constants.rtmp_data_path, conn)
+
+
+def write_result_files(
         data: CategoryChannelData,
-        live: bool = False,
-        hls: bool = False,
+        file_list: list[dict],
         live_url: str = None,
         hls_url: str = None,
         open_empty_category: bool = False,
         ipv_type_prefer: list[str] = None,
         origin_type_prefer: list[str] = None,
         first_channel_name: str = None,
-        enable_print: bool = False
 ):
     """
-    Get channel write content
-    :param path: write into path
-    :param live: all live channel url
-    :param hls: all hls channel url
+    Write all the result file variants in one pass of the channel data, the urls of the variants with the same
+    ipv type prefer are selected together
+    :param data: the channel data
+    :param file_list: the variants, such as {"path": path, "live": True, "ipv_type_prefer": ["ipv4"]},
+        the first variant with enable_log is printed
     :param live_url: live url
     :param hls_url: hls url
     :param open_empty_category: show empty category
-    :param ipv_type_prefer: ipv type prefer
+    :param ipv_type_prefer: the default ipv type prefer
     :param origin_type_prefer: origin type prefer
     :param first_channel_name: the first channel name
     """
-    content = ""
-    no_result_name = []
-    first_cate = True
-    result_data = defaultdict(list)
-    custom_print.disable = not enable_print
-    rtmp_url = live_url if live else hls_url if hls else None
-    rtmp_type = ["live", "hls"] if live and hls else ["live"] if live else ["hls"] if hls else []
-    open_url_info = config.open_url_info
-    for cate, channel_obj in data.items():
-        custom_print(f"\n{cate}:", end=" ")
-        content += f"{'\n\n' if not first_cate else ''}{cate},#genre#"
-        first_cate = False
-        channel_obj_keys = channel_obj.keys()
-        names_len = len(list(channel_obj_keys))
-        for i, name in enumerate(channel_obj_keys):
-            info_list = data.get(cate, {}).get(name, [])
-            channel_urls = get_total_urls(info_list, ipv_type_prefer, origin_type_prefer, rtmp_type)
-            result_data[name].extend(channel_urls)
-            end_char = ", " if i < names_len - 1 else ""
-            custom_print(f"{name}:", len(channel_urls), end=end_char)
-            if not channel_urls:
-                if open_empty_category:
-                    no_result_name.append(name)
-                continue
-            for item in channel_urls:
-                item_origin = item.get("origin", None)
-                item_rtmp_url = None
-                if item_origin == "live":
-                    item_rtmp_url = live_url
-                elif item_origin == "hls":
-                    item_rtmp_url = hls_url
-                item_url = item["url"]
-                if open_url_info and item["extra_info"]:
-                    item_url = add_url_info(item_url, item["extra_info"])
-                total_item_url = f"{rtmp_url or item_rtmp_url}{item['id']}" if rtmp_url or item_rtmp_url else item_url
-                content += f"\n{name},{total_item_url}"
-        custom_print()
-    if open_empty_category and no_result_name:
-        custom_print("\n🈳 No result channel name:")
-        content += "\n\n🈳无结果频道,#genre#"
-        for i, name in enumerate(no_result_name):
-            end_char = ", " if i < len(no_result_name) - 1 else ""
-            custom_print(name, end=end_char)
-            content += f"\n{name},url"
-        custom_print()
-    if config.open_update_time:
-        update_time_item = next(
-            (urls[0] for channel_obj in data.values()
-             for info_list in channel_obj.values()
-             if (urls := get_total_urls(info_list, ipv_type_prefer, origin_type_prefer, rtmp_type))),
-            {"id": "id", "url": "url"}
-        )
-        now = get_datetime_now()
-        update_time_item_url = update_time_item["url"]
-        if open_url_info and update_time_item["extra_info"]:
-            update_time_item_url = add_url_info(update_time_item_url, update_time_item["extra_info"])
-        value = f"{rtmp_url}{update_time_item["id"]}" if rtmp_url else update_time_item_url
-        if config.update_time_position == "top":
-            content = f"🕘️更新时间,#genre#\n{now},{value}\n\n{content}"
-        else:
-            content += f"\n\n🕘️更新时间,#genre#\n{now},{value}"
-    if rtmp_url:
-        conn = get_db_connection(constants.rtmp_data_path)
-        try:
-            cursor = conn.cursor()
-            cursor.execute(
-                "CREATE TABLE IF NOT EXISTS result_data (id TEXT PRIMARY KEY, url TEXT, headers TEXT)"
+    update_time = get_datetime_now() if config.snapshot.open_update_time else None
+    epg_url = get_epg_url()
+    groups = defaultdict(list)
+    writers = []
+    try:
+        for file in file_list:
+            live, hls = file.get("live", False), file.get("hls", False)
+            rtmp_type = ["live", "hls"] if live and hls else ["live"] if live else ["hls"] if hls else []
+            writer = ResultFileWriter(
+                file["path"],
+                rtmp_url=live_url if live else hls_url if hls else None,
+                live_url=live_url,
+                hls_url=hls_url,
+                update_time=update_time,
+                first_channel_name=first_channel_name,
+                epg_url=epg_url,
             )
-            for data_list in result_data.values():
-                for item in data_list:
-                    cursor.execute(
-                        "INSERT OR REPLACE INTO result_data (id, url, headers) VALUES (?, ?, ?)",
-                        (item["id"], item["url"], json.dumps(item.get("headers", None)))
+            writers.append(writer)
+            groups[tuple(file.get("ipv_type_prefer", ipv_type_prefer))].append((writer, rtmp_type))
+        log_writer = next((writer for writer, file in zip(writers, file_list) if file.get("enable_log")), None)
+        custom_print.disable = log_writer is None
+        for cate, channel_obj in data.items():
+            custom_print(f"\n{cate}:", end=" ")
+            for writer in writers:
+                writer.write_category(cate)
+            names_len = len(channel_obj)
+            for i, (name, info_list) in enumerate(channel_obj.items()):
+                for prefer, group in groups.items():
+                    variants = get_total_urls_variants(
+                        info_list, list(prefer), origin_type_prefer, [rtmp_type for _, rtmp_type in group]
                     )
-            conn.commit()
-        finally:
-            return_db_connection(constants.rtmp_data_path, conn)
-    with open(path, "w", encoding="utf-8") as f:
-        f.write(content)
-    convert_to_m3u(path, first_channel_name, data=result_data)
+                    for (writer, _), channel_urls in zip(group, variants):
+                        writer.write_channel(name, channel_urls, open_empty_category)
+                        if writer is log_writer:
+                            end_char = ", " if i < names_len - 1 else ""
+                            custom_print(f"{name}:", len(channel_urls), end=end_char)
+            custom_print()
+        if log_writer and log_writer.no_result_name:
+            custom_print("\n🈳 No result channel name:")
+            custom_print(", ".join(log_writer.no_result_name))
+        write_rtmp_data([
+            item
+            for writer in writers if writer.rtmp_url
+            for data_list in writer.result_data.values()
+            for item in data_list
+        ])
+    except:
+        for writer in writers:
+            writer.discard()
+        raise
+    for writer in writers:
+        writer.close()
 
 
 def write_channel_to_file(data, epg=None, ipv6=False, first_channel_name=None):
@@ -919,13 +1226,14 @@ def write_channel_to_file(data, epg=None, ipv6=False, first_channel_name=None):
         for dir_name in dir_list:
             os.makedirs(dir_name, exist_ok=True)
         if epg:
-            write_to_xml(epg, constants.epg_result_path)
-            compress_to_gz(constants.epg_result_path, constants.epg_gz_result_path)
-        open_empty_category = config.open_empty_category
-        ipv_type_prefer = list(config.ipv_type_prefer)
+            write_to_xml(epg, constants.epg_result_path, constants.epg_gz_result_path, pretty=config.open_epg_pretty)
+            write_to_db(epg, constants.epg_data_path)
+        snapshot = config.snapshot
+        open_empty_category = snapshot.open_empty_category
+        ipv_type_prefer = list(snapshot.ipv_type_prefer)
         if any(pref in ipv_type_prefer for pref in ["自动", "auto"]):
             ipv_type_prefer = ["ipv6", "ipv4"] if ipv6 else ["ipv4", "ipv6"]
-        origin_type_prefer = config.origin_type_prefer
+        origin_type_prefer = list(snapshot.origin_type_prefer)
         address = get_ip_address()
         live_url = f"{address}/live/"
         hls_url = f"{address}/hls/"
@@ -959,20 +1267,16 @@ def write_channel_to_file(data, epg=None, ipv6=False, first_channel_name=None):
                     "ipv_type_prefer": ["ipv6"]
                 },
             ]
-        for file in file_list:
-            process_write_content(
-                path=file["path"],
-                data=data,
-                live=file.get("live", False),
-                hls=file.get("hls", False),
-                live_url=live_url,
-                hls_url=hls_url,
-                open_empty_category=open_empty_category,
-                ipv_type_prefer=file.get("ipv_type_prefer", ipv_type_prefer),
-                origin_type_prefer=origin_type_prefer,
-                first_channel_name=first_channel_name,
-                enable_print=file.get("enable_log", False),
-            )
+        write_result_files(
+            data,
+            file_list,
+            live_url=live_url,
+            hls_url=hls_url,
+            open_empty_category=open_empty_category,
+            ipv_type_prefer=ipv_type_prefer,
+            origin_type_prefer=origin_type_prefer,
+            first_channel_name=first_channel_name,
+        )
         print("✅ Write channel to file success")
     except Exception as e:
         print(f"❌ Write channel to file failed: {e}")
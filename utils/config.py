@@ -3,6 +3,8 @@ import os
 import re
 import shutil
 import sys
+from dataclasses import dataclass
+from types import MappingProxyType
 
 
 def resource_path(relative_path, persistent=False):
@@ -34,10 +36,46 @@ def get_resolution_value(resolution_str):
         return 0
 
 
+@dataclass(frozen=True, slots=True)
+class ConfigSnapshot:
+    """
+    Immutable settings read by the hot paths, built once from the config
+    """
+    ipv_type: str
+    open_ipv6: bool
+    ipv_type_prefer: tuple[str, ...]
+    origin_type_prefer: tuple[str, ...]
+    ipv_limit: MappingProxyType
+    source_limits: MappingProxyType
+    urls_limit: int
+    recent_days: int
+    open_method: MappingProxyType
+    open_history: bool
+    open_local: bool
+    open_rtmp: bool
+    open_headers: bool
+    open_url_info: bool
+    open_update_time: bool
+    update_time_position: str
+    open_empty_category: bool
+    speed_test_timeout: int
+    speed_test_filter_host: bool
+    speed_test_limit: int
+    open_filter_speed: bool
+    open_filter_resolution: bool
+    open_supply: bool
+    min_speed: float
+    min_resolution_value: int
+    max_resolution_value: int
+    location: tuple[str, ...]
+    isp: tuple[str, ...]
+
+
 class ConfigManager:
 
     def __init__(self):
         self.config = None
+        self.snapshot: ConfigSnapshot | None = None
         self.load()
 
     def __getattr__(self, name, *args, **kwargs):
@@ -51,6 +89,10 @@ class ConfigManager:
     def open_update(self):
         return self.config.getboolean("Settings", "open_update", fallback=True)
 
+    @property
+    def open_pipeline(self):
+        return self.config.getboolean("Settings", "open_pipeline", fallback=False)
+
     @property
     def open_use_cache(self):
         return self.config.getboolean("Settings", "open_use_cache", fallback=True)
@@ -188,6 +230,22 @@ class ConfigManager:
     def recent_days(self):
         return self.config.getint("Settings", "recent_days", fallback=30)
 
+    @property
+    def history_fail_limit(self):
+        return self.config.getint("Settings", "history_fail_limit", fallback=3)
+
+    @property
+    def history_expire_days(self):
+        return self.config.getint("Settings", "history_expire_days", fallback=30)
+
+    @property
+    def history_channel_limit(self):
+        return self.config.getint("Settings", "history_channel_limit", fallback=100)
+
+    @property
+    def history_size_limit(self):
+        return self.config.getfloat("Settings", "history_size_limit", fallback=50)
+
     @property
     def source_file(self):
         return self.config.get("Settings", "source_file", fallback="config/demo.txt")
@@ -285,6 +343,26 @@ class ConfigManager:
     def request_timeout(self):
         return self.config.getint("Settings", "request_timeout", fallback=10)
 
+    @property
+    def request_limit(self):
+        return self.config.getint("Settings", "request_limit", fallback=10)
+
+    @property
+    def request_host_limit(self):
+        return self.config.getint("Settings", "request_host_limit", fallback=10)
+
+    @property
+    def request_domain_rate(self):
+        return self.config.getfloat("Settings", "request_domain_rate", fallback=2)
+
+    @property
+    def request_breaker_cooldown(self):
+        return self.config.getint("Settings", "request_breaker_cooldown", fallback=300)
+
+    @property
+    def source_timeout(self):
+        return self.config.getint("Settings", "source_timeout", fallback=0)
+
     @property
     def speed_test_timeout(self):
         return self.config.getint("Settings", "speed_test_timeout", fallback=10)
@@ -295,6 +373,14 @@ class ConfigManager:
             "Settings", "open_driver", fallback=False
         )
 
+    @property
+    def driver_pool_size(self):
+        return self.config.getint("Settings", "driver_pool_size", fallback=3)
+
+    @property
+    def driver_recycle_count(self):
+        return self.config.getint("Settings", "driver_recycle_count", fallback=20)
+
     @property
     def hotel_page_num(self):
         return self.config.getint("Settings", "hotel_page_num", fallback=1)
@@ -351,6 +437,14 @@ class ConfigManager:
     def cdn_url(self):
         return self.config.get("Settings", "cdn_url", fallback="")
 
+    @property
+    def epg_past_days(self):
+        return self.config.getint("Settings", "epg_past_days", fallback=1)
+
+    @property
+    def epg_future_days(self):
+        return self.config.getint("Settings", "epg_future_days", fallback=7)
+
     @property
     def open_rtmp(self):
         return not os.getenv("GITHUB_ACTIONS") and self.config.getboolean("Settings", "open_rtmp", fallback=True)
@@ -363,6 +457,10 @@ class ConfigManager:
     def open_epg(self):
         return self.config.getboolean("Settings", "open_epg", fallback=True)
 
+    @property
+    def open_epg_pretty(self):
+        return self.config.getboolean("Settings", "open_epg_pretty", fallback=True)
+
     @property
     def speed_test_limit(self):
         return self.config.getint("Settings", "speed_test_limit", fallback=10)
@@ -405,6 +503,42 @@ class ConfigManager:
             if os.path.exists(config_file):
                 with open(config_file, "r", encoding="utf-8") as f:
                     self.config.read_file(f)
+        self.refresh_snapshot()
+
+    def refresh_snapshot(self):
+        """
+        Rebuild the settings snapshot from the current config
+        """
+        self.snapshot = ConfigSnapshot(
+            ipv_type=self.ipv_type,
+            open_ipv6=self.open_ipv6,
+            ipv_type_prefer=tuple(self.ipv_type_prefer),
+            origin_type_prefer=tuple(self.origin_type_prefer),
+            ipv_limit=MappingProxyType(self.ipv_limit),
+            source_limits=MappingProxyType(self.source_limits),
+            urls_limit=self.urls_limit,
+            recent_days=self.recent_days,
+            open_method=MappingProxyType(self.open_method),
+            open_history=self.open_history,
+            open_local=self.open_local,
+            open_rtmp=self.open_rtmp,
+            open_headers=self.open_headers,
+            open_url_info=self.open_url_info,
+            open_update_time=self.open_update_time,
+            update_time_position=self.update_time_position,
+            open_empty_category=self.open_empty_category,
+            speed_test_timeout=self.speed_test_timeout,
+            speed_test_filter_host=self.speed_test_filter_host,
+            speed_test_limit=self.speed_test_limit,
+            open_filter_speed=self.open_filter_speed,
+            open_filter_resolution=self.open_filter_resolution,
+            open_supply=self.open_supply,
+            min_speed=self.min_speed,
+            min_resolution_value=self.min_resolution_value,
+            max_resolution_value=self.max_resolution_value,
+            location=tuple(self.location),
+            isp=tuple(self.isp),
+        )
 
     def set(self, section, key, value):
         """
@@ -426,6 +560,7 @@ class ConfigManager:
             os.makedirs(os.path.dirname(user_config_path), exist_ok=True)
         with open(user_config_path, "w", encoding="utf-8") as configfile:
             self.config.write(configfile)
+        self.refresh_snapshot()
 
     def copy(self, path="config"):
         """
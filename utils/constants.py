@@ -23,6 +23,8 @@ epg_result_path = os.path.join(output_dir, "epg/epg.xml")
 
 epg_gz_result_path = os.path.join(output_dir, "epg/epg.gz")
 
+epg_data_path = os.path.join(output_dir, "data/epg.db")
+
 ipv4_result_path = os.path.join(output_dir, "ipv4/result.txt")
 
 ipv6_result_path = os.path.join(output_dir, "ipv6/result.txt")
@@ -43,7 +45,23 @@ hls_ipv6_result_path = os.path.join(output_dir, "ipv6/hls.txt")
 
 cache_path = os.path.join(output_dir, "data/cache.pkl.gz")
 
-result_log_path = os.path.join(output_dir, "log/result.log")
+history_path = os.path.join(output_dir, "data/history.db")
+
+history_touch_interval = 24 * 3600
+
+http_cache_path = os.path.join(output_dir, "data/http_cache.db")
+
+ip_cache_path = os.path.join(output_dir, "data/ip_cache.pkl.gz")
+
+ip_cache_dns_ttl = 24 * 3600
+
+result_log_path = os.path.join(output_dir, "log/result.jsonl")
+
+result_log_summary_path = os.path.join(output_dir, "log/result_summary.json")
+
+result_log_backup_count = 3
+
+result_log_buffer_size = 262144
 
 log_path = os.path.join(output_dir, "log/log.log")
 
@@ -72,6 +90,20 @@ multiline_m3u_pattern = re.compile(
 
 key_value_pattern = re.compile(r'(?P<key>\w+)=(?P<value>\S+)')
 
+m3u_channel_name_pattern = re.compile(r"(CCTV|CETV)-(\d+)(\+.*)?")
+
+epg_time_pattern = re.compile(r"(\d{14})([+-])(\d{2})(\d{2})")
+
+epg_slice_size = 65536
+
+epg_max_workers = 8
+
+epg_cache_max_age = 3600
+
+artifact_gzip_level = 6
+
+artifact_brotli_quality = 5
+
 sub_pattern = re.compile(
     r"-|_|\((.*?)\)|（(.*?)）|\[(.*?)]|「(.*?)」| |｜|频道|普清|标清|高清|HD|hd|超清|超高|超高清|中央|央视|电视台|台|电信|联通|移动")
 
@@ -111,6 +143,19 @@ region_list = [
     "云南",
 ]
 
+region_pattern = re.compile(
+    "|".join(f"{re.escape(region)}｜" for region in sorted(set(region_list), key=len, reverse=True)))
+
+replace_pattern = re.compile("|".join(re.escape(old) for old in replace_dict))
+
+format_name_cache_size = 65536
+
+aggregation_max_workers = 8
+
+aggregation_min_channels = 100
+
+pipeline_queue_size = 1000
+
 origin_map = {
     "hotel": "酒店源",
     "multicast": "组播源",
@@ -122,6 +167,8 @@ origin_map = {
 
 ipv6_proxy = "http://www.ipv6proxy.net/go.php?u="
 
+block_page_keywords = ["访问异常", "禁止访问", "资源访问每天限制"]
+
 foodie_url = "http://www.foodieguide.com/iptvsearch/"
 
 foodie_hotel_url = "http://www.foodieguide.com/iptvsearch/hoteliptv.php"
@@ -0,0 +1,174 @@
+import threading
+from time import monotonic
+
+from utils.config import config
+from utils.driver.setup import setup_driver
+
+
+class DriverPool:
+    """
+    Bounded pool of warm browsers, a browser is reset between leases and restarted after the recycle count or on crash
+    """
+
+    def __init__(self, size: int, recycle_count: int = 0, factory=setup_driver):
+        """
+        :param size: The max number of browsers
+        :param recycle_count: The number of leases after which a browser is restarted, 0 means never
+        :param factory: Create a new browser
+        """
+        self.size = max(size, 1)
+        self.recycle_count = recycle_count
+        self.factory = factory
+        self.idle = []
+        self.uses = {}
+        self.alive = 0
+        self.condition = threading.Condition()
+        self.stats = {"leases": 0, "started": 0, "recycled": 0, "wait_time": 0.0, "max_wait_time": 0.0}
+
+    def acquire(self):
+        """
+        Lease a browser, wait until one is idle or the pool has room for a new one
+        """
+        start_time = monotonic()
+        with self.condition:
+            while not self.idle and self.alive >= self.size:
+                self.condition.wait()
+            driver = self.idle.pop() if self.idle else None
+            if driver is None:
+                self.alive += 1
+            wait_time = monotonic() - start_time
+            self.stats["leases"] += 1
+            self.stats["wait_time"] += wait_time
+            self.stats["max_wait_time"] = max(self.stats["max_wait_time"], wait_time)
+        if driver is None:
+            try:
+                driver = self.factory()
+            except:
+                with self.condition:
+                    self.alive -= 1
+                    self.condition.notify()
+                raise
+            with self.condition:
+                self.uses[driver] = 0
+                self.stats["started"] += 1
+        return driver
+
+    @staticmethod
+    def reset(driver):
+        """
+        Reset the browser state, close the extra windows and clear the cookies and storage
+        """
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+        try:
+            driver.execute_script("window.localStorage.clear();window.sessionStorage.clear();")
+        except:
+            pass
+        driver.delete_all_cookies()
+        driver.get("about:blank")
+
+    @staticmethod
+    def quit(driver):
+        """
+        Quit the browser
+        """
+        try:
+            driver.quit()
+        except:
+            pass
+
+    def release(self, driver, discard: bool = False):
+        """
+        Return the leased browser to the pool, discard it if it is crashed or reaches the recycle count
+        """
+        with self.condition:
+            leased = driver in self.uses
+            uses = self.uses.get(driver, 0) + 1
+        if not leased:
+            self.quit(driver)
+            return
+        if not discard and not (self.recycle_count and uses >= self.recycle_count):
+            try:
+                self.reset(driver)
+            except:
+                discard = True
+        else:
+            discard = True
+        if discard:
+            self.quit(driver)
+        with self.condition:
+            if discard:
+                self.uses.pop(driver, None)
+                self.alive -= 1
+                self.stats["recycled"] += 1
+            else:
+                self.uses[driver] = uses
+                self.idle.append(driver)
+            self.condition.notify()
+
+    def close(self):
+        """
+        Quit all the idle browsers
+        """
+        with self.condition:
+            idle, self.idle = self.idle, []
+            for driver in idle:
+                self.uses.pop(driver, None)
+            self.alive -= len(idle)
+        for driver in idle:
+            self.quit(driver)
+
+    def get_report(self) -> str:
+        """
+        Get the report of the pool usage
+        """
+        leases = self.stats["leases"]
+        average = self.stats["wait_time"] / leases if leases else 0
+        return (
+            f"Driver pool: {leases} leases, {self.stats['started']} browsers started, "
+            f"{self.stats['recycled']} recycled, wait time avg {average:.2f}s, max {self.stats['max_wait_time']:.2f}s"
+        )
+
+
+driver_pool: DriverPool | None = None
+driver_pool_lock = threading.Lock()
+
+
+def get_driver_pool() -> DriverPool:
+    """
+    Get the shared driver pool
+    """
+    global driver_pool
+    with driver_pool_lock:
+        if driver_pool is None:
+            driver_pool = DriverPool(config.driver_pool_size, config.driver_recycle_count)
+        return driver_pool
+
+
+def lease_driver():
+    """
+    Lease a browser from the shared driver pool
+    """
+    return get_driver_pool().acquire()
+
+
+def release_driver(driver, discard: bool = False):
+    """
+    Return the browser to the shared driver pool
+    """
+    get_driver_pool().release(driver, discard=discard)
+
+
+def close_driver_pool():
+    """
+    Quit the browsers of the shared driver pool and print its report
+    """
+    global driver_pool
+    with driver_pool_lock:
+        pool, driver_pool = driver_pool, None
+    if pool:
+        pool.close()
+        print(pool.get_report())
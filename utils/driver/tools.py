@@ -21,21 +21,21 @@ def get_soup_driver(url):
     """
     Get the soup by driver
     """
-    from utils.driver.setup import setup_driver
-
-    driver = setup_driver()
-    retry_func(lambda: driver.get(url), name=url)
-    sleep(1)
-    source = re.sub(
-        r"<!--.*?-->",
-        "",
-        driver.page_source,
-        flags=re.DOTALL,
-    )
-    soup = BeautifulSoup(source, "html.parser")
-    driver.close()
-    driver.quit()
-    return soup
+    from utils.driver.pool import lease_driver, release_driver
+
+    driver = lease_driver()
+    try:
+        retry_func(lambda: driver.get(url), name=url)
+        sleep(1)
+        source = re.sub(
+            r"<!--.*?-->",
+            "",
+            driver.page_source,
+            flags=re.DOTALL,
+        )
+    finally:
+        release_driver(driver)
+    return BeautifulSoup(source, "html.parser")
 
 
 def search_submit(driver, name):
@@ -0,0 +1,238 @@
+import gzip
+import json
+import os
+import pickle
+from time import time
+
+import utils.constants as constants
+from utils.config import config
+from utils.db import get_db_connection, return_db_connection
+from utils.tools import merge_objects, resource_path
+from utils.types import CategoryChannelData, ChannelData
+
+
+def dumps_history_item(item: ChannelData) -> str:
+    """
+    Serialize the history item
+    """
+    return json.dumps(item, ensure_ascii=False, sort_keys=True, default=str)
+
+
+def init_history_db(conn):
+    """
+    Create or upgrade the history table, migrate the legacy pickle cache on first creation
+    """
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(history)")}
+    if not columns:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute(
+            "CREATE TABLE history (category TEXT, name TEXT, url TEXT, data TEXT, fail_count INTEGER DEFAULT 0, "
+            "updated_at REAL, PRIMARY KEY (category, name, url))"
+        )
+        conn.commit()
+        migrate_history(conn)
+        return
+    if "fail_count" not in columns:
+        with conn:
+            conn.execute("ALTER TABLE history ADD COLUMN fail_count INTEGER DEFAULT 0")
+            conn.execute("ALTER TABLE history ADD COLUMN updated_at REAL")
+            conn.execute("UPDATE history SET updated_at = ?", (time(),))
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+
+
+def migrate_history(conn):
+    """
+    Migrate the legacy gzip pickle cache into the history table
+    """
+    cache_path = resource_path(constants.cache_path)
+    if not os.path.exists(cache_path):
+        return
+    start_time = time()
+    try:
+        with gzip.open(cache_path, "rb") as file:
+            cache = pickle.load(file) or {}
+    except Exception as e:
+        print(f"Error on migrating history cache: {e}")
+        return
+    now = time()
+    rows = [
+        (cate, name, item["url"], dumps_history_item(item), now)
+        for cate, channel_obj in cache.items()
+        for name, info_list in channel_obj.items()
+        for item in info_list
+        if item and item.get("url")
+    ]
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO history (category, name, url, data, updated_at) VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+    print(f"History migrated: {len(rows)} rows from {constants.cache_path} in {time() - start_time:.2f}s")
+
+
+def get_history_connection():
+    """
+    Get the history db connection, make sure the table exists
+    """
+    path = resource_path(constants.history_path, persistent=True)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = get_db_connection(path)
+    init_history_db(conn)
+    return path, conn
+
+
+def get_channel_history(conn, cate: str, name: str) -> list[tuple[str, str, int, float]]:
+    """
+    Get the history rows (url, data, fail count, updated time) of the channel
+    """
+    return conn.execute(
+        "SELECT url, data, fail_count, updated_at FROM history WHERE category = ? AND name = ? ORDER BY rowid",
+        (cate, name)
+    ).fetchall()
+
+
+def get_history(channels: CategoryChannelData) -> CategoryChannelData:
+    """
+    Get the history data of the channels
+    """
+    start_time = time()
+    result = {}
+    rows_len = 0
+    path, conn = get_history_connection()
+    try:
+        for cate, channel_obj in channels.items():
+            for name in channel_obj:
+                rows = get_channel_history(conn, cate, name)
+                if rows:
+                    result.setdefault(cate, {})[name] = [json.loads(row[1]) for row in rows]
+                    rows_len += len(rows)
+    finally:
+        return_db_connection(path, conn)
+    print(f"History loaded: {rows_len} rows in {time() - start_time:.2f}s")
+    return result
+
+
+def save_history(data: CategoryChannelData):
+    """
+    Merge the data into history, only write the changed rows.
+    A dead interface increases its fail count and keeps its updated time, a live one is touched at most once per
+    touch interval. The history interfaces of the channels that are missing in the data (frozen as dead or filtered
+    out in this run) increase their fail count too.
+    """
+    start_time = time()
+    now = start_time
+    rows = []
+    missing = []
+    total = 0
+    path, conn = get_history_connection()
+    try:
+        for cate, channel_obj in data.items():
+            for name, info_list in channel_obj.items():
+                if not info_list:
+                    continue
+                history = {row[0]: row[1:] for row in get_channel_history(conn, cate, name)}
+                for item in info_list:
+                    url = item and item.get("url")
+                    if not url:
+                        continue
+                    total += 1
+                    old_data, fail_count, updated_at = history.get(url, (None, 0, None))
+                    new_item = merge_objects(json.loads(old_data), item, match_key="url") if old_data else item
+                    new_data = dumps_history_item(new_item)
+                    if item.get("delay") == -1:
+                        fail_count += 1
+                        updated_at = now if new_data != old_data or updated_at is None else updated_at
+                    elif (new_data != old_data or fail_count or updated_at is None
+                          or now - updated_at > constants.history_touch_interval):
+                        fail_count = 0
+                        updated_at = now
+                    else:
+                        continue
+                    rows.append((cate, name, url, new_data, fail_count, updated_at))
+                    history[url] = (new_data, fail_count, updated_at)
+                urls = {item["url"] for item in info_list if item and item.get("url")}
+                missing.extend((cate, name, url) for url in history if url not in urls)
+        with conn:
+            conn.executemany(
+                "INSERT INTO history (category, name, url, data, fail_count, updated_at) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (category, name, url) DO UPDATE SET data = excluded.data, "
+                "fail_count = excluded.fail_count, updated_at = excluded.updated_at",
+                rows
+            )
+            conn.executemany(
+                "UPDATE history SET fail_count = fail_count + 1 WHERE category = ? AND name = ? AND url = ?",
+                missing
+            )
+    except Exception as e:
+        print(f"Error on saving history: {e}")
+    finally:
+        return_db_connection(path, conn)
+    print(f"History saved: {len(rows)}/{total} rows changed, {len(missing)} missing rows in "
+          f"{time() - start_time:.2f}s")
+
+
+def get_history_db_size(conn) -> int:
+    """
+    Get the size of the history db in bytes
+    """
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    return page_count * page_size
+
+
+def compact_history() -> dict[str, int]:
+    """
+    Evict the dead, expired and over limit interfaces from history, then reclaim the free pages
+    """
+    start_time = time()
+    stats = {"dead": 0, "expired": 0, "channel_limit": 0, "size_limit": 0, "reclaimed": 0}
+    fail_limit = config.history_fail_limit
+    expire_days = config.history_expire_days
+    channel_limit = config.history_channel_limit
+    size_limit = int(config.history_size_limit * 1024 * 1024)
+    path, conn = get_history_connection()
+    try:
+        size = get_history_db_size(conn)
+        with conn:
+            if fail_limit > 0:
+                stats["dead"] = conn.execute(
+                    "DELETE FROM history WHERE fail_count >= ?", (fail_limit,)
+                ).rowcount
+            if expire_days > 0:
+                stats["expired"] = conn.execute(
+                    "DELETE FROM history WHERE updated_at < ?", (time() - expire_days * 86400,)
+                ).rowcount
+            if channel_limit > 0:
+                stats["channel_limit"] = conn.execute(
+                    "DELETE FROM history WHERE rowid IN (SELECT rowid FROM (SELECT rowid, ROW_NUMBER() OVER ("
+                    "PARTITION BY category, name ORDER BY fail_count, updated_at DESC) AS rank FROM history) "
+                    "WHERE rank > ?)",
+                    (channel_limit,)
+                ).rowcount
+            if size_limit > 0:
+                free_count = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+                used_size = get_history_db_size(conn) - free_count * page_size
+                if used_size > size_limit:
+                    rows_len = conn.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+                    evict_len = rows_len - int(rows_len * size_limit / used_size)
+                    stats["size_limit"] = conn.execute(
+                        "DELETE FROM history WHERE rowid IN (SELECT rowid FROM history "
+                        "ORDER BY fail_count DESC, updated_at LIMIT ?)",
+                        (evict_len,)
+                    ).rowcount
+        conn.execute("PRAGMA incremental_vacuum").fetchall()
+        stats["reclaimed"] = size - get_history_db_size(conn)
+    except Exception as e:
+        print(f"Error on compacting history: {e}")
+    finally:
+        return_db_connection(path, conn)
+    evicted = stats["dead"] + stats["expired"] + stats["channel_limit"] + stats["size_limit"]
+    print(
+        f"History compacted: {evicted} rows evicted (Dead: {stats['dead']}, Expired: {stats['expired']}, "
+        f"Channel limit: {stats['channel_limit']}, Size limit: {stats['size_limit']}), "
+        f"{stats['reclaimed'] / 1024:.1f} KB reclaimed in {time() - start_time:.2f}s"
+    )
+    return stats
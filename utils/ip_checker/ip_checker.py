@@ -1,8 +1,14 @@
+import gzip
+import os
+import pickle
 import socket
+from concurrent.futures import ThreadPoolExecutor
+from time import time
 from urllib.parse import urlparse
 
 import ipdb
 
+import utils.constants as constants
 from utils.tools import resource_path
 
 
@@ -12,6 +18,39 @@ class IPChecker:
         self.url_host = {}
         self.host_ip = {}
         self.host_ipv_type = {}
+        self.ip_map: dict[str, tuple[str | None, str | None]] = {}
+        self.load()
+
+    def load(self):
+        """
+        Load the persisted DNS and IP location cache
+        """
+        try:
+            with gzip.open(resource_path(constants.ip_cache_path), "rb") as file:
+                cache = pickle.load(file) or {}
+        except:
+            return
+        self.ip_map.update(cache.get("ip_map", {}))
+        if time() - cache.get("time", 0) < constants.ip_cache_dns_ttl:
+            self.host_ip.update(cache.get("host_ip", {}))
+            self.host_ipv_type.update(cache.get("host_ipv_type", {}))
+
+    def save(self):
+        """
+        Persist the DNS and IP location cache
+        """
+        try:
+            path = resource_path(constants.ip_cache_path, persistent=True)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with gzip.open(path, "wb") as file:
+                pickle.dump({
+                    "time": time(),
+                    "host_ip": self.host_ip,
+                    "host_ipv_type": self.host_ipv_type,
+                    "ip_map": self.ip_map,
+                }, file)
+        except Exception as e:
+            print(f"Error on saving ip cache: {e}")
 
     def get_host(self, url: str) -> str:
         """
@@ -63,20 +102,44 @@ class IPChecker:
         :param ip: The IP address to find
         :return: A tuple of (location, ISP)
         """
+        if ip in self.ip_map:
+            return self.ip_map[ip]
+
         try:
             result = self.db.find_map(ip, "CN")
             if not result:
-                return None, None
-
-            location_parts = [
-                result.get('country_name', ''),
-                result.get('region_name', ''),
-                result.get('city_name', '')
-            ]
-            location = "-".join(filter(None, location_parts))
-            isp = result.get('isp_domain', None)
-
-            return location, isp
+                location, isp = None, None
+            else:
+                location_parts = [
+                    result.get('country_name', ''),
+                    result.get('region_name', ''),
+                    result.get('city_name', '')
+                ]
+                location = "-".join(filter(None, location_parts))
+                isp = result.get('isp_domain', None)
         except Exception as e:
             print(f"Error on finding ip location and ISP: {e}")
             return None, None
+
+        self.ip_map[ip] = (location, isp)
+        return location, isp
+
+    def find_map_by_urls(self, urls: list[str], max_workers: int = 10) -> dict[str, tuple[str | None, str | None]]:
+        """
+        Tag the hosts of the URLs with location and ISP in one call, resolving the unique hosts concurrently
+        :param urls: The URLs to tag
+        :param max_workers: The max number of concurrent DNS lookups
+        :return: A dict of host to (location, ISP)
+        """
+        hosts = {}
+        for url in urls:
+            hosts.setdefault(self.get_host(url), url)
+        unresolved = [url for host, url in hosts.items() if host not in self.host_ip]
+        if len(unresolved) > 1:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                list(executor.map(self.get_ipv_type, unresolved))
+        result = {}
+        for host, url in hosts.items():
+            ip = self.get_ip(url)
+            result[host] = self.find_map(ip) if ip else (None, None)
+        return result
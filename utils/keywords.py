@@ -0,0 +1,104 @@
+import os
+from collections import deque
+
+from utils.tools import get_real_path, resource_path, get_urls_from_file
+
+try:
+    import ahocorasick
+except:
+    ahocorasick = None
+
+
+class KeywordMatcher:
+    """
+    Multi-pattern keyword matcher based on the Aho-Corasick automaton
+    """
+
+    def __init__(self, keywords: list[str] = None):
+        self.keywords = [keyword for keyword in dict.fromkeys(keywords or []) if keyword]
+        self.automaton = None
+        self.goto: list[dict[str, int]] = [{}]
+        self.fail: list[int] = [0]
+        self.output: list[bool] = [False]
+        if not self.keywords:
+            return
+        if ahocorasick:
+            self.automaton = ahocorasick.Automaton()
+            for keyword in self.keywords:
+                self.automaton.add_word(keyword, keyword)
+            self.automaton.make_automaton()
+        else:
+            self.build()
+
+    def __len__(self):
+        return len(self.keywords)
+
+    def __bool__(self):
+        return bool(self.keywords)
+
+    def build(self):
+        """
+        Build the trie and the failure links of the automaton
+        """
+        goto, fail, output = self.goto, self.fail, self.output
+        for keyword in self.keywords:
+            node = 0
+            for char in keyword:
+                next_node = goto[node].get(char)
+                if next_node is None:
+                    next_node = len(goto)
+                    goto[node][char] = next_node
+                    goto.append({})
+                    fail.append(0)
+                    output.append(False)
+                node = next_node
+            output[node] = True
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, next_node in goto[node].items():
+                queue.append(next_node)
+                state = fail[node]
+                while state and char not in goto[state]:
+                    state = fail[state]
+                fail[next_node] = goto[state].get(char, 0)
+                output[next_node] = output[next_node] or output[fail[next_node]]
+
+    def search(self, text: str) -> bool:
+        """
+        Check if any keyword is contained in the text
+        """
+        if not self.keywords:
+            return False
+        if self.automaton is not None:
+            return next(self.automaton.iter(text), None) is not None
+        goto, fail, output = self.goto, self.fail, self.output
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                return True
+        return False
+
+
+matcher_cache: dict[tuple[str, bool], tuple[float, KeywordMatcher]] = {}
+
+
+def get_keywords_matcher(path: str, pattern_search: bool = True) -> KeywordMatcher:
+    """
+    Get the keywords matcher of the file, only rebuild when the file has been modified
+    """
+    real_path = get_real_path(resource_path(path))
+    try:
+        mtime = os.path.getmtime(real_path)
+    except OSError:
+        mtime = None
+    key = (real_path, pattern_search)
+    cache = matcher_cache.get(key)
+    if cache and cache[0] == mtime:
+        return cache[1]
+    matcher = KeywordMatcher(get_urls_from_file(path, pattern_search=pattern_search) if mtime is not None else [])
+    matcher_cache[key] = (mtime, matcher)
+    return matcher
@@ -0,0 +1,216 @@
+import asyncio
+from collections import defaultdict
+from time import time
+
+import utils.constants as constants
+from utils.channel import (
+    aggregation_methods,
+    get_aggregation_inputs,
+    get_channel_results_by_name,
+    init_aggregation_inputs,
+    init_info_data,
+    aggregate_channel_old_data,
+    aggregate_channel_method,
+    get_channel_number,
+    print_aggregation_report,
+    sort_channel_values,
+    ip_checker
+)
+from utils.config import config
+from utils.result_log import ResultLog
+from utils.speed import get_speed, check_ffmpeg_installed_status
+from utils.types import CategoryChannelData
+
+
+class ChannelPipeline:
+    """
+    Pipelined aggregation, speed test and sort of the channels.
+    The history and local data are aggregated first, then each method result in the aggregation order as soon as it
+    and the previous ones are fetched, the new interfaces flow into the bounded speed test queue while the other
+    sources are still fetching, a channel is sorted once its aggregation is done and its tests are completed.
+    """
+
+    def __init__(self, items: CategoryChannelData, ipv6_support: bool = False, callback=None,
+                 enqueue_callback=None):
+        """
+        :param items: The channel items with the history and local data
+        :param ipv6_support: Whether the network supports IPv6
+        :param callback: Called when a test is completed
+        :param enqueue_callback: Called when an interface is added to the speed test queue
+        """
+        snapshot = config.snapshot
+        self.items = items
+        self.ipv6_support = ipv6_support
+        self.callback = callback
+        self.enqueue_callback = enqueue_callback
+        self.filter_host = snapshot.speed_test_filter_host
+        self.open_headers = snapshot.open_headers
+        self.ipv6_proxy = None if (not snapshot.open_ipv6 or ipv6_support) else constants.ipv6_proxy
+        self.filter_resolution = snapshot.open_filter_resolution and check_ffmpeg_installed_status()
+        self.workers = snapshot.speed_test_limit
+        self.methods = [method for method in aggregation_methods if snapshot.open_method[method]]
+        self.source_results = {}
+        self.source_event = asyncio.Event()
+        self.queue = asyncio.Queue(maxsize=constants.pipeline_queue_size)
+        self.data: CategoryChannelData = {}
+        self.stats = {}
+        self.pending = defaultdict(int)
+        self.seen = set()
+        self.aggregated = False
+        self.test_result: CategoryChannelData = {}
+        self.channel_result = defaultdict(lambda: defaultdict(list))
+        self.result_log = None
+        self.start_time = None
+        self.first_sorted_time = None
+        self.tested = 0
+
+    def set_source_result(self, method: str, result):
+        """
+        Set the fetched result of the method
+        """
+        if method in self.methods:
+            self.source_results[method] = result or {}
+            self.source_event.set()
+
+    def finish_sources(self):
+        """
+        Mark all the sources as fetched, the methods without result are aggregated as empty
+        """
+        for method in self.methods:
+            self.source_results.setdefault(method, {})
+        self.source_event.set()
+
+    def aggregate_step(self, method: str = None) -> list[tuple[str, str, list]]:
+        """
+        Aggregate the old data (or the method result) of all channels, return the new values of each channel
+        """
+        result = self.source_results.get(method)
+        new_values = []
+        for cate, channel_obj in self.items.items():
+            for name, old_info_list in channel_obj.items():
+                channel_list = self.data[cate][name]
+                start = len(channel_list)
+                if method:
+                    self.stats[cate, name][method.capitalize()] = aggregate_channel_method(
+                        self.data, cate, name, method, get_channel_results_by_name(name, result)
+                    )
+                else:
+                    self.stats[cate, name].update(aggregate_channel_old_data(self.data, cate, name, old_info_list))
+                if len(channel_list) > start:
+                    new_values.append((cate, name, channel_list[start:]))
+        return new_values
+
+    async def enqueue(self, new_values: list[tuple[str, str, list]]):
+        """
+        Put the new values to the speed test queue, skip the untested origins and the duplicates
+        """
+        for cate, name, values in new_values:
+            for value in values:
+                if value["origin"] in ["whitelist", "live", "hls"]:
+                    continue
+                if not self.ipv6_support and value["ipv_type"] == "ipv6":
+                    continue
+                part = value["host"] if self.filter_host else value["url"]
+                if part in self.seen:
+                    continue
+                self.seen.add(part)
+                self.pending[cate, name] += 1
+                await self.queue.put((cate, name, value))
+                if self.enqueue_callback:
+                    self.enqueue_callback()
+
+    async def aggregate(self):
+        """
+        Aggregate the old data and the method results in order, feed the speed test queue after each step
+        """
+        start_time = time()
+        init_aggregation_inputs(get_aggregation_inputs(self.data))
+        for cate, channel_obj in self.items.items():
+            for name in channel_obj:
+                init_info_data(self.data, cate, name)
+                self.stats[cate, name] = {}
+        await self.enqueue(await asyncio.to_thread(self.aggregate_step))
+        for method in self.methods:
+            while method not in self.source_results:
+                self.source_event.clear()
+                await self.source_event.wait()
+            await self.enqueue(await asyncio.to_thread(self.aggregate_step, method))
+            self.source_results[method] = None
+        ip_checker.save()
+        report = defaultdict(int)
+        no_result_names = []
+        for (cate, name), stats in self.stats.items():
+            stats.update(get_channel_number(self.data[cate][name]))
+            if not stats["Total"]:
+                no_result_names.append(name)
+            for key, value in stats.items():
+                report[key] += value
+        print_aggregation_report(report, len(self.stats), no_result_names, 1, time() - start_time)
+        self.aggregated = True
+        for cate, channel_obj in self.data.items():
+            for name in channel_obj:
+                if not self.pending[cate, name]:
+                    self.sort_channel(cate, name)
+
+    async def test_worker(self):
+        """
+        Test the interfaces from the queue, sort the channel after its last test
+        """
+        while True:
+            cate, name, value = await self.queue.get()
+            try:
+                headers = (self.open_headers and value.get("headers")) or None
+                result = await get_speed(
+                    value,
+                    headers=headers,
+                    ipv6_proxy=self.ipv6_proxy,
+                    filter_resolution=self.filter_resolution,
+                    callback=self.callback,
+                )
+                self.test_result.setdefault(cate, {}).setdefault(name, []).append({**value, **result})
+                self.tested += 1
+            finally:
+                self.pending[cate, name] -= 1
+                self.queue.task_done()
+                if self.aggregated and not self.pending[cate, name]:
+                    self.sort_channel(cate, name)
+
+    def sort_channel(self, cate: str, name: str):
+        """
+        Sort the channel with its test result
+        """
+        values = self.data[cate][name]
+        if not values:
+            return
+        sort_channel_values(
+            self.channel_result, cate, name, values, self.test_result.get(cate, {}).get(name, []), True,
+            filter_host=self.filter_host, ipv6_support=self.ipv6_support, result_log=self.result_log
+        )
+        if self.first_sorted_time is None:
+            self.first_sorted_time = time() - self.start_time
+
+    async def run(self) -> tuple[CategoryChannelData, CategoryChannelData, CategoryChannelData]:
+        """
+        Run the pipeline until all the sources are fetched and the channels are sorted,
+        return (channel data, test result, sorted channel result)
+        """
+        self.start_time = time()
+        self.result_log = ResultLog()
+        workers = [asyncio.create_task(self.test_worker()) for _ in range(self.workers)]
+        try:
+            await self.aggregate()
+            await self.queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            self.result_log.close()
+        channel_result = defaultdict(lambda: defaultdict(list))
+        for cate, channel_obj in self.data.items():
+            for name in channel_obj:
+                if name in self.channel_result.get(cate, {}):
+                    channel_result[cate][name] = self.channel_result[cate][name]
+        print(
+            f"Pipeline completed: {self.tested} urls tested, first channel sorted in "
+            f"{self.first_sorted_time or 0:.2f}s, total {time() - self.start_time:.2f}s"
+        )
+        return self.data, self.test_result, channel_result
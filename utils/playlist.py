@@ -0,0 +1,219 @@
+import re
+from typing import Iterable, Generator
+
+import utils.constants as constants
+from utils.tools import get_name_url_data
+
+extinf_prefix = "#EXTINF:-1"
+extinf_separator_pattern = re.compile(r"[\s+,，]")
+comma_pattern = re.compile(r"[,，]")
+scheme_pattern = re.compile(r"(https?|rtmp|rtsp)://")
+url_line_pattern = re.compile(constants.url_pattern.pattern, re.MULTILINE)
+
+
+class PlaylistParser:
+    """
+    Incremental line-oriented parser of M3U and TXT playlists, it gives the same records as the multiline patterns
+    used by get_name_url without running them over the whole content.
+    The playlist type is decided by the #EXTM3U mark, until it appears both types are parsed and the TXT records are
+    kept back. The headers are only taken from the M3U attributes and options.
+    """
+
+    def __init__(self, m3u: bool = None, open_headers: bool = False, check_url: bool = True):
+        self.m3u = m3u
+        self.open_headers = open_headers
+        self.check_url = check_url
+        self.tail = ""
+        self.closed = False
+        self.unterminated = False
+        self.txt_lines: list[str] = []
+        self.txt_pending: list[str] = []
+        self.txt_records: list[dict] = []
+        self.m3u_lines: list[str] = []
+        self.m3u_records: list[dict] = []
+
+    def feed(self, chunk: str) -> list[dict]:
+        """
+        Feed a chunk of text, return the records completed by it
+        """
+        lines = (self.tail + chunk).split("\n")
+        self.tail = lines.pop()
+        return self.process_lines(lines)
+
+    def close(self) -> list[dict]:
+        """
+        Finish the parsing, return the remaining records
+        """
+        lines = [self.tail] if self.tail else []
+        self.unterminated = bool(self.tail)
+        self.tail = ""
+        self.closed = True
+        records = self.process_lines(lines)
+        if self.m3u is None:
+            records.extend(self.txt_records)
+            self.txt_records = []
+        return records
+
+    def process_lines(self, lines: list[str]) -> list[dict]:
+        """
+        Process the complete lines, the last one is unterminated when the parser is closed
+        """
+        if self.m3u is None and any("#EXTM3U" in line for line in lines):
+            self.m3u = True
+            self.txt_lines = []
+            self.txt_pending = []
+            self.txt_records = []
+        if self.m3u is not False:
+            self.m3u_lines.extend(lines)
+            self.process_m3u()
+        if not self.m3u:
+            self.txt_lines.extend(lines)
+            self.process_txt()
+        if self.m3u:
+            records, self.m3u_records = self.m3u_records, []
+            return records
+        if self.m3u is False:
+            records, self.txt_records = self.txt_records, []
+            return records
+        return []
+
+    def append_record(self, records: list[dict], name: str, url: str, attributes: str = "", options: str = "",
+                      open_headers: bool = False):
+        """
+        Append the record if it is valid
+        """
+        data = get_name_url_data(name, url, attributes, options, open_headers=open_headers, check_url=self.check_url)
+        if data:
+            records.append(data)
+
+    def is_terminated(self, lines: list[str], index: int) -> bool:
+        """
+        Check if the line is followed by a newline
+        """
+        return not (self.closed and self.unterminated and index == len(lines) - 1)
+
+    def match_url(self, lines: list[str], index: int, offset: int = 0) -> tuple[str, int] | bool | None:
+        """
+        Match the url from the offset of the line, the user info part of the pattern can go across lines, so the
+        following lines are joined until it is decided.
+        Return (url, index of the last matched line) if matched, False if not matched, None if more lines are needed
+        """
+        text = lines[index][offset:]
+        need = 5 if scheme_pattern.match(text) else 2
+        count = sum(map(text.count, ":@/"))
+        end = index
+        while count < need:
+            if end + 1 >= len(lines):
+                if self.closed:
+                    break
+                return None
+            end += 1
+            count += sum(map(lines[end].count, ":@/"))
+        if end > index:
+            text = "\n".join([text, *lines[index + 1:end + 1]])
+        match = url_line_pattern.match(text)
+        if not match:
+            return False
+        return match.group("url"), index + match.group().count("\n")
+
+    def process_txt(self):
+        """
+        Process the buffered lines of TXT playlist, lines without comma are part of the next name as the multiline
+        pattern does
+        """
+        lines = self.txt_lines
+        index = 0
+        while index < len(lines):
+            line = lines[index]
+            comma = comma_pattern.search(line)
+            if not comma:
+                self.txt_pending.append(line)
+                index += 1
+                continue
+            name = "\n".join([*self.txt_pending, line[:comma.start()]])
+            result = False
+            if name and not line.startswith("#genre#", comma.end()):
+                result = self.match_url(lines, index, comma.end())
+                if result is None:
+                    break
+            self.txt_pending = []
+            if result:
+                url, index = result
+                self.append_record(self.txt_records, name, url)
+            index += 1
+        del lines[:index]
+
+    def process_m3u(self):
+        """
+        Process the buffered lines of M3U playlist from the first #EXTINF line
+        """
+        lines = self.m3u_lines
+        index = 0
+        while index < len(lines):
+            if not lines[index].startswith(extinf_prefix):
+                index += 1
+                continue
+            result = self.match_m3u(index)
+            if result is None:
+                break
+            index = result or index + 1
+        del lines[:index]
+
+    def match_m3u(self, start: int) -> int | None:
+        """
+        Match a record from the #EXTINF line, return the index of the next line to scan if matched,
+        0 if not matched, None if more lines are needed
+        """
+        lines = self.m3u_lines
+        line = lines[start]
+        prefix_len = len(extinf_prefix)
+        if len(line) > prefix_len:
+            if not extinf_separator_pattern.match(line, prefix_len):
+                return 0
+            attributes_parts = [line[prefix_len + 1:]]
+            comma = comma_pattern.search(attributes_parts[0])
+        elif self.is_terminated(lines, start):
+            attributes_parts = []
+            comma = None
+        else:
+            return 0
+        index = start
+        while not comma:
+            if not self.is_terminated(lines, index):
+                return 0
+            index += 1
+            if index >= len(lines):
+                return 0 if self.closed else None
+            attributes_parts.append(lines[index])
+            comma = comma_pattern.search(lines[index])
+        attributes = "\n".join([*attributes_parts[:-1], attributes_parts[-1][:comma.start()]])
+        if not attributes or not self.is_terminated(lines, index):
+            return 0
+        name = attributes_parts[-1][comma.end():]
+        options = []
+        while True:
+            index += 1
+            if index >= len(lines):
+                return 0 if self.closed else None
+            result = self.match_url(lines, index)
+            if result is None:
+                return None
+            if result:
+                url, index = result
+                self.append_record(self.m3u_records, name, url, attributes, "".join(options), self.open_headers)
+                return index + 1
+            if lines[index].startswith("#EXTVLCOPT:") and self.is_terminated(lines, index):
+                options.append(lines[index] + "\n")
+                continue
+            return 0
+
+
+def parse_playlist(chunks: Iterable[str], m3u: bool = None, open_headers: bool = False,
+                   check_url: bool = True) -> Generator[dict, None, None]:
+    """
+    Parse the playlist chunks, yield the name and url records as they are completed
+    """
+    parser = PlaylistParser(m3u=m3u, open_headers=open_headers, check_url=check_url)
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
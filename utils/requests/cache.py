@@ -0,0 +1,202 @@
+import asyncio
+import codecs
+import os
+import pickle
+import zlib
+from time import time
+
+from aiohttp import ClientSession, ClientTimeout
+
+import utils.constants as constants
+from utils.config import config
+from utils.db import get_db_connection, return_db_connection
+from utils.requests.tools import get_fetch_semaphore
+from utils.tools import resource_path
+
+cache_db_inited = False
+
+
+def get_cache_connection():
+    """
+    Get the response cache db connection, make sure the tables exist
+    """
+    global cache_db_inited
+    path = resource_path(constants.http_cache_path, persistent=True)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = get_db_connection(path)
+    if not cache_db_inited:
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS response (url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, "
+                "body BLOB, updated_at REAL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS parse_result (url TEXT, variant TEXT, result BLOB, "
+                "PRIMARY KEY (url, variant))"
+            )
+        cache_db_inited = True
+    return path, conn
+
+
+def get_plain_object(obj):
+    """
+    Convert the nested dict subclasses (such as defaultdict with lambda factory) to picklable dict
+    """
+    if isinstance(obj, dict):
+        return {key: get_plain_object(value) for key, value in obj.items()}
+    if isinstance(obj, tuple):
+        return tuple(get_plain_object(value) for value in obj)
+    return obj
+
+
+def get_cached_response(url: str) -> tuple[str | None, str | None, bytes | None]:
+    """
+    Get the cached validators and compressed body of the url
+    """
+    path, conn = get_cache_connection()
+    try:
+        row = conn.execute("SELECT etag, last_modified, body FROM response WHERE url = ?", (url,)).fetchone()
+    finally:
+        return_db_connection(path, conn)
+    return row or (None, None, None)
+
+
+def get_cached_parse_result(url: str, variant: str):
+    """
+    Get the cached parse result of the url, None if not found
+    """
+    path, conn = get_cache_connection()
+    try:
+        row = conn.execute(
+            "SELECT result FROM parse_result WHERE url = ? AND variant = ?", (url, variant)
+        ).fetchone()
+    finally:
+        return_db_connection(path, conn)
+    if row:
+        try:
+            return pickle.loads(zlib.decompress(row[0]))
+        except Exception:
+            pass
+    return None
+
+
+def set_cached_response(url: str, etag: str | None, last_modified: str | None, body: bytes):
+    """
+    Save the validators and compressed body of the url, drop the outdated parse results
+    """
+    path, conn = get_cache_connection()
+    try:
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO response (url, etag, last_modified, body, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (url, etag, last_modified, body, time())
+            )
+            conn.execute("DELETE FROM parse_result WHERE url = ?", (url,))
+    finally:
+        return_db_connection(path, conn)
+
+
+def set_cached_parse_result(url: str, variant: str, result):
+    """
+    Save the parse result of the url
+    """
+    try:
+        data = zlib.compress(pickle.dumps(get_plain_object(result), protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception as e:
+        print(f"Error on caching parse result of {url}: {e}")
+        return
+    path, conn = get_cache_connection()
+    try:
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO parse_result (url, variant, result) VALUES (?, ?, ?)", (url, variant, data)
+            )
+    finally:
+        return_db_connection(path, conn)
+
+
+def feed_parser(parser, body: bytes) -> list:
+    """
+    Feed the whole body (decoded unless the parser is binary) to the incremental parser, return the records
+    """
+    data = body if getattr(parser, "binary", False) else body.decode("utf-8", errors="replace")
+    return [*parser.feed(data), *parser.close()]
+
+
+async def fetch_cached(session: ClientSession, url: str, parse=None, variant: str = "", timeout: int = None,
+                       chunk_size: int = 65536, parser=None, compressed: bool = False):
+    """
+    Fetch the url with conditional request, return the parse result of the text (or the text if no parse),
+    on 304 the cached parse result is reused without parsing, return None if the response is not successful
+    :param session: The client session
+    :param url: The url to fetch
+    :param parse: The function to parse the text (or the records if parser is given), run in a thread
+    :param variant: The key of the parse result, the result depends on it besides the body
+    :param timeout: The connect and read timeout
+    :param chunk_size: The size of each streaming read
+    :param parser: The factory of the incremental parser (with feed and close returning records), the chunks are
+                   parsed as they arrive instead of joining the text
+    :param compressed: Give the zlib compressed body bytes instead of the text, so that it is cheap to hold and to
+                       send to another process
+    """
+    timeout = timeout or config.request_timeout
+    etag, last_modified, cached_body = get_cached_response(url)
+    request_headers = {}
+    if cached_body is not None:
+        if etag:
+            request_headers["If-None-Match"] = etag
+        if last_modified:
+            request_headers["If-Modified-Since"] = last_modified
+    async with get_fetch_semaphore():
+        async with session.get(url, headers=request_headers,
+                               timeout=ClientTimeout(sock_connect=timeout, sock_read=timeout)) as response:
+            if response.status == 304 and cached_body is not None:
+                if parse:
+                    result = get_cached_parse_result(url, variant)
+                    if result is not None:
+                        return result
+                if compressed:
+                    text = cached_body
+                elif parser:
+                    text = None
+                else:
+                    text = zlib.decompress(cached_body).decode("utf-8", errors="replace")
+                body = None
+            elif response.status >= 400:
+                return None
+            else:
+                decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+                compressor = zlib.compressobj()
+                stream_parser = parser() if parser else None
+                chunks = []
+                body_chunks = []
+                async for chunk in response.content.iter_chunked(chunk_size):
+                    if not compressed:
+                        chunk_text = decoder.decode(chunk)
+                        chunks.extend(stream_parser.feed(chunk_text) if stream_parser else (chunk_text,))
+                    body_chunks.append(compressor.compress(chunk))
+                body_chunks.append(compressor.flush())
+                body = b"".join(body_chunks)
+                if compressed:
+                    text = body
+                else:
+                    chunk_text = decoder.decode(b"", final=True)
+                    if stream_parser:
+                        chunks.extend(stream_parser.feed(chunk_text))
+                        chunks.extend(stream_parser.close())
+                        text = chunks
+                    else:
+                        chunks.append(chunk_text)
+                        text = "".join(chunks)
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+    if body is None and parser and not compressed:
+        text = await asyncio.to_thread(feed_parser, parser(), zlib.decompress(cached_body))
+    elif body is not None and (etag or last_modified):
+        set_cached_response(url, etag, last_modified, body)
+    if not parse:
+        return text
+    result = await asyncio.to_thread(parse, text)
+    if etag or last_modified:
+        set_cached_parse_result(url, variant, result)
+    return result
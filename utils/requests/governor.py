@@ -0,0 +1,183 @@
+import threading
+from time import monotonic, sleep
+from urllib.parse import urlparse
+
+import utils.constants as constants
+from utils.config import config
+
+
+class CircuitOpenError(Exception):
+    """
+    The domain is blocked, the request is not sent
+    """
+
+
+class FetchCancelledError(Exception):
+    """
+    The source fetch is cancelled, such as on the source timeout, the request is not sent
+    """
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket, rate tokens per second with the burst capacity
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1)
+        self.tokens = self.capacity
+        self.updated_at = monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Take a token, wait until it is available
+        """
+        while True:
+            with self.lock:
+                now = monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker of a domain, it opens on block, half-opens after the cooldown to let one probe request through,
+    closes when the probe succeeds and opens again when it is blocked, another probe is let through if the previous
+    one gives no result within the cooldown
+    """
+
+    def __init__(self, cooldown: float):
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.opened_at = 0
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """
+        Check if a request is allowed, move to half-open after the cooldown
+        """
+        with self.lock:
+            if self.state == "closed":
+                return True
+            now = monotonic()
+            if now - self.opened_at >= self.cooldown:
+                self.state = "half-open"
+                self.opened_at = now
+                return True
+            return False
+
+    def is_open(self) -> bool:
+        """
+        Check if the requests are rejected
+        """
+        with self.lock:
+            return self.state != "closed" and monotonic() - self.opened_at < self.cooldown
+
+    def record(self, blocked: bool) -> bool:
+        """
+        Record the result of a request, return True if the circuit is opened by it
+        """
+        with self.lock:
+            if blocked:
+                opened = self.state != "open"
+                self.state = "open"
+                self.opened_at = monotonic()
+                return opened
+            if self.state == "half-open":
+                self.state = "closed"
+            return False
+
+
+buckets: dict[str, TokenBucket] = {}
+breakers: dict[str, CircuitBreaker] = {}
+governor_lock = threading.Lock()
+fetch_state = threading.local()
+
+
+def get_domain(url: str) -> str:
+    """
+    Get the domain of the url
+    """
+    return urlparse(url).netloc.lower()
+
+
+def get_governor(url: str) -> tuple[TokenBucket | None, CircuitBreaker]:
+    """
+    Get the token bucket (None if not limited) and circuit breaker of the url domain
+    """
+    domain = get_domain(url)
+    with governor_lock:
+        if domain not in breakers:
+            rate = config.request_domain_rate
+            buckets[domain] = TokenBucket(rate) if rate > 0 else None
+            breakers[domain] = CircuitBreaker(config.request_breaker_cooldown)
+        return buckets[domain], breakers[domain]
+
+
+def set_fetch_cancel_event(event: threading.Event | None):
+    """
+    Set the cancel event of the source fetch running in the current thread
+    """
+    fetch_state.cancel_event = event
+
+
+def is_fetch_cancelled() -> bool:
+    """
+    Check if the source fetch running in the current thread is cancelled
+    """
+    event = getattr(fetch_state, "cancel_event", None)
+    return event is not None and event.is_set()
+
+
+def acquire(url: str):
+    """
+    Wait for the rate limit of the url domain, raise CircuitOpenError if the domain is blocked and
+    FetchCancelledError if the source fetch is cancelled
+    """
+    if is_fetch_cancelled():
+        raise FetchCancelledError(f"Fetch is cancelled: {url}")
+    bucket, breaker = get_governor(url)
+    if not breaker.allow():
+        raise CircuitOpenError(f"Circuit is open for {get_domain(url)}")
+    if bucket:
+        bucket.acquire()
+
+
+def is_circuit_open(url: str) -> bool:
+    """
+    Check if the url domain is blocked
+    """
+    return get_governor(url)[1].is_open()
+
+
+def is_blocked(status_code: int = None, text: str = "") -> bool:
+    """
+    Check if the response is a rate limit or block page
+    """
+    return status_code == 429 or any(keyword in text for keyword in constants.block_page_keywords)
+
+
+def report(url: str, blocked: bool):
+    """
+    Report the result of the request to the url domain breaker
+    """
+    breaker = get_governor(url)[1]
+    if breaker.record(blocked):
+        print(f"{get_domain(url)}: Blocked, circuit opened for {breaker.cooldown}s")
+
+
+def check_page_blocked(url: str, source: str, status_code: int = None):
+    """
+    Report the page result, raise CircuitOpenError if it is blocked
+    """
+    blocked = is_blocked(status_code, source)
+    report(url, blocked)
+    if blocked:
+        raise CircuitOpenError(f"Blocked by {get_domain(url)}")
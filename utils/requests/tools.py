@@ -1,8 +1,16 @@
+import asyncio
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
+from aiohttp import ClientSession, TCPConnector
 from bs4 import BeautifulSoup
 
+from utils.config import config
+from utils.requests.governor import acquire, check_page_blocked, set_fetch_cancel_event
+from utils.result_page import ResultPage, parse_result_page
+
 headers = {
     "Accept": "*/*",
     "Connection": "keep-alive",
@@ -12,18 +20,24 @@ headers = {
 
 session = requests.Session()
 
+fetch_executor = None
+fetch_semaphore = None
+fetch_semaphore_loop = None
+
 
 def get_source_requests(url, data=None, proxy=None, timeout=30):
     """
     Get the source by requests
     """
     proxies = {"http": proxy}
+    acquire(url)
     if data:
         response = session.post(
             url, headers=headers, data=data, proxies=proxies, timeout=timeout
         )
     else:
         response = session.get(url, headers=headers, proxies=proxies, timeout=timeout)
+    check_page_blocked(url, response.text, response.status_code)
     source = re.sub(
         r"<!--.*?-->",
         "",
@@ -42,8 +56,90 @@ def get_soup_requests(url, data=None, proxy=None, timeout=30):
     return soup
 
 
+def get_page_requests(url, data=None, proxy=None, timeout=30) -> ResultPage:
+    """
+    Get the extracted result page by requests, the comments are skipped by the parser
+    """
+    proxies = {"http": proxy}
+    acquire(url)
+    if data:
+        response = session.post(
+            url, headers=headers, data=data, proxies=proxies, timeout=timeout
+        )
+    else:
+        response = session.get(url, headers=headers, proxies=proxies, timeout=timeout)
+    check_page_blocked(url, response.text, response.status_code)
+    return parse_result_page(response.text)
+
+
 def close_session():
     """
     Close the requests session
     """
     session.close()
+
+
+def get_client_session(limit: int = None, limit_per_host: int = None) -> ClientSession:
+    """
+    Get the pooled async client session
+    """
+    connector = TCPConnector(
+        limit=limit or config.request_limit,
+        limit_per_host=limit_per_host or config.request_host_limit,
+        ssl=False
+    )
+    return ClientSession(connector=connector, headers=headers, trust_env=True)
+
+
+def get_fetch_executor() -> ThreadPoolExecutor:
+    """
+    Get the shared thread pool of the blocking source fetchers
+    """
+    global fetch_executor
+    if fetch_executor is None:
+        fetch_executor = ThreadPoolExecutor(max_workers=config.request_limit, thread_name_prefix="fetch")
+    return fetch_executor
+
+
+def get_fetch_semaphore() -> asyncio.Semaphore:
+    """
+    Get the global outbound concurrency budget of the running loop, shared by all the sources
+    """
+    global fetch_semaphore, fetch_semaphore_loop
+    loop = asyncio.get_running_loop()
+    if fetch_semaphore is None or fetch_semaphore_loop is not loop:
+        fetch_semaphore = asyncio.Semaphore(config.request_limit)
+        fetch_semaphore_loop = loop
+    return fetch_semaphore
+
+
+async def gather_in_fetch_pool(func, args_list: list, max_workers: int = None) -> list:
+    """
+    Run the blocking function with each args in the shared thread pool without blocking the loop, every call takes
+    a slot of the global budget, at most max_workers of them run at the same time.
+    If the gathering is cancelled (such as on the source timeout), the running calls are cancelled through the
+    governor: their next requests raise FetchCancelledError and their loops check is_fetch_cancelled.
+    Return the results (or the exceptions) in order
+    """
+    loop = asyncio.get_running_loop()
+    executor = get_fetch_executor()
+    budget = get_fetch_semaphore()
+    local_limit = asyncio.Semaphore(max_workers or config.request_limit)
+    cancel_event = threading.Event()
+
+    def call(args):
+        set_fetch_cancel_event(cancel_event)
+        try:
+            return func(*args)
+        finally:
+            set_fetch_cancel_event(None)
+
+    async def run(args):
+        async with local_limit, budget:
+            return await loop.run_in_executor(executor, call, args)
+
+    try:
+        return await asyncio.gather(*(run(args) for args in args_list), return_exceptions=True)
+    except asyncio.CancelledError:
+        cancel_event.set()
+        raise
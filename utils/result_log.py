@@ -0,0 +1,171 @@
+import json
+import os
+from bisect import bisect_right
+from time import time
+
+import utils.constants as constants
+
+result_log_fields = ("url", "origin", "ipv_type", "location", "isp", "date", "delay", "speed", "resolution")
+
+
+class ResultLog:
+    """
+    Buffered JSONL journal of the speed test results, the lines of a channel are written in bulk after it is sorted,
+    with the summary index of the channels (line and byte offset of their lines) written on close
+    """
+
+    def __init__(self, path: str = constants.result_log_path, summary_path: str = constants.result_log_summary_path,
+                 backup_count: int = constants.result_log_backup_count,
+                 buffer_size: int = constants.result_log_buffer_size):
+        """
+        :param path: The journal path, the journals of the previous runs are rotated to path.1, path.2...
+        :param summary_path: The summary index path
+        :param backup_count: The number of the previous journals to keep
+        :param buffer_size: Flush the buffered lines when they reach the size in bytes
+        """
+        self.path = path
+        self.summary_path = summary_path
+        self.buffer_size = buffer_size
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            if os.path.exists(summary_path):
+                os.remove(summary_path)
+            rotate_file(path, backup_count)
+        except OSError:
+            pass
+        self.file = open(path, "wb")
+        self.buffer = []
+        self.buffered = 0
+        self.offset = 0
+        self.lines = 0
+        self.channels = []
+        self.start_time = time()
+
+    def write_channel(self, cate: str, name: str, items: list):
+        """
+        Add the sorted results of the channel
+        """
+        if not items or self.file is None:
+            return
+        data = "".join(
+            json.dumps({"cate": cate, "name": name, **{field: item.get(field) for field in result_log_fields}},
+                       ensure_ascii=False, default=str) + "\n"
+            for item in items
+        ).encode("utf-8")
+        speeds = [item["speed"] for item in items if item.get("speed")]
+        delays = [item["delay"] for item in items if item.get("delay") and item["delay"] > 0]
+        self.channels.append({
+            "cate": cate,
+            "name": name,
+            "count": len(items),
+            "line": self.lines,
+            "offset": self.offset,
+            "length": len(data),
+            "max_speed": max(speeds) if speeds else None,
+            "min_delay": min(delays) if delays else None,
+        })
+        self.buffer.append(data)
+        self.buffered += len(data)
+        self.offset += len(data)
+        self.lines += len(items)
+        if self.buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the buffered lines
+        """
+        if self.buffer:
+            self.file.write(b"".join(self.buffer))
+            self.buffer = []
+            self.buffered = 0
+
+    def close(self):
+        """
+        Write the remaining lines and the summary index
+        """
+        if self.file is None:
+            return
+        self.flush()
+        self.file.close()
+        self.file = None
+        summary = {
+            "start_time": self.start_time,
+            "end_time": time(),
+            "total": self.lines,
+            "channels": self.channels,
+        }
+        with open(f"{self.summary_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(f"{self.summary_path}.tmp", self.summary_path)
+
+
+def rotate_file(path: str, backup_count: int):
+    """
+    Rotate the file to path.1, the existing backups are shifted and the oldest one is removed
+    """
+    if not os.path.exists(path):
+        return
+    if backup_count <= 0:
+        os.remove(path)
+        return
+    for i in range(backup_count - 1, 0, -1):
+        source = f"{path}.{i}"
+        if os.path.exists(source):
+            os.replace(source, f"{path}.{i + 1}")
+    os.replace(path, f"{path}.1")
+
+
+def get_result_log_summary(path: str = constants.result_log_summary_path) -> dict | None:
+    """
+    Get the summary index of the result log, None if it is not written
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def read_result_log(path: str = constants.result_log_path, offset: int = 0, limit: int = None,
+                    chunk_size: int = 65536, summary_path: str = constants.result_log_summary_path):
+    """
+    Read the lines of the result log in chunks, from the line offset, at most limit lines if given,
+    the summary index is used to seek to the channel of the offset line
+    """
+    with open(path, "rb") as f:
+        if limit is None and not offset:
+            while chunk := f.read(chunk_size):
+                yield chunk
+            return
+        index = 0
+        summary = get_result_log_summary(summary_path)
+        if offset and summary and summary["channels"]:
+            channels = summary["channels"]
+            position = bisect_right([channel["line"] for channel in channels], offset) - 1
+            if position >= 0:
+                f.seek(channels[position]["offset"])
+                index = channels[position]["line"]
+        lines = []
+        size = 0
+        for line in f:
+            if index >= offset:
+                if limit is not None and index >= offset + limit:
+                    break
+                lines.append(line)
+                size += len(line)
+                if size >= chunk_size:
+                    yield b"".join(lines)
+                    lines, size = [], 0
+            index += 1
+        if lines:
+            yield b"".join(lines)
+
+
+def read_result_log_range(start: int, length: int, path: str = constants.result_log_path) -> bytes:
+    """
+    Read the bytes of the result log range, such as the lines of a channel from the summary index
+    """
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read(length)
@@ -0,0 +1,170 @@
+from html import unescape
+from html.parser import HTMLParser
+
+from bs4.dammit import EntitySubstitution
+
+void_elements = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "keygen", "link", "menuitem", "meta", "param",
+    "source", "track", "wbr", "basefont", "bgsound", "command", "frame", "image", "isindex", "nextid", "spacer",
+}
+
+ignored_string_elements = {"script", "style", "template", "rt", "rp"}
+
+preserve_whitespace_elements = {"pre", "textarea"}
+
+ascii_spaces = str.maketrans("", "", "\x20\x0a\x09\x0c\x0d")
+
+
+class ResultPage:
+    """
+    The extracted search result page, with the div classes and texts, the link hrefs and the page text
+    """
+
+    def __init__(self, divs: list, hrefs: list[str], text: str):
+        self.divs = divs
+        self.hrefs = hrefs
+        self.text = text
+
+    def get_rows(self, class_name: str) -> list[tuple[str | None, list[str]]]:
+        """
+        Get the (channel name, descendant div texts) of the div rows with the class
+        """
+        rows = []
+        for index, (classes, _, end) in enumerate(self.divs):
+            if class_name not in classes:
+                continue
+            children = self.divs[index + 1:end]
+            channel_name = next(("".join(parts) for child_classes, parts, _ in children if "channel" in child_classes),
+                                None)
+            rows.append((channel_name, [text for text in ("".join(parts) for _, parts, _ in children) if text]))
+        return rows
+
+
+class ResultPageParser(HTMLParser):
+    """
+    Targeted parser of the search result pages, it keeps only the div texts, link hrefs and page text instead of
+    building the whole tree, the texts are the same as the stripped texts of the html.parser soup
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.stack: list[tuple[str, int | None]] = []
+        self.divs = []
+        self.hrefs = []
+        self.text_parts = []
+        self.data = []
+        self.ignored = 0
+        self.preserved = 0
+        self.closed_void_elements = []
+
+    def flush(self, cdata: str = None):
+        """
+        Append the pending string (or the CDATA string) to the page text and the open divs
+        """
+        if cdata is None:
+            if not self.data:
+                return
+            string = "".join(self.data)
+            self.data = []
+            if self.ignored:
+                return
+            if not self.preserved and not string.translate(ascii_spaces):
+                string = "\n" if "\n" in string else " "
+        else:
+            string = cdata
+        self.text_parts.append(string)
+        string = string.strip()
+        if string:
+            for _, index in self.stack:
+                if index is not None:
+                    self.divs[index][1].append(string)
+
+    def handle_starttag(self, tag, attrs, handle_void_element=True):
+        self.flush()
+        attrs = {key: value or "" for key, value in attrs}
+        if tag == "a" and "href" in attrs:
+            self.hrefs.append(attrs["href"])
+        index = None
+        if tag == "div":
+            index = len(self.divs)
+            self.divs.append([attrs.get("class", "").split(), [], None])
+        if tag in ignored_string_elements:
+            self.ignored += 1
+        if tag in preserve_whitespace_elements:
+            self.preserved += 1
+        self.stack.append((tag, index))
+        if tag in void_elements and handle_void_element:
+            self.handle_endtag(tag, check_closed=False)
+            self.closed_void_elements.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs, handle_void_element=False)
+        self.handle_endtag(tag, check_closed=False)
+
+    def handle_endtag(self, tag, check_closed=True):
+        if check_closed and tag in self.closed_void_elements:
+            self.closed_void_elements.remove(tag)
+            return
+        self.flush()
+        for i in range(len(self.stack) - 1, -1, -1):
+            if self.stack[i][0] == tag:
+                self.pop(i)
+                break
+
+    def pop(self, position: int):
+        """
+        Close the open tags from the position
+        """
+        for tag, index in self.stack[position:]:
+            if index is not None:
+                self.divs[index][2] = len(self.divs)
+            if tag in ignored_string_elements:
+                self.ignored -= 1
+            if tag in preserve_whitespace_elements:
+                self.preserved -= 1
+        del self.stack[position:]
+
+    def handle_data(self, data):
+        self.data.append(data)
+
+    def handle_charref(self, name):
+        self.data.append(unescape(f"&#{name};"))
+
+    def handle_entityref(self, name):
+        self.data.append(EntitySubstitution.HTML_ENTITY_TO_CHARACTER.get(name, f"&{name}"))
+
+    def handle_comment(self, data):
+        # The comments are dropped as if stripped from the source, the strings around them are joined
+        pass
+
+    def handle_decl(self, decl):
+        self.flush()
+
+    def handle_pi(self, data):
+        self.flush()
+
+    def unknown_decl(self, data):
+        self.flush()
+        if data.upper().startswith("CDATA["):
+            self.flush(data[len("CDATA["):])
+
+    def close(self):
+        super().close()
+        self.flush()
+        self.pop(0)
+
+    def get_page(self) -> ResultPage:
+        """
+        Get the extracted page
+        """
+        return ResultPage(self.divs, self.hrefs, "".join(self.text_parts))
+
+
+def parse_result_page(source: str) -> ResultPage:
+    """
+    Extract the result page from the html source
+    """
+    parser = ResultPageParser()
+    parser.feed(source or "")
+    parser.close()
+    return parser.get_page()
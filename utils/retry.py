@@ -1,5 +1,8 @@
+import asyncio
 from time import sleep
+
 from utils.config import config
+from utils.requests.governor import CircuitOpenError, FetchCancelledError
 
 if config.open_driver:
     try:
@@ -11,22 +14,38 @@ if config.open_driver:
 
 max_retries = 2
 
+retry_backoff = 1
+
 
-def retry_func(func, retries=max_retries, name=""):
+def retry_func(func, retries=max_retries, name="", backoff=retry_backoff):
     """
-    Retry the function
+    Retry the function, wait with exponential backoff between attempts
     """
     for i in range(retries):
         try:
-            sleep(1)
             return func()
+        except (CircuitOpenError, FetchCancelledError):
+            raise
+        except Exception as e:
+            if i < retries - 1:
+                if name:
+                    print(f"Failed to connect to the {name}. Retrying {i+1}...")
+                sleep(backoff * 2 ** i)
+    raise Exception(f"Failed to connect to the {name} reached the maximum retries.")
+
+
+async def retry_async_func(func, retries=max_retries, name="", backoff=retry_backoff):
+    """
+    Retry the async function, wait with exponential backoff between attempts
+    """
+    for i in range(retries):
+        try:
+            return await func()
         except Exception as e:
-            if name and i < retries - 1:
-                print(f"Failed to connect to the {name}. Retrying {i+1}...")
-            elif i == retries - 1:
-                raise Exception(
-                    f"Failed to connect to the {name} reached the maximum retries."
-                )
+            if i < retries - 1:
+                if name:
+                    print(f"Failed to connect to the {name}. Retrying {i+1}...")
+                await asyncio.sleep(backoff * 2 ** i)
     raise Exception(f"Failed to connect to the {name} reached the maximum retries.")
 
 
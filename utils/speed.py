@@ -17,14 +17,6 @@ from utils.types import TestResult, ChannelTestResult, TestResultCacheData
 
 http.cookies._is_legal_key = lambda _: True
 cache: TestResultCacheData = {}
-speed_test_timeout = config.speed_test_timeout
-speed_test_filter_host = config.speed_test_filter_host
-open_filter_resolution = config.open_filter_resolution
-min_resolution_value = config.min_resolution_value
-max_resolution_value = config.max_resolution_value
-open_supply = config.open_supply
-open_filter_speed = config.open_filter_speed
-min_speed_value = config.min_speed
 m3u8_headers = ['application/x-mpegurl', 'application/vnd.apple.mpegurl', 'audio/mpegurl', 'audio/x-mpegurl']
 default_ipv6_delay = 0.1
 default_ipv6_resolution = "1920x1080"
@@ -36,11 +28,13 @@ default_ipv6_result = {
 
 
 async def get_speed_with_download(url: str, headers: dict = None, session: ClientSession = None,
-                                  timeout: int = speed_test_timeout) -> dict[
+                                  timeout: int = None) -> dict[
     str, float | None]:
     """
     Get the speed of the url with a total timeout
     """
+    if timeout is None:
+        timeout = config.snapshot.speed_test_timeout
     start_time = time()
     delay = -1
     total_size = 0
@@ -95,10 +89,12 @@ async def get_headers(url: str, headers: dict = None, session: ClientSession = N
 
 
 async def get_url_content(url: str, headers: dict = None, session: ClientSession = None,
-                          timeout: int = speed_test_timeout) -> str:
+                          timeout: int = None) -> str:
     """
     Get the content of the url
     """
+    if timeout is None:
+        timeout = config.snapshot.speed_test_timeout
     if session is None:
         session = ClientSession(connector=TCPConnector(ssl=False), trust_env=True)
         created_session = True
@@ -130,11 +126,16 @@ def check_m3u8_valid(headers: CIMultiDictProxy[str] | dict[any, any]) -> bool:
 
 
 async def get_result(url: str, headers: dict = None, resolution: str = None,
-                     filter_resolution: bool = config.open_filter_resolution,
-                     timeout: int = speed_test_timeout) -> dict[str, float | None]:
+                     filter_resolution: bool = None,
+                     timeout: int = None) -> dict[str, float | None]:
     """
     Get the test result of the url
     """
+    snapshot = config.snapshot
+    if filter_resolution is None:
+        filter_resolution = snapshot.open_filter_resolution
+    if timeout is None:
+        timeout = snapshot.speed_test_timeout
     info = {'speed': 0, 'delay': -1, 'resolution': resolution}
     location = None
     try:
@@ -180,10 +181,12 @@ async def get_result(url: str, headers: dict = None, resolution: str = None,
         return info
 
 
-async def get_delay_requests(url, timeout=speed_test_timeout, proxy=None):
+async def get_delay_requests(url, timeout=None, proxy=None):
     """
     Get the delay of the url by requests
     """
+    if timeout is None:
+        timeout = config.snapshot.speed_test_timeout
     async with ClientSession(
             connector=TCPConnector(ssl=False), trust_env=True
     ) as session:
@@ -221,10 +224,12 @@ def check_ffmpeg_installed_status():
         return status
 
 
-async def ffmpeg_url(url, timeout=speed_test_timeout):
+async def ffmpeg_url(url, timeout=None):
     """
     Get url info by ffmpeg
     """
+    if timeout is None:
+        timeout = config.snapshot.speed_test_timeout
     args = ["ffmpeg", "-t", str(timeout), "-stats", "-i", url, "-f", "null", "-"]
     proc = None
     res = None
@@ -252,10 +257,12 @@ async def ffmpeg_url(url, timeout=speed_test_timeout):
         return res
 
 
-async def get_resolution_ffprobe(url: str, headers: dict = None, timeout: int = speed_test_timeout) -> str | None:
+async def get_resolution_ffprobe(url: str, headers: dict = None, timeout: int = None) -> str | None:
     """
     Get the resolution of the url by ffprobe
     """
+    if timeout is None:
+        timeout = config.snapshot.speed_test_timeout
     resolution = None
     proc = None
     try:
@@ -337,16 +344,21 @@ def get_speed_result(key: str) -> TestResult:
         return {'speed': 0, 'delay': -1, 'resolution': 0}
 
 
-async def get_speed(data, headers=None, ipv6_proxy=None, filter_resolution=open_filter_resolution,
-                    timeout=speed_test_timeout, callback=None) -> TestResult:
+async def get_speed(data, headers=None, ipv6_proxy=None, filter_resolution=None, timeout=None,
+                    callback=None) -> TestResult:
     """
     Get the speed (response time and resolution) of the url
     """
+    snapshot = config.snapshot
+    if filter_resolution is None:
+        filter_resolution = snapshot.open_filter_resolution
+    if timeout is None:
+        timeout = snapshot.speed_test_timeout
     url = data['url']
     resolution = data['resolution']
     result: TestResult = {'speed': 0, 'delay': -1, 'resolution': resolution}
     try:
-        cache_key = data['host'] if speed_test_filter_host else url
+        cache_key = data['host'] if snapshot.speed_test_filter_host else url
         if cache_key and cache_key in cache:
             result = get_avg_result(cache[cache_key])
         else:
@@ -371,17 +383,24 @@ async def get_speed(data, headers=None, ipv6_proxy=None, filter_resolution=open_
 
 def get_sort_result(
         results,
-        supply=open_supply,
-        filter_speed=open_filter_speed,
-        min_speed=min_speed_value,
-        filter_resolution=open_filter_resolution,
-        min_resolution=min_resolution_value,
-        max_resolution=max_resolution_value,
+        supply=None,
+        filter_speed=None,
+        min_speed=None,
+        filter_resolution=None,
+        min_resolution=None,
+        max_resolution=None,
         ipv6_support=True
 ) -> list[ChannelTestResult]:
     """
     get the sort result
     """
+    snapshot = config.snapshot
+    supply = snapshot.open_supply if supply is None else supply
+    filter_speed = snapshot.open_filter_speed if filter_speed is None else filter_speed
+    min_speed = snapshot.min_speed if min_speed is None else min_speed
+    filter_resolution = snapshot.open_filter_resolution if filter_resolution is None else filter_resolution
+    min_resolution = snapshot.min_resolution_value if min_resolution is None else min_resolution
+    max_resolution = snapshot.max_resolution_value if max_resolution is None else max_resolution
     total_result = []
     for result in results:
         if not ipv6_support and result["ipv_type"] == "ipv6":
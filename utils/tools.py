@@ -1,11 +1,15 @@
 import datetime
+import hashlib
 import json
 import logging
+import mimetypes
+import multiprocessing
 import os
 import re
 import shutil
 import sys
 from collections import defaultdict
+from functools import lru_cache
 from logging.handlers import RotatingFileHandler
 from time import time
 from urllib.parse import urlparse, urlunparse
@@ -13,10 +17,11 @@ from urllib.parse import urlparse, urlunparse
 import pytz
 import requests
 from bs4 import BeautifulSoup
-from flask import send_file, make_response
+from flask import make_response, request
 from opencc import OpenCC
 
 import utils.constants as constants
+from utils.artifact import get_artifact_meta
 from utils.config import config, resource_path
 from utils.types import ChannelData
 
@@ -38,6 +43,15 @@ def get_logger(path, level=logging.ERROR, init=False):
     return logger
 
 
+def get_process_context():
+    """
+    Get the multiprocessing context of the worker pools, the pools are started while other threads are running so
+    the workers are not forked from the current process: forkserver, or spawn where it is not available
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
 def format_interval(t):
     """
     Formats a number of seconds as a clock time, [H:]MM:SS
@@ -95,7 +109,8 @@ def filter_by_date(data):
     Filter by date and limit
     """
     default_recent_days = 30
-    use_recent_days = config.recent_days
+    snapshot = config.snapshot
+    use_recent_days = snapshot.recent_days
     if not isinstance(use_recent_days, int) or use_recent_days <= 0:
         use_recent_days = default_recent_days
     start_date = datetime.datetime.now() - datetime.timedelta(days=use_recent_days)
@@ -115,8 +130,8 @@ def filter_by_date(data):
     recent_data_len = len(recent_data)
     if recent_data_len == 0:
         recent_data = unrecent_data
-    elif recent_data_len < config.urls_limit:
-        recent_data.extend(unrecent_data[: config.urls_limit - len(recent_data)])
+    elif recent_data_len < snapshot.urls_limit:
+        recent_data.extend(unrecent_data[: snapshot.urls_limit - len(recent_data)])
     return recent_data
 
 
@@ -154,6 +169,14 @@ def get_total_urls(info_list: list[ChannelData], ipv_type_prefer, origin_type_pr
     """
     Get the total urls from info list
     """
+    return get_total_urls_variants(info_list, ipv_type_prefer, origin_type_prefer, [rtmp_type])[0]
+
+
+def get_total_urls_variants(info_list: list[ChannelData], ipv_type_prefer, origin_type_prefer,
+                            rtmp_types: list) -> list[list]:
+    """
+    Get the total urls of each rtmp type from info list, the preferred urls are selected once for all the rtmp types
+    """
     ipv_prefer_bool = bool(ipv_type_prefer)
     origin_prefer_bool = bool(origin_type_prefer)
     if not ipv_prefer_bool:
@@ -161,7 +184,7 @@ def get_total_urls(info_list: list[ChannelData], ipv_type_prefer, origin_type_pr
     if not origin_prefer_bool:
         origin_type_prefer = ["all"]
     categorized_urls = {origin: {ipv_type: [] for ipv_type in ipv_type_prefer} for origin in origin_type_prefer}
-    total_urls = []
+    prior_urls = []
     for info in info_list:
         channel_id, url, origin, resolution, url_ipv_type, extra_info = (
             info["id"],
@@ -174,15 +197,8 @@ def get_total_urls(info_list: list[ChannelData], ipv_type_prefer, origin_type_pr
         if not origin:
             continue
 
-        if origin in ["live", "hls"]:
-            if not rtmp_type or (rtmp_type and origin in rtmp_type):
-                total_urls.append(info)
-                continue
-            else:
-                continue
-
-        if origin == "whitelist":
-            total_urls.append(info)
+        if origin in ["live", "hls", "whitelist"]:
+            prior_urls.append(info)
             continue
 
         if origin_prefer_bool and (origin not in origin_type_prefer):
@@ -201,43 +217,48 @@ def get_total_urls(info_list: list[ChannelData], ipv_type_prefer, origin_type_pr
             categorized_urls[origin]["all"].append(info)
 
     ipv_num = {ipv_type: 0 for ipv_type in ipv_type_prefer}
-    urls_limit = config.urls_limit
+    snapshot = config.snapshot
+    urls_limit = snapshot.urls_limit
+    selected_urls = []
     for origin in origin_type_prefer:
-        if len(total_urls) >= urls_limit:
+        if len(selected_urls) >= urls_limit:
             break
         for ipv_type in ipv_type_prefer:
-            if len(total_urls) >= urls_limit:
+            if len(selected_urls) >= urls_limit:
                 break
             ipv_type_num = ipv_num[ipv_type]
-            ipv_type_limit = config.ipv_limit[ipv_type] or urls_limit
+            ipv_type_limit = snapshot.ipv_limit[ipv_type] or urls_limit
             if ipv_type_num < ipv_type_limit:
                 urls = categorized_urls[origin][ipv_type]
                 if not urls:
                     continue
                 limit = min(
-                    max(config.source_limits.get(origin, urls_limit) - ipv_type_num, 0),
+                    max(snapshot.source_limits.get(origin, urls_limit) - ipv_type_num, 0),
                     max(ipv_type_limit - ipv_type_num, 0),
                 )
                 limit_urls = urls[:limit]
-                total_urls.extend(limit_urls)
+                selected_urls.extend(limit_urls)
                 ipv_num[ipv_type] += len(limit_urls)
             else:
                 continue
 
-    total_urls = total_urls[:urls_limit]
-
-    return total_urls
+    return [
+        ([info for info in prior_urls if info["origin"] == "whitelist" or not rtmp_type or info["origin"] in rtmp_type]
+         + selected_urls)[:urls_limit]
+        for rtmp_type in rtmp_types
+    ]
 
 
 def get_total_urls_from_sorted_data(data):
     """
     Get the total urls with filter by date and duplicate from sorted data
     """
-    if len(data) > config.urls_limit:
+    urls_limit = config.snapshot.urls_limit
+    if len(data) > urls_limit:
         total_urls = [channel_data["url"] for channel_data, _ in filter_by_date(data)]
     else:
         total_urls = [channel_data["url"] for channel_data, _ in data]
-    return list(dict.fromkeys(total_urls))[: config.urls_limit]
+    return list(dict.fromkeys(total_urls))[:urls_limit]
 
 
 def check_ipv6_support():
@@ -263,7 +284,7 @@ def check_ipv_type_match(ipv_type: str) -> bool:
     """
     Check if the ipv type matches
     """
-    config_ipv_type = config.ipv_type
+    config_ipv_type = config.snapshot.ipv_type
     return (
             config_ipv_type == ipv_type
             or config_ipv_type == "全部"
@@ -277,10 +298,20 @@ def check_url_by_keywords(url, keywords=None):
     """
     if not keywords:
         return True
+    elif hasattr(keywords, "search"):
+        return keywords.search(url)
     else:
         return any(keyword in url for keyword in keywords)
 
 
+@lru_cache(maxsize=32)
+def get_keywords_pattern(keywords: tuple[str, ...]) -> re.Pattern | None:
+    """
+    Get the compiled pattern matching any of the keywords
+    """
+    return re.compile("|".join(map(re.escape, keywords))) if keywords else None
+
+
 def merge_objects(*objects, match_key=None):
     """
     Merge objects
@@ -342,58 +373,132 @@ def get_epg_url():
         return f"{get_ip_address()}/epg/epg.gz"
 
 
-def convert_to_m3u(path=None, first_channel_name=None, data=None):
+def get_m3u_channel_info(name: str, group: str = None, tvg_name: str = None) -> str:
     """
-    Convert result txt to m3u format
+    Get the #EXTINF line prefix of the channel, without the catchup attributes and the display name
+    :param name: the channel name
+    :param group: the group title
+    :param tvg_name: the name used for the tvg name and logo instead of the channel name
     """
-    if os.path.exists(path):
-        with open(path, "r", encoding="utf-8") as file:
-            m3u_output = f'#EXTM3U x-tvg-url="{get_epg_url()}"\n'
-            current_group = None
-            for line in file:
-                trimmed_line = line.strip()
-                if trimmed_line != "":
-                    if "#genre#" in trimmed_line:
-                        current_group = trimmed_line.replace(",#genre#", "").strip()
-                    else:
-                        try:
-                            original_channel_name, _, channel_link = map(
-                                str.strip, trimmed_line.partition(",")
-                            )
-                        except:
-                            continue
-                        processed_channel_name = re.sub(
-                            r"(CCTV|CETV)-(\d+)(\+.*)?",
-                            lambda m: f"{m.group(1)}{m.group(2)}"
-                                      + ("+" if m.group(3) else ""),
-                            first_channel_name if current_group == "🕘️更新时间" else original_channel_name,
-                        )
-                        m3u_output += f'#EXTINF:-1 tvg-name="{processed_channel_name}" tvg-logo="{join_url(config.cdn_url, f'https://raw.githubusercontent.com/fanmingming/live/main/tv/{processed_channel_name}.png')}"'
-                        if current_group:
-                            m3u_output += f' group-title="{current_group}"'
-                        item_data = {}
-                        if data:
-                            item_list = data.get(original_channel_name, [])
-                            for item in item_list:
-                                if item["url"] == channel_link:
-                                    item_data = item
-                                    break
-                        if item_data:
-                            catchup = item_data.get("catchup")
-                            if catchup:
-                                for key, value in catchup.items():
-                                    m3u_output += f' {key}="{value}"'
-                        m3u_output += f",{original_channel_name}\n"
-                        if item_data and config.open_headers:
-                            headers = item_data.get("headers")
-                            if headers:
-                                for key, value in headers.items():
-                                    m3u_output += f"#EXTVLCOPT:http-{key.lower()}={value}\n"
-                        m3u_output += f"{channel_link}\n"
-            m3u_file_path = os.path.splitext(path)[0] + ".m3u"
-            with open(m3u_file_path, "w", encoding="utf-8") as m3u_file:
-                m3u_file.write(m3u_output)
-            # print(f"✅ M3U result file generated at: {m3u_file_path}")
+    processed_channel_name = constants.m3u_channel_name_pattern.sub(
+        lambda m: f"{m.group(1)}{m.group(2)}" + ("+" if m.group(3) else ""),
+        tvg_name or name,
+    )
+    logo_url = join_url(config.cdn_url,
+                        f"https://raw.githubusercontent.com/fanmingming/live/main/tv/{processed_channel_name}.png")
+    info = f'#EXTINF:-1 tvg-name="{processed_channel_name}" tvg-logo="{logo_url}"'
+    if group:
+        info += f' group-title="{group}"'
+    return info
+
+
+def get_m3u_item(info: str, name: str, url: str, item_data: ChannelData = None, open_headers: bool = False) -> str:
+    """
+    Get the m3u lines of the channel url
+    :param info: the #EXTINF line prefix of the channel
+    :param name: the channel name
+    :param url: the written url
+    :param item_data: the channel data of the url, provide the catchup attributes and the headers
+    :param open_headers: write the headers as #EXTVLCOPT
+    """
+    parts = [info]
+    if item_data:
+        catchup = item_data.get("catchup")
+        if catchup:
+            parts.extend(f' {key}="{value}"' for key, value in catchup.items())
+    parts.append(f",{name}\n")
+    if item_data and open_headers:
+        headers = item_data.get("headers")
+        if headers:
+            parts.extend(f"#EXTVLCOPT:http-{key.lower()}={value}\n" for key, value in headers.items())
+    parts.append(f"{url}\n")
+    return "".join(parts)
+
+
+artifact_cache = {}
+
+
+def get_file_key(stat: os.stat_result) -> tuple:
+    """
+    Get the key of the file version, it changes when the file is replaced
+    """
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def load_artifact(path: str) -> dict:
+    """
+    Get the artifact of the result file, the etag and the precompressed siblings, cached until the file is replaced.
+    The etag is the hash of the bytes read, the siblings are only used if the meta file is of the same content
+    """
+    stat = os.stat(path)
+    artifact = artifact_cache.get(path)
+    if artifact and artifact["key"] == get_file_key(stat):
+        return artifact
+    with open(path, "rb") as f:
+        data = f.read()
+        key = get_file_key(os.fstat(f.fileno()))
+    etag = hashlib.sha256(data).hexdigest()
+    meta = get_artifact_meta(path)
+    encodings = {}
+    if meta and meta["hash"] == etag:
+        for encoding, encoding_path in meta["encodings"].items():
+            try:
+                encodings[encoding] = (encoding_path, get_file_key(os.stat(encoding_path)))
+            except OSError:
+                pass
+    artifact = {
+        "key": key,
+        "etag": etag,
+        "encodings": encodings,
+        "data": {None: data},
+    }
+    artifact_cache[path] = artifact
+    return artifact
+
+
+def load_artifact_encoding(artifact: dict, encoding: str) -> bytes | None:
+    """
+    Get the precompressed sibling of the artifact, None if it is replaced since the artifact is loaded
+    """
+    encoding_path, encoding_key = artifact["encodings"][encoding]
+    try:
+        with open(encoding_path, "rb") as f:
+            if get_file_key(os.fstat(f.fileno())) == encoding_key:
+                artifact["data"][encoding] = f.read()
+                return artifact["data"][encoding]
+    except OSError:
+        pass
+    artifact["encodings"].pop(encoding, None)
+    return None
+
+
+def get_artifact_response(path: str, mimetype: str = "text/plain", as_attachment: bool = False):
+    """
+    Get the response of the result file, serve the precompressed sibling accepted by the client, and 304 if the
+    client has the same content
+    """
+    artifact = load_artifact(path)
+    encoding = next(
+        (encoding for encoding in ("br", "gzip")
+         if encoding in artifact["encodings"] and request.accept_encodings[encoding]),
+        None
+    )
+    data = artifact["data"].get(encoding)
+    if data is None:
+        data = load_artifact_encoding(artifact, encoding)
+        if data is None:
+            encoding = None
+            data = artifact["data"][None]
+    response = make_response(data)
+    response.mimetype = mimetype
+    if encoding:
+        response.content_encoding = encoding
+    response.vary.add("Accept-Encoding")
+    response.set_etag(f"{artifact['etag']}-{encoding}" if encoding else artifact["etag"])
+    response.cache_control.no_cache = True
+    if as_attachment:
+        response.headers["Content-Disposition"] = f"attachment; filename={os.path.basename(path)}"
+    return response.make_conditional(request)
 
 
 def get_result_file_content(path=None, show_content=False, file_type=None):
@@ -410,12 +515,14 @@ def get_result_file_content(path=None, show_content=False, file_type=None):
             if file_type == "m3u" or not file_type:
                 result_file = os.path.splitext(path)[0] + ".m3u"
             if file_type != "txt" and show_content == False:
-                return send_file(resource_path(result_file), as_attachment=True)
-        with open(result_file, "r", encoding="utf-8") as file:
-            content = file.read()
-    else:
-        content = constants.waiting_tip
-    response = make_response(content)
+                result_file = resource_path(result_file)
+                return get_artifact_response(
+                    result_file,
+                    mimetype=mimetypes.guess_type(result_file)[0] or "application/octet-stream",
+                    as_attachment=True
+                )
+        return get_artifact_response(result_file)
+    response = make_response(constants.waiting_tip)
     response.mimetype = 'text/plain'
     return response
 
@@ -519,34 +626,90 @@ def write_content_into_txt(content, path=None, position=None, callback=None):
         callback()
 
 
+@lru_cache(maxsize=constants.format_name_cache_size)
 def format_name(name: str) -> str:
     """
     Format the  name with sub and replace and lower
     """
     name = opencc_t2s.convert(name)
-    for region in constants.region_list:
-        name = name.replace(f"{region}｜", "")
+    name = constants.region_pattern.sub("", name)
     name = constants.sub_pattern.sub("", name)
-    for old, new in constants.replace_dict.items():
-        name = name.replace(old, new)
+    name = constants.replace_pattern.sub(lambda match: constants.replace_dict[match.group()], name)
     return name.lower()
 
 
+def get_format_name_cache_stats(hits: int = 0, misses: int = 0) -> str:
+    """
+    Get the hit rate stats of the format name cache, the hits and misses of the worker processes are added
+    """
+    info = format_name.cache_info()
+    hits += info.hits
+    misses += info.misses
+    total = hits + misses
+    hit_rate = hits / total * 100 if total else 0
+    return f"hits: {hits}, misses: {misses}, hit rate: {hit_rate:.2f}%, size: {info.currsize}/{info.maxsize}"
+
+
+@lru_cache(maxsize=256)
+def get_headers_key(key: str) -> str:
+    """
+    Get the normalized headers key
+    """
+    key = key.strip().replace("http-", "").replace("-", "").lower()
+    return "referer" if "refer" in key else key
+
+
 def get_headers_key_value(content: str) -> dict:
     """
     Get the headers key value from content
     """
     key_value = {}
-    for match in constants.key_value_pattern.finditer(content):
-        key = match.group("key").strip().replace("http-", "").replace("-", "").lower()
-        if "refer" in key:
-            key = "referer"
-        value = match.group("value").replace('"', "").strip()
+    if not content:
+        return key_value
+    for key, value in constants.key_value_pattern.findall(content):
+        key = get_headers_key(key)
+        value = value.replace('"', "").strip()
         if key and value:
             key_value[key] = value
     return key_value
 
 
+def get_name_url_data(name: str, url: str, attributes: str = "", options: str = "", open_headers=False,
+                      check_url=True) -> dict | None:
+    """
+    Get the name and URL record with headers and catchup, None if the record is invalid
+    :param name: str, the matched name.
+    :param url: str, the matched URL.
+    :param attributes: str, the matched #EXTINF attributes.
+    :param options: str, the matched #EXTVLCOPT lines.
+    :param open_headers: bool, whether to extract headers.
+    :param check_url: bool, whether to validate the presence of a URL.
+    """
+    name = (name or "").strip()
+    url = (url or "").strip()
+    if not name or (check_url and not url):
+        return None
+    data = {"name": name, "url": url}
+    attributes = {**get_headers_key_value(attributes or ""), **get_headers_key_value(options or "")}
+    headers = {
+        "User-Agent": attributes.get("useragent", ""),
+        "Referer": attributes.get("referer", ""),
+        "Origin": attributes.get("origin", "")
+    }
+    catchup = {
+        "catchup": attributes.get("catchup", ""),
+        "catchup-source": attributes.get("catchupsource", ""),
+    }
+    headers = {k: v for k, v in headers.items() if v}
+    catchup = {k: v for k, v in catchup.items() if v}
+    if not open_headers and headers:
+        return None
+    if open_headers:
+        data["headers"] = headers
+    data["catchup"] = catchup
+    return data
+
+
 def get_name_url(content, pattern, open_headers=False, check_url=True):
     """
     Extract name and URL from content using a regex pattern.
@@ -558,30 +721,16 @@ def get_name_url(content, pattern, open_headers=False, check_url=True):
     result = []
     for match in pattern.finditer(content):
         group_dict = match.groupdict()
-        name = (group_dict.get("name", "") or "").strip()
-        url = (group_dict.get("url", "") or "").strip()
-        if not name or (check_url and not url):
-            continue
-        data = {"name": name, "url": url}
-        attributes = {**get_headers_key_value(group_dict.get("attributes", "")),
-                      **get_headers_key_value(group_dict.get("options", ""))}
-        headers = {
-            "User-Agent": attributes.get("useragent", ""),
-            "Referer": attributes.get("referer", ""),
-            "Origin": attributes.get("origin", "")
-        }
-        catchup = {
-            "catchup": attributes.get("catchup", ""),
-            "catchup-source": attributes.get("catchupsource", ""),
-        }
-        headers = {k: v for k, v in headers.items() if v}
-        catchup = {k: v for k, v in catchup.items() if v}
-        if not open_headers and headers:
-            continue
-        if open_headers:
-            data["headers"] = headers
-        data["catchup"] = catchup
-        result.append(data)
+        data = get_name_url_data(
+            group_dict.get("name", ""),
+            group_dict.get("url", ""),
+            group_dict.get("attributes", ""),
+            group_dict.get("options", ""),
+            open_headers=open_headers,
+            check_url=check_url
+        )
+        if data:
+            result.append(data)
     return result
 
 